@@ -12,7 +12,7 @@ class ArkSave(commands.Cog):
     Ark data save plugin for ArkShop
     """
     __author__ = "Vertyco"
-    __version__ = "1.0.2"
+    __version__ = "1.0.3"
 
     def format_help_for_context(self, ctx):
         helpcmd = super().format_help_for_context(ctx)
@@ -48,11 +48,9 @@ class ArkSave(commands.Cog):
 
     async def get_xuid(self, ctx):
         arktools = self.bot.get_cog("ArkTools")
-        playerdata = await arktools.config.guild(ctx.guild).players()
-        for xuid, data in playerdata.items():
-            if "discord" in data:
-                if ctx.author.id == data["discord"]:
-                    return xuid
+        xuids = await arktools.find_discord(ctx.guild, ctx.author.id)
+        if xuids:
+            return xuids[0]
 
     async def get_cluster(self, ctx):
         shop = self.bot.get_cog("ArkShop")
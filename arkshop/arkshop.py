@@ -6,11 +6,9 @@ import math
 import os
 import random
 import shutil
-import socket
 
 import aiohttp
 import discord
-from rcon import Client
 from dislash import (InteractionClient,
                      ActionRow,
                      Button,
@@ -54,7 +52,7 @@ class ArkShop(commands.Cog):
     Integrated Shop for Ark!
     """
     __author__ = "Vertyco"
-    __version__ = "1.5.17"
+    __version__ = "1.5.21"
 
     def format_help_for_context(self, ctx):
         helpcmd = super().format_help_for_context(ctx)
@@ -195,11 +193,10 @@ class ArkShop(commands.Cog):
         arktools = await self.arktools(ctx)
         if not arktools:
             return None
-        playerdata = await arktools.config.guild(ctx.guild).players()
-        for xuid, data in playerdata.items():
-            if "discord" in data:
-                if ctx.author.id == data["discord"]:
-                    return xuid
+        # Goes through ArkTools so it works whether players are in the config or its database
+        xuids = await arktools.find_discord(ctx.guild, ctx.author.id)
+        if xuids:
+            return xuids[0]
         else:
             embed = discord.Embed(
                 description=f"Your discord ID has not been found in the database.\n"
@@ -214,7 +211,7 @@ class ArkShop(commands.Cog):
         arktools = await self.arktools()
         if not arktools:
             return []
-        stats = await arktools.config.guild(ctx.guild).players()
+        stats = await arktools.playerdata(ctx.guild, [xuid])
         user = stats[xuid]["ingame"]
         implants = []
         for channel_id, data in user.items():
@@ -1276,7 +1273,6 @@ class ArkShop(commands.Cog):
         arktools = await self.arktools(ctx)
         if not arktools:
             return
-        playerstats = await arktools.config.guild(ctx.guild).players()
         if logs["users"] == {}:
             return await ctx.send("No purchase history yet!")
         if not member:
@@ -1289,11 +1285,10 @@ class ArkShop(commands.Cog):
         if str(member.id) not in logs["users"]:
             return await ctx.send("It appears that player hasn't purchased anything yet.")
 
-        for xuid, stats in playerstats.items():
-            if "discord" in stats:
-                if str(member.id) == str(stats["discord"]):
-                    gt = stats["username"]
-                    break
+        xuids = await arktools.find_discord(ctx.guild, member.id)
+        if xuids:
+            xuid = xuids[0]
+            gt = (await arktools.playerdata(ctx.guild, [xuid])).get(xuid, {}).get("username", "Unknown")
         else:
             gt = "Unknown"
             xuid = "Unknown"
@@ -1962,30 +1957,16 @@ class ArkShop(commands.Cog):
                                  currency_name,
                                  xuid,
                                  logchannel):
-        def exe():
-            results = {"success": [], "failed": []}
-            for name, data in serverlist:
-                try:
-                    with Client(
-                            host=data['ip'],
-                            port=data['port'],
-                            passwd=data['password'],
-                            timeout=5
-                    ) as client:
-                        for path in paths:
-                            client.run(f"giveitemtoplayer {implant_id} {path}")
-                        client.close()
-                        results["success"].append(name)
-                except socket.timeout:
-                    results["failed"].append(name)
-                except Exception as e:
-                    log.warning(f"Failed to send item to {name}\nError: {e}")
-                    results["failed"].append(name)
-            return results
-
-        res = await self.bot.loop.run_in_executor(None, exe)
-
-        if not res["success"]:  # If none of the commands were successful, don't deduct credits
+        arktools = await self.arktools(ctx)
+        if not arktools:
+            return
+        # Items are pipelined over ArkTools' persistent RCON connections, maps ArkTools knows are down are skipped
+        cmds = [f"giveitemtoplayer {implant_id} {path}" for path in paths]
+        results = await arktools.deliver(serverlist, cmds)
+        # The player only receives items on the map they're on, so the best delivery is what they got
+        delivered = max(r.delivered for r in results) if results else 0
+
+        if not delivered:  # If none of the commands were successful, don't deduct credits
             embed = discord.Embed(
                 title="Purchase Failed",
                 description="The servers timed out or lost connection during item send.\n"
@@ -1995,6 +1976,9 @@ class ArkShop(commands.Cog):
             )
             return await message.edit(embed=embed, components=[])
 
+        # Only charge for the part of a pack that made it
+        if delivered < len(paths):
+            price = math.ceil(int(price) * delivered / len(paths))
         # withdraw credits and send purchase message
         await bank.withdraw_credits(ctx.author, int(price))
         embed = discord.Embed(
@@ -2004,13 +1988,20 @@ class ArkShop(commands.Cog):
         )
         embed.set_footer(text=random.choice(TIPS).format(p=ctx.prefix))
         embed.set_thumbnail(url=SHOP_ICON)
-        if res["failed"]:
-            failed = ""
-            for fail in res["failed"]:
-                failed += f"{fail}\n"
+        if delivered < len(paths):
+            embed.add_field(
+                name="Partially delivered",
+                value=f"Only {delivered}/{len(paths)} items were sent, you were charged for those",
+                inline=False
+            )
+        failed = ""
+        for r in results:
+            if r.error:
+                failed += f"{r.name} ({r.error}) {r.delivered}/{r.total}\n"
+        if failed:
             embed.add_field(
                 name="Failed to send to some maps",
-                value=box(failed),
+                value=box(failed[:1000]),
                 inline=False
             )
         await message.edit(embed=embed, components=[])
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import pathlib
+import time
+import typing
+
+from xbox.webapi.api.provider.people.models import PeopleDecoration
+
+log = logging.getLogger("red.vrt.arktools.altdetect")
+
+# Players looked up per batch profile/people request
+BATCH = 50
+# How long newly seen players are gathered before a host looks them up
+BATCH_DELAY = 5
+# Looked up accounts are trusted for this long, across reloads
+TTL = 7 * 86400
+# Backoff when Xbox Live rate limits a lookup
+RETRY = 60
+# Attempts before a batch that keeps failing is put off
+MAX_TRIES = 3
+# A put off batch goes behind the rest of the queue and is tried again after this long, doubling up to the max
+DEFER = 600
+DEFER_MAX = 6 * 3600
+
+
+class AltCheck(typing.NamedTuple):
+    guild_id: int
+    cname: str
+    sname: str  # The host gamertag's server, its tokens are used for the lookup
+    xuid: str
+    gamertag: str
+
+    @property
+    def host(self) -> typing.Tuple[int, str, str]:
+        return self.guild_id, self.cname, self.sname
+
+
+def sus_args(entry: dict) -> typing.Tuple[dict, dict]:
+    """A cached account in the shape detect_sus takes, (profile, friends summary)"""
+    profile = {"profile_users": [{"settings": [
+        {"id": "AccountTier", "value": entry["tier"]},
+        {"id": "Gamerscore", "value": entry["gamerscore"]},
+    ]}]}
+    friends = {"target_following_count": entry["following"], "target_follower_count": entry["followers"]}
+    return profile, friends
+
+
+class AltDetector:
+    """
+    Account lookups for alt detection, batched per host gamertag and cached on disk
+
+    Newly seen players are gathered for a few seconds and looked up together, one batch profile
+    request for tier and gamerscore and one batch people request for follower counts, instead of two
+    requests per player. Results are cached by XUID for TTL and handed to `report` to be judged
+    against each guild's alt settings. The cache and any checks still waiting are saved, so
+    players that were already looked up aren't queried again after a reload.
+    """
+
+    def __init__(
+            self,
+            path: pathlib.Path,
+            auth: typing.Callable[[AltCheck], typing.Awaitable[tuple]],
+            report: typing.Callable[[AltCheck, dict], typing.Awaitable]
+    ):
+        self.path = path
+        self.auth = auth
+        self.report = report
+        self.cache: typing.Dict[str, dict] = {}  # xuid -> tier, gamerscore, following, followers, checked
+        self.queues: typing.Dict[tuple, typing.Dict[tuple, AltCheck]] = {}
+        self.workers: typing.Dict[tuple, asyncio.Task] = {}
+        self.saving: typing.Optional[asyncio.Task] = None
+        self.hits = 0
+        self.lookups = 0
+        self.requests = 0
+        self.limited = 0
+        self.deferred = 0
+
+    def cached(self, xuid: str) -> typing.Optional[dict]:
+        entry = self.cache.get(str(xuid))
+        if entry and time.time() - entry["checked"] < TTL:
+            return entry
+        return None
+
+    def put(self, check: AltCheck):
+        """Queue a player for a lookup, or judge them straight away if their account is cached"""
+        entry = self.cached(check.xuid)
+        if entry:
+            self.hits += 1
+            asyncio.create_task(self.judge(check, entry), name=f"ArkTools-AltCheck-{check.xuid}")
+            return
+        self.queues.setdefault(check.host, {})[(check.guild_id, check.xuid)] = check
+        self.start(check.host)
+        self.save()
+
+    def start(self, host: tuple):
+        if host in self.workers:
+            return
+        name = f"ArkTools-AltDetect-{host[2]}-{host[1]}"
+        self.workers[host] = asyncio.create_task(self.drain(host), name=name)
+
+    async def judge(self, check: AltCheck, entry: dict):
+        try:
+            await self.report(check, entry)
+        except Exception as e:
+            log.warning(f"Alt check for {check.gamertag} failed: {e}", exc_info=e)
+
+    async def drain(self, host: tuple):
+        queue = self.queues[host]
+        tries = 0
+        defer = DEFER
+        try:
+            await asyncio.sleep(BATCH_DELAY)
+            client, token = await self.auth(next(iter(queue.values())))
+            if not token:
+                log.info(f"Alt detection for {host[2]} {host[1]} has no valid token, {len(queue)} checks waiting")
+                return
+            while queue:
+                batch = list(queue.values())[:BATCH]
+                xuids = list({c.xuid for c in batch if not self.cached(c.xuid)})
+                try:
+                    if xuids:
+                        await self.lookup(client, xuids)
+                except Exception as e:
+                    tries += 1
+                    if "Too Many Requests" in str(e):
+                        self.limited += 1
+                    else:
+                        log.warning(f"Alt lookup for {host[2]} {host[1]} failed: {e}")
+                    if tries < MAX_TRIES:
+                        await asyncio.sleep(RETRY)
+                        continue
+                    # Nobody skips alt detection, the batch stays pending and the rest of the queue goes first
+                    log.warning(f"Putting off {len(batch)} alt checks for {host[2]} {host[1]} for {defer}s")
+                    self.deferred += len(batch)
+                    for check in batch:
+                        key = (check.guild_id, check.xuid)
+                        queue[key] = queue.pop(key)
+                    self.save()
+                    tries = 0
+                    await asyncio.sleep(defer)
+                    defer = min(defer * 2, DEFER_MAX)
+                    continue
+                tries = 0
+                defer = DEFER
+                for check in batch:
+                    queue.pop((check.guild_id, check.xuid), None)
+                    entry = self.cached(check.xuid)
+                    if entry:
+                        await self.judge(check, entry)
+                self.save()
+                if queue:
+                    await asyncio.sleep(BATCH_DELAY)
+        finally:
+            self.workers.pop(host, None)
+
+    async def lookup(self, client, xuids: typing.List[str]):
+        """Fill the cache for a batch of XUIDs, two requests however many players there are"""
+        profiles = json.loads((await client.profile.get_profiles(xuids)).json())
+        people = json.loads((await client.people.get_friends_own_batch(xuids, [PeopleDecoration.DETAIL])).json())
+        self.requests += 2
+        counts = {}
+        for person in people.get("people", []):
+            detail = person.get("detail")
+            if detail:
+                counts[person["xuid"]] = (detail["following_count"], detail["follower_count"])
+        now = time.time()
+        for user in profiles.get("profile_users", []):
+            xuid = user["id"]
+            settings = {s["id"]: s["value"] for s in user["settings"]}
+            if xuid not in counts:
+                # Accounts that hide their details from the people hub still have a public summary
+                summary = json.loads((await client.people.get_friends_summary_by_xuid(xuid)).json())
+                self.requests += 1
+                counts[xuid] = (summary["target_following_count"], summary["target_follower_count"])
+            following, followers = counts[xuid]
+            self.cache[xuid] = {
+                "tier": settings.get("AccountTier"),
+                "gamerscore": int(settings.get("Gamerscore") or 0),
+                "following": int(following),
+                "followers": int(followers),
+                "checked": now,
+            }
+            self.lookups += 1
+
+    def stats(self) -> typing.List[list]:
+        waiting = sum(len(q) for q in self.queues.values())
+        return [
+            ["Cached accounts", len(self.cache)],
+            ["Waiting for lookup", waiting],
+            ["Cache hits", self.hits],
+            ["Accounts looked up", self.lookups],
+            ["Xbox Live requests", self.requests],
+            ["Rate limited", self.limited],
+            ["Put off after failing", self.deferred],
+        ]
+
+    def dump(self) -> dict:
+        pending = [check._asdict() for queue in self.queues.values() for check in queue.values()]
+        return {"cache": self.cache, "pending": pending}
+
+    def write(self, data: dict):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data))
+        tmp.replace(self.path)
+
+    def read(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Failed to read the alt detection cache: {e}")
+            return {}
+
+    async def load(self):
+        data = await asyncio.get_running_loop().run_in_executor(None, self.read)
+        now = time.time()
+        self.cache.update({k: v for k, v in data.get("cache", {}).items() if now - v["checked"] < TTL})
+        pending = data.get("pending", [])
+        for entry in pending:
+            self.put(AltCheck(**entry))
+        if pending:
+            log.info(f"Resumed {len(pending)} pending alt checks")
+
+    def save(self):
+        if self.saving and not self.saving.done():
+            return
+        self.saving = asyncio.create_task(self.flush(), name="ArkTools-AltSave")
+
+    async def flush(self):
+        await asyncio.sleep(10)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write, self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save the alt detection cache: {e}")
+
+    def close(self):
+        for task in self.workers.values():
+            task.cancel()
+        self.workers.clear()
+        try:
+            self.write(self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save the alt detection cache: {e}")
@@ -1,11 +1,12 @@
 import asyncio
 import datetime
+import functools
+import io
 import json
 import logging
 import math
 import random
 import re
-import socket
 import sys
 import typing
 import os
@@ -19,15 +20,22 @@ import matplotlib
 import matplotlib.pyplot as plt
 from discord.ext import tasks
 from dislash import InteractionClient
-from rcon import Client
 from redbot.core import commands, Config
+from redbot.core.data_manager import bundled_data_path, cog_data_path
 from redbot.core.utils.chat_formatting import box, pagify
 from xbox.webapi.api.client import XboxLiveClient
 from xbox.webapi.authentication.manager import AuthenticationManager
 from xbox.webapi.authentication.models import OAuth2TokenResponse
 
+from .altdetect import AltCheck, AltDetector, sus_args
 from .buttonmenus import buttonmenu, DEFAULT_BUTTON_CONTROLS
-from .calls import Calls
+from .calls import CachedToken, Calls, TokenCache
+from .capture import TrafficCapture
+from .chatqueue import ServerChatQueue
+from .database import PlayerDB, StoredValue
+from .delivery import deliver, deliver_server
+from .downsample import benchmark as downsample_benchmark
+from .fanout import FanOut, FanOutReport, Step, countdown_steps, rcon_command
 from .formatter import (
     time_from_string,
     decode,
@@ -38,16 +46,38 @@ from .formatter import (
     tribe_lb_format,
     cstats_format,
     player_stats,
-    detect_friends,
-    fix_timestamp,
-    get_graph,
     time_formatter,
     detect_sus,
     cleanup_config,
     IMSTUCK_BLUEPRINTS
 )
+from .friendgraph import FriendGraph, benchmark as friendgraph_benchmark
+from .getchat import (
+    ADMIN,
+    CHAT,
+    CORPUS_EXPECTED,
+    TRIBE,
+    benchmark as getchat_benchmark,
+    load_corpus,
+    parse as parse_getchat,
+)
+from .graphrender import GraphRenderer
+from .health import HealthMonitor, OPEN
+from .loadtest import LoadHarness
 from .menus import menu, DEFAULT_CONTROLS
-from .rcon import async_rcon
+from .outbound import OutboundQueue
+from .playerindex import PlayerIndex
+from .rcon import RconPool, RconError
+from .routing import ChatRouter
+from .scheduler import PollScheduler
+from .settingscache import SettingsCache, thaw
+from .simulator import SimConfig
+from .social import BLOCK, FRIEND, MESSAGE, UNBLOCK, UNFRIEND, SocialJob, SocialQueue, chunked
+from .statstore import StatStore
+from .statusboard import StatusBoard
+from .timers import Timer, TimerWheel
+from .timeseries import GraphStore
+from .tribelog import parse_tribelog, tribelog_embeds
 
 matplotlib.use("agg")
 plt.switch_backend("agg")
@@ -78,7 +108,7 @@ class ArkTools(Calls, commands.Cog):
     RCON/API tools and cross-chat for Ark: Survival Evolved!
     """
     __author__ = "Vertyco"
-    __version__ = "2.15.53"
+    __version__ = "2.33.16"
 
     def format_help_for_context(self, ctx):
         helpcmd = super().format_help_for_context(ctx)
@@ -124,10 +154,13 @@ class ArkTools(Calls, commands.Cog):
             "autoremove": False,  # Automatically remove old rank roles from discord users when they rank up
             "cooldowns": {},  # Cooldowns for in-game commands like payday and imstuck
             "votecooldown": 120,  # Cooldown for in-game voting commands so people dont spam the shit
+            "digestwindow": 5,  # Seconds to collect join/leave lines before sending them as one message
+            "capture": False,  # Record RCON traffic to disk for replaying later
             "kit": {"enabled": False, "claimed": [], "paths": []},  # Starter kit settings for new players
             "payday": {"enabled": False, "random": False, "cooldown": 12, "paths": []},  # in-game Payday settings
             "serverstats": {"dates": [], "counts": [], "expiration": 30},  # Playercount data for graphing
-            "timezone": "UTC"  # Default timezone for player count graph
+            "timezone": "UTC",  # Default timezone for player count graph
+            "database": False  # Store players and tribes in the SQLite database instead of config
         }
         # Microsoft Azure application Client ID and Secret for accessing the Xbox API
         default_global = {
@@ -141,31 +174,66 @@ class ArkTools(Calls, commands.Cog):
         # Cache on cog load/core setting changes to reduce config reads
         self.activeguilds = []
         self.servers = []
-        self.channels = []
+        self.router = ChatRouter()
         self.servercount = 0
         self.playerlist = {}
-        self.downtime = {}
+        # Guild ID -> PlayerIndex, lookup tables over the players config
+        self.indexes = {}
+        # Optional SQLite storage for players and tribes, and the guilds using it
+        self.db = PlayerDB(cog_data_path(self) / "players.db")
+        self.dbguilds = set()
         self.time = ""
 
         # Only fire certain warnings once so loops dont spam logs
         self.warnings = []
 
-        # Offline servers go into a queue to wait a minute before bot attempts to reconnect
-        self.queue = {}
+        # Healthy/degraded/open state of every server, fed by every RCON call
+        self.health = HealthMonitor(cog_data_path(self) / "outages.json")
+
+        # Xbox Live XSTS tokens per host gamertag, refreshed only when they're about to expire
+        self.tokencache = TokenCache()
+
+        # Friend list changes, blocks and Xbox messages, paced per host gamertag
+        self.social = SocialQueue(cog_data_path(self) / "social.json", self.social_run, self.social_auth, self.social_report)
+        # Alt detection account lookups, batched per host gamertag and cached on disk
+        self.altdetect = AltDetector(cog_data_path(self) / "altcache.json", self.social_auth, self.alt_report)
+        # Last seen friends and followers per host gamertag, so autofriend only acts on what changed
+        self.friendgraph = FriendGraph(cog_data_path(self) / "friendgraph.json")
+
+        # Persistent RCON connections, one per server
+        self.rcon = RconPool(self.health)
+        self.fanout = FanOut(self.rcon, self.health)
+        # One long-lived getchat/listplayers poller per server
+        self.scheduler = PollScheduler(self)
+        # Playtime/last seen changes are buffered and saved once per player_stats tick
+        self.statstore = StatStore(self.playerdata)
+        # Frozen guild settings for the task loops, invalidated whenever a command runs
+        self.settings = SettingsCache(self.config)
+        # Player count history for the graphs, stored in ring buffers instead of the config
+        self.graphs = GraphStore(cog_data_path(self) / "graphdata")
+        # Graphs are drawn in a worker process and reused until new data comes in
+        self.renderer = GraphRenderer()
+        # Guild ID -> StatusBoard, the status messages that get edited in place
+        self.boards = {}
+        # Join/leave lines are batched per channel and sent at Discord's pace
+        self.outbound = OutboundQueue()
+        # Discord to game and map to map chat, one coalescing queue per server
+        self.chatqueue = ServerChatQueue(self.executor, self.health.available)
+        # Opt-in record of RCON traffic for servers in guilds with capture turned on
+        self.capture = TrafficCapture(cog_data_path(self) / "captures")
 
         # In-Game voting sessions
         self.votes = {}
-        self.lastran = {}
+        # Vote session expiry and in-game command cooldowns, each fires right when it runs out
+        self.timers = TimerWheel(cog_data_path(self) / "timers.json")
+        self.timers.register("vote", self.vote_expired)
 
         # Task Loops
-        self.getchat.start()
-        self.listplayers.start()
+        self.poll_manager.start()
         self.status_channel.start()
         self.player_stats.start()
         self.maintenance.start()
         self.autofriend.start()
-        self.vote_sessions.start()
-        self.graphdata_prune.start()
         self.gather_graphdata.start()
 
         # Windows is dumb, set asyncio event loop selector policy for it, not even sure if this helps tbh
@@ -173,20 +241,42 @@ class ArkTools(Calls, commands.Cog):
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
             log.info(f"Setting EventLoopSelector For {sys.platform}")
 
+    # Any command might have changed the guild's settings, so the next loop read gets a fresh snapshot
+    async def cog_after_invoke(self, ctx: commands.Context):
+        if ctx.guild:
+            self.settings.bump(ctx.guild.id)
+
     def cog_unload(self):
-        self.getchat.cancel()
-        self.listplayers.cancel()
+        self.poll_manager.cancel()
+        self.scheduler.stop()
         self.status_channel.cancel()
         self.player_stats.cancel()
         self.maintenance.cancel()
         self.autofriend.cancel()
-        self.vote_sessions.cancel()
-        self.graphdata_prune.cancel()
+        self.timers.close()
+        self.graphs.close()
+        self.renderer.close()
+        self.outbound.close()
+        self.chatqueue.close()
+        self.capture.close()
+        self.social.close()
+        self.friendgraph.close()
+        self.altdetect.close()
         self.gather_graphdata.cancel()
+        self.rcon.close()
+        asyncio.create_task(self.close_http(), name="ArkHTTP-Close")
+        # Save anything player_stats hasn't flushed yet, then close the database
+        asyncio.create_task(self.unload_flush(), name="ArkStats-UnloadFlush")
         for task in asyncio.all_tasks():
             if "ArkTools" in task.get_name() and "giveitemtoplayer" not in task.get_name().lower():
                 task.cancel()
 
+    async def unload_flush(self):
+        try:
+            await self.statstore.flush_all(self.bot)
+        finally:
+            self.db.close()
+
     # Just grab azure credentials from the config, only bot owner needs to set this and its optional
     async def get_azure_credentials(self):
         client_id = await self.config.clientid()
@@ -198,37 +288,168 @@ class ArkTools(Calls, commands.Cog):
     async def refresh_tokens(session, client_id, client_secret, tokens, redirect_uri):
         auth_mgr = AuthenticationManager(session, client_id, client_secret, redirect_uri)
         try:
-            auth_mgr.oauth = OAuth2TokenResponse.parse_raw(json.dumps(tokens))
+            auth_mgr.oauth = OAuth2TokenResponse.parse_raw(json.dumps(thaw(tokens)))
         except Exception as e:
             if "validation error" in str(e):
-                return "validation error", None, None
+                return "validation error", None, None, None
             else:
                 log.warning(f"Error while parsing tokens: {e}")
-                return "parsing error", None, None
+                return "parsing error", None, None, None
         try:
             await auth_mgr.refresh_tokens()
         except Exception as e:
             if "Service Unavailable" in str(e) and "expected dict not NoneType" not in str(e):
                 log.warning(f"Microsoft API Unavailable: {e}")
-                return "unavailable", None, None
+                return "unavailable", None, None, None
             elif "expected dict not NoneType" in str(e):
-                return "no token", None, None
+                return "no token", None, None, None
             elif "Bad Request" in str(e):
-                return "bad request", None, None
+                return "bad request", None, None, None
             else:
-                return None, None, None
+                return None, None, None, None
         xbl_client = XboxLiveClient(auth_mgr)
         try:
             xsts_token = auth_mgr.xsts_token.authorization_header_value
+            expires = auth_mgr.xsts_token.not_after.timestamp()
         except AttributeError:
-            return "unauthorized", None, None
+            return "unauthorized", None, None, None
         refreshed_tokens = json.loads(auth_mgr.oauth.json())
-        return xbl_client, xsts_token, refreshed_tokens
+        return xbl_client, xsts_token, refreshed_tokens, expires
+
+    async def refresh_and_store(self, guild: discord.guild, cname: str, sname: str, tokens: dict):
+        """One host's token refresh, concurrent callers share it through the token cache"""
+        client_id, client_secret = await self.get_azure_credentials()
+        xbl_client, xsts_token, refreshed_tokens, expires = await self.refresh_tokens(
+            self.http,
+            client_id,
+            client_secret,
+            tokens,
+            REDIRECT_URI
+        )
+        if not xsts_token or not refreshed_tokens:
+            return xbl_client, xsts_token
+        self.tokencache.put(
+            (guild.id, cname, sname),
+            CachedToken(xbl_client, xsts_token, refreshed_tokens.get("refresh_token"), expires)
+        )
+        # Only write to the config when Microsoft actually handed back new tokens
+        if refreshed_tokens != thaw(tokens):
+            async with self.config.guild(guild).clusters() as clusters:
+                clusters[cname]["servers"][sname]["tokens"] = refreshed_tokens
+            # Refresh tokens are single use, loops must not keep the old ones
+            self.settings.bump(guild.id)
+        return xbl_client, xsts_token
+
+    async def social_auth(self, job: SocialJob):
+        guild = self.bot.get_guild(job.guild_id)
+        if not guild:
+            return None, None
+        settings = await self.settings.get(guild)
+        server = settings["clusters"].get(job.cname, {}).get("servers", {}).get(job.sname, {})
+        if not server.get("tokens"):
+            return None, None
+        return await self.auth_manager(job.cname, job.sname, server["tokens"], ctx=None, guild=guild)
+
+    async def alt_report(self, check: AltCheck, entry: dict):
+        """Judge a looked up account against the guild's alt settings, then ban, warn and log"""
+        guild = self.bot.get_guild(check.guild_id)
+        if not guild:
+            return
+        settings = await self.settings.get(guild)
+        alt = settings["alt"]
+        if not alt["on"]:
+            return
+        sus, reasons = detect_sus(alt, *sus_args(entry))
+        if not sus:
+            return
+        xuid = check.xuid
+        gamertag = check.gamertag
+        yes = "✅"
+        no = "❌"
+        if alt["autoban"] and int(xuid) not in alt["whitelist"]:
+            banned = yes
+            command = f"banplayer {xuid}"
+            for sguild, server in self.servers:
+                if sguild == guild.id:
+                    task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-Banplayer"
+                    asyncio.create_task(self.executor(guild, server, command), name=task_name)
+            log.info(f"Banning {gamertag} - {xuid} from all servers")
+        else:
+            banned = no
+        if alt["msgtoggle"] and alt["msg"]:
+            warning = yes
+            msg = alt["msg"].format(reasons=reasons)
+            self.social.put(SocialJob(guild.id, check.cname, check.sname, MESSAGE, xuid, gamertag, msg))
+        else:
+            warning = no
+        eventlog = guild.get_channel(settings["eventlog"]) if settings["eventlog"] else None
+        if eventlog:
+            embed = discord.Embed(
+                description=f"**Suspicious account detected!**\n"
+                            f"**{gamertag}** - `{xuid}`\n"
+                            f"`Auto-Banned:  `{banned}\n"
+                            f"`Sent Warning: `{warning}\n"
+                            f"**Reasons**\n"
+                            f"{box(reasons)}",
+                color=discord.Color.orange()
+            )
+            try:
+                await eventlog.send(embed=embed)
+            except discord.HTTPException:
+                log.warning("Sus account message failed.")
+
+    async def social_run(self, xbl_client, token: str, job: SocialJob) -> typing.Tuple[int, float]:
+        if job.action == MESSAGE:
+            await xbl_client.message.send_message(job.xuid, job.text)
+            return 200, 0.0
+        if job.action in (FRIEND, UNFRIEND):
+            url = f"https://social.xboxlive.com/users/me/people/xuid({job.xuid})"
+            method = "PUT" if job.action == FRIEND else "DELETE"
+            return await self.xbl_request(method, url, token)
+        url = "https://privacy.xboxlive.com/users/me/people/never"
+        method = "PUT" if job.action == BLOCK else "DELETE"
+        return await self.xbl_request(method, url, token, json.dumps({"xuid": int(job.xuid)}))
+
+    async def social_report(self, host: tuple, results: list):
+        """A host's finished social jobs, config changes first and then one event log digest"""
+        guild = self.bot.get_guild(host[0])
+        if not guild:
+            return
+        # Config is only touched once the network work is done, in one transaction
+        expired = [r.job.xuid for r in results if r.job.expire and r.ok]
+        if expired:
+            async with self.playerdata(guild, expired) as playerstats:
+                for xuid in expired:
+                    if xuid in playerstats:
+                        playerstats[xuid]["lastseen"]["map"] = None
+        name = f"{host[2].capitalize()} {host[1].upper()}"
+        lines = []
+        for r in results:
+            job = r.job
+            player = f"**{job.gamertag}** - `{job.xuid}`" if job.gamertag else f"`{job.xuid}`"
+            if job.action == FRIEND:
+                verb = "accepted" if r.ok else "failed to accept"
+                lines.append(f"**{name}** {verb} {player}'s friend request.")
+            elif job.action == UNFRIEND:
+                verb = "was removed" if r.ok else "failed to be removed"
+                lines.append(f"{player} {verb} by **{name}** {job.reason}".strip())
+            elif job.action in (BLOCK, UNBLOCK):
+                verb = f"{job.action}ed" if r.ok else f"failed to {job.action} (Status: {r.status})"
+                lines.append(f"**{name}** {verb} {player}")
+            elif not r.ok:
+                lines.append(f"**{name}** failed to message {player}: {r.status}")
+            if not r.ok:
+                log.info(f"{name} {job.action} {job.xuid} failed: {r.status}")
+        eventlog = guild.get_channel((await self.settings.get(guild))["eventlog"])
+        if not lines or not eventlog or not eventlog.permissions_for(guild.me).send_messages:
+            return
+        color = discord.Color.green() if all(r.ok for r in results) else discord.Color.orange()
+        for block in chunked(lines):
+            await eventlog.send(embed=discord.Embed(description=block, color=color))
 
     # Handles token renewal and returns xbox client session with xsts token
     async def auth_manager(
             self,
-            session: aiohttp.ClientSession,
             cname: str,
             sname: str,
             tokens: dict,
@@ -236,7 +457,12 @@ class ArkTools(Calls, commands.Cog):
             guild: discord.guild = None
     ):
         name = f"{sname} {cname}"
-        client_id, client_secret = await self.get_azure_credentials()
+        if not guild:
+            guild = ctx.guild
+        cached = self.tokencache.get((guild.id, cname, sname), tokens)
+        if cached:
+            return cached.client, cached.xsts
+        client_id, _ = await self.get_azure_credentials()
         if not client_id:  # Owner hasnt set client id yet
             if ctx:
                 await ctx.send(f"Client ID and Secret have not been set yet!\n"
@@ -244,12 +470,9 @@ class ArkTools(Calls, commands.Cog):
             else:
                 log.warning("Client ID and Secret have not been set yet!")
             return None, None
-        xbl_client, xsts_token, refreshed_tokens = await self.refresh_tokens(
-            session,
-            client_id,
-            client_secret,
-            tokens,
-            REDIRECT_URI
+        xbl_client, xsts_token = await self.tokencache.single_flight(
+            (guild.id, cname, sname),
+            functools.partial(self.refresh_and_store, guild, cname, sname, tokens)
         )
         if xbl_client == "validation error":
             if ctx:
@@ -280,11 +503,6 @@ class ArkTools(Calls, commands.Cog):
                 await ctx.send(f"Tokens have failed to refresh for {name}")
             return None, None
         else:
-            if not guild:
-                guild = ctx.guild
-            if refreshed_tokens:  # Make sure refresh tokens arent null
-                async with self.config.guild(guild).clusters() as clusters:
-                    clusters[cname]["servers"][sname]["tokens"] = refreshed_tokens
             return xbl_client, xsts_token
 
     # Initialize a map to a player in the config
@@ -296,7 +514,7 @@ class ArkTools(Calls, commands.Cog):
             character_name: str,
             implant: str = None
     ):
-        async with self.config.guild(guild).players() as conf:
+        async with self.playerdata(guild, [xuid]) as conf:
             if xuid in conf:
                 conf[xuid]["ingame"][server_id] = {
                     "implant": implant,
@@ -309,10 +527,11 @@ class ArkTools(Calls, commands.Cog):
                         "tamed": 0
                     }
                 }
+                self.reindex(guild, conf, xuid)
 
     # Update an existing players in-game name
     async def update_name(self, guild: discord.guild, server_id: str, xuid: str, character_name: str):
-        async with self.config.guild(guild).players() as conf:
+        async with self.playerdata(guild, [xuid]) as conf:
             saved_name = conf[xuid]["ingame"][server_id]["name"]
             if not saved_name:
                 conf[xuid]["ingame"][server_id]["name"] = character_name
@@ -320,195 +539,206 @@ class ArkTools(Calls, commands.Cog):
                 if saved_name not in conf[xuid]["ingame"][server_id]["previous_names"]:
                     conf[xuid]["ingame"][server_id]["previous_names"].append(saved_name)
                 conf[xuid]["ingame"][server_id]["name"] = character_name
+            self.reindex(guild, conf, xuid)
+
+    # Player data lives either in the config or in the SQLite database
+    # Both can be awaited or used with "async with", xuids limits what gets loaded from the database
+    def playerdata(self, guild: discord.guild, xuids: list = None):
+        if guild.id in self.dbguilds:
+            return StoredValue(self.db, guild.id, "players", xuids)
+        return self.config.guild(guild).players()
+
+    def tribedata(self, guild: discord.guild, tribe_ids: list = None):
+        if guild.id in self.dbguilds:
+            return StoredValue(self.db, guild.id, "tribes", tribe_ids)
+        return self.config.guild(guild).tribes()
+
+    async def set_playerdata(self, guild: discord.guild, players: dict):
+        if guild.id in self.dbguilds:
+            await self.db.replace(guild.id, players=players)
+        else:
+            await self.config.guild(guild).players.set(players)
 
-    # If a server goes offline it will be added to the queue and task loops will wait before trying to call it again
-    async def in_queue(self, channel: str) -> bool:
-        now = datetime.datetime.now()
-        if channel in self.queue:
-            td = now - self.queue[channel]
-            td = td.total_seconds()
-            if td < 120:
-                return True
-            else:
-                return False
+    # Full guild settings including players and tribes, wherever they are stored
+    async def full_settings(self, guild: discord.guild) -> dict:
+        settings = await self.config.guild(guild).all()
+        if guild.id in self.dbguilds:
+            settings["players"], settings["tribes"] = await self.db.export(guild.id)
+        return settings
+
+    async def save_settings(self, guild: discord.guild, settings: dict):
+        if settings.get("database") or guild.id in self.dbguilds:
+            settings = dict(settings)
+            settings["database"] = True
+            players = settings.pop("players", {})
+            tribes = settings.pop("tribes", {})
+            await self.config.guild(guild).set(settings)
+            await self.db.replace(guild.id, players, tribes)
+            self.dbguilds.add(guild.id)
         else:
-            return False
+            await self.config.guild(guild).set(settings)
+        self.drop_index(guild)
+
+    # Graph data lives in ring buffer files, anything still in the config (old versions or restored backups) is moved over
+    async def load_graphdata(self, guild: discord.guild, serverstats: dict, clusters: dict):
+        days = serverstats.get("expiration", 30)
+        if guild.id not in self.graphs.guilds:
+            await self.graphs.load(guild.id, days)
+        if serverstats.get("dates"):
+            await self.graphs.replace(guild.id, serverstats)
+            self.renderer.forget(guild.id)
+            await self.config.guild(guild).serverstats.set({"dates": [], "counts": [], "expiration": days})
+        await self.graphs.retain(guild.id, clusters)
+
+    # Player count graph as a Discord file, None if there isn't enough data yet
+    async def graph_file(self, guild: discord.guild, hours: int, timezone: str) -> typing.Optional[discord.File]:
+        window = self.graphs.window(guild.id, hours * 3600)
+        png = await self.renderer.render(guild.id, window, timezone, hours)
+        if not png:
+            return None
+        return discord.File(io.BytesIO(png), filename="plot.png")
 
-    def add_queue(self, channel: str) -> None:
-        if channel not in self.queue:
-            self.queue[channel] = datetime.datetime.now()
+    # Player lookups use the database indexes or the in-memory PlayerIndex
+    async def config_index(self, guild: discord.guild, players: dict = None) -> PlayerIndex:
+        if guild.id not in self.indexes and players is None:
+            players = await self.config.guild(guild).players()
+        return self.player_index(guild, players)
+
+    async def find_gamertag(self, guild: discord.guild, gamertag: str, players: dict = None) -> typing.Optional[str]:
+        if guild.id in self.dbguilds:
+            return await self.db.find_gamertag(guild.id, gamertag)
+        return (await self.config_index(guild, players)).by_gamertag(gamertag)
+
+    async def find_discord(self, guild: discord.guild, user_id: int, players: dict = None) -> typing.List[str]:
+        if guild.id in self.dbguilds:
+            return await self.db.find_discord(guild.id, user_id)
+        return (await self.config_index(guild, players)).by_discord(user_id)
+
+    async def find_character(
+            self,
+            guild: discord.guild,
+            character_name: str,
+            server_id: str = None,
+            players: dict = None
+    ) -> typing.List[str]:
+        if guild.id in self.dbguilds:
+            return await self.db.find_character(guild.id, character_name, server_id)
+        return (await self.config_index(guild, players)).by_character(character_name, server_id)
+
+    # Player lookup tables for a guild, built from the given player data if they don't exist yet
+    def player_index(self, guild: discord.guild, players: dict) -> PlayerIndex:
+        index = self.indexes.get(guild.id)
+        if index is None:
+            index = PlayerIndex(players)
+            self.indexes[guild.id] = index
+        return index
+
+    # Sync index entries for players that were just written to the config
+    def reindex(self, guild: discord.guild, players: dict, *xuids: str):
+        index = self.indexes.get(guild.id)
+        if index is not None:
+            index.refresh(players, *xuids)
+
+    # Bulk changes just drop the index, it gets rebuilt on the next lookup
+    def drop_index(self, guild: discord.guild):
+        self.indexes.pop(guild.id, None)
+
+    # Compare the live index against the config, then rebuild it
+    def check_index(self, guild: discord.guild, players: dict):
+        if guild.id in self.dbguilds:
+            # The database has its own indexes
+            self.drop_index(guild)
+            return
+        index = self.indexes.get(guild.id)
+        if index is not None:
+            for problem in index.check(players):
+                log.warning(f"Player index for {guild.name}: {problem}")
+        self.indexes[guild.id] = PlayerIndex(players)
 
     async def tribelog_sendoff(self, guild, settings, server, logs):
-        for msg in logs:
-            try:
-                tribe_id, embed = await self.tribelog_format(server, msg)
-            except TypeError:
+        events = [event for event in map(parse_tribelog, logs) if event]
+        if not events:
+            return
+        channels = await self.tribelog_ingest(guild, server, events)
+        # One batch of embeds for the master log, and one per tribe channel with just that tribe's events
+        sendoffs = [(guild.get_channel(settings["masterlog"]), events)]
+        for tribe_id, channel_id in channels.items():
+            if channel_id:
+                sendoffs.append((guild.get_channel(channel_id), [e for e in events if e.tribe_id == tribe_id]))
+        for channel, batch in sendoffs:
+            if not channel or not channel.permissions_for(guild.me).send_messages:
                 continue
-            masterlog = guild.get_channel(settings["masterlog"])
             try:
-                if masterlog:
-                    perms = masterlog.permissions_for(guild.me).send_messages
-                    if perms:
-                        await masterlog.send(embed=embed)
-                if tribe_id in settings["tribes"]:
-                    tribechannel = guild.get_channel(settings["tribes"][tribe_id]["channel"])
-                    if tribechannel:
-                        perms = tribechannel.permissions_for(guild.me).send_messages
-                        if perms:
-                            await tribechannel.send(embed=embed)
+                for embed in tribelog_embeds(server, batch):
+                    await channel.send(embed=embed)
             except discord.errors.DiscordServerError:
                 log.warning("TribeLogSend: Discord seems to have an API Outage.")
 
-    # Handles tribe log formatting/itemizing
-    async def tribelog_format(self, server: dict, msg: str):
-        if "froze" in msg:
-            regex = r'(?i)Tribe (.+), ID (.+): (Day .+, ..:..:..): (.+)\)'
-        else:
-            regex = r'(?i)Tribe (.+), ID (.+): (Day .+, ..:..:..): .+>(.+)<'
-        tribe = re.findall(regex, msg)
-        if not tribe:
-            return
-        name = tribe[0][0]
-        tribe_id = tribe[0][1]
-        time = tribe[0][2]
-        action = tribe[0][3]
-        guild = server["guild"]
+    # Applies a whole getchat batch of tribe logs in one tribe write and one player write
+    # Returns each tribe's log channel ID
+    async def tribelog_ingest(self, guild: discord.guild, server: dict, events: list) -> typing.Dict[str, int]:
         servername = f"{server['name']} {server['cluster']}"
         server_id = str(server["chatchannel"])
-        playerdata = {
-            "implant": None,
-            "name": None,
-            "previous_names": [],
-            "stats": {
-                "pvpkills": 0,
-                "pvpdeaths": 0,
-                "pvedeaths": 0,
-                "tamed": 0
-            }
-        }
-        async with self.config.guild(guild).all() as settings:
-            tribes = settings["tribes"]
-            players = settings["players"]
-            if tribe_id not in tribes:
-                tribes[tribe_id] = {
-                    "tribename": name,
-                    "owner": None,
-                    "channel": None,
-                    "allowed": [],
-                    "members": [],
-                    "kills": 0,
-                    "servername": servername
-                }
-            if tribes[tribe_id]["tribename"] != name:
-                tribes[tribe_id]["tribename"] = name
-            tr = tribes[tribe_id]
-            if "members" not in tr:
-                tr["members"] = []
-            if "servername" not in tribes[tribe_id]:
-                tribes[tribe_id]["servername"] = servername
-            if not tribes[tribe_id]["servername"]:
-                tribes[tribe_id]["servername"] = servername
-            if "was killed" in action.lower():  # Player or dino was killed
-                if action.lower().startswith("tribemember"):  # Player was killed by something
-                    # Amount of parenthesis in the action was a quick and easy way to determine kill/death type
-                    braces = action.count("(")
-                    # PVE DEATH
-                    if braces == 0:  # player killed by wild dino so pve death
-                        reg = r'Tribemember (.+) -.+was'
-                        victim = re.search(reg, action).group(1)
-                        if victim not in tr["members"]:
-                            tr["members"].append(victim)
-                        uid = await self.get_uid(players, victim)
-                        if uid:
-                            if server_id not in players[uid]["ingame"]:
-                                players[uid]["ingame"][server_id] = playerdata
-                            players[uid]["ingame"][server_id]["stats"]["pvedeaths"] += 1
-                    # PVP DEATH AND PVP KILL
-                    if braces == 1:  # player killed by another player so pvp death and kill
-                        reg = r'Tribemember (.+) - .+ was .+ by (.+) -'
-                        data = re.findall(reg, action)
-                        victim = data[0]  # PVP DEATH
-                        if victim not in tr["members"]:
-                            tr["members"].append(victim)
-                        uid = await self.get_uid(players, victim)
-                        if uid:
-                            if server_id not in players[uid]["ingame"]:
-                                players[uid]["ingame"][server_id] = playerdata
-                            players[uid]["ingame"][server_id]["stats"]["pvpdeaths"] += 1
-                        killer = data[1]  # PVP KILL
-                        uid = await self.get_uid(players, killer)
-                        if uid:
-                            if server_id not in players[uid]["ingame"]:
-                                players[uid]["ingame"][server_id] = playerdata
-                            players[uid]["ingame"][server_id]["stats"]["pvpkills"] += 1
-                    # PVP DEATH
-                    if braces == 2:  # player killed by a tribe's dino so pvp death
-                        log.info(msg)  # Still trying to figure out possible strings to parse
-                        reg = r'Tribemember (.+) -.+was'
-                        victim = re.search(reg, action).group(1)
-                        if victim not in tr["members"]:
-                            tr["members"].append(victim)
-                        uid = await self.get_uid(players, victim)
-                        if uid:
-                            if server_id not in players[uid]["ingame"]:
-                                players[uid]["ingame"][server_id] = playerdata
-                            if "stats" in players[uid]["ingame"][server_id]:
-                                players[uid]["ingame"][server_id]["stats"]["pvpdeaths"] += 1
-                color = discord.Color.from_rgb(255, 13, 0)  # bright red
-            elif "tribe killed" in action.lower():
-                # TRIBE KILL
-                valid = True
-                if "Baby" in action:
-                    valid = False
-                if "Juvenile" in action:
-                    valid = False
-                if "Adolescent" in action:
-                    valid = False
-                if name in action:
-                    valid = False
-                if valid:
-                    # Add to tribe kills
-                    tribes[tribe_id]["kills"] += 1
-                color = discord.Color.from_rgb(246, 255, 0)  # gold
-            elif "starved" in action.lower():
-                color = discord.Color.from_rgb(140, 7, 0)  # dark red
-            elif "demolished" in action.lower():
-                color = discord.Color.from_rgb(133, 86, 5)  # brown
-            elif "destroyed" in action.lower():
-                color = discord.Color.from_rgb(115, 114, 112)  # grey
-            elif "tamed" in action.lower():
-                reg = r'(.+) Tamed'
-                tamer = re.search(reg, action).group(1)
-                uid = await self.get_uid(players, tamer)
-                if uid:
+        tribe_ids = list(dict.fromkeys(event.tribe_id for event in events))
+        async with self.tribedata(guild, tribe_ids) as tribes:
+            for event in events:
+                tribe_id = event.tribe_id
+                if tribe_id not in tribes:
+                    tribes[tribe_id] = {
+                        "tribename": event.name,
+                        "owner": None,
+                        "channel": None,
+                        "allowed": [],
+                        "members": [],
+                        "kills": 0,
+                        "servername": servername
+                    }
+                tr = tribes[tribe_id]
+                if tr["tribename"] != event.name:
+                    tr["tribename"] = event.name
+                if "members" not in tr:
+                    tr["members"] = []
+                if not tr.get("servername"):
+                    tr["servername"] = servername
+                for member in event.members:
+                    if member not in tr["members"]:
+                        tr["members"].append(member)
+                if event.kill:
+                    tr["kills"] += 1
+            channels = {tribe_id: tribes[tribe_id]["channel"] for tribe_id in tribe_ids}
+
+        # Each character is looked up once per batch, then only the players involved get loaded and written
+        uids = {}
+        credits = []
+        for event in events:
+            for character, stat in event.credits:
+                if character not in uids:
+                    uids[character] = await self.get_uid(guild, character, server_id)
+                if uids[character]:
+                    credits.append((uids[character], stat))
+        if credits:
+            async with self.playerdata(guild, list({uid for uid, _ in credits})) as players:
+                for uid, stat in credits:
+                    if uid not in players:
+                        continue
                     if server_id not in players[uid]["ingame"]:
-                        players[uid]["ingame"][server_id] = playerdata
-                    # Add to player tame count
-                    players[uid]["ingame"][server_id]["stats"]["tamed"] += 1
-                color = discord.Color.from_rgb(0, 242, 117)  # lime
-            elif "froze" in action.lower():
-                color = discord.Color.from_rgb(0, 247, 255)  # cyan
-            elif "claimed" in action.lower():
-                color = discord.Color.from_rgb(255, 0, 225)  # pink
-            elif "unclaimed" in action.lower():
-                color = discord.Color.from_rgb(102, 0, 90)  # dark purple
-            elif "uploaded" in action.lower():
-                color = discord.Color.from_rgb(255, 255, 255)  # white
-            elif "downloaded" in action.lower():
-                color = discord.Color.from_rgb(2, 2, 117)  # dark blue
-            else:
-                color = discord.Color.purple()
-        embed = discord.Embed(
-            title=f"{server['cluster'].upper()} {server['name'].capitalize()}: {name}",
-            color=color,
-            description=f"```py\n{action}\n```"
-        )
-        embed.set_footer(text=f"{time} | Tribe ID: {tribe_id}")
-        return tribe_id, embed
+                        players[uid]["ingame"][server_id] = {
+                            "implant": None,
+                            "name": None,
+                            "previous_names": [],
+                            "stats": {
+                                "pvpkills": 0,
+                                "pvpdeaths": 0,
+                                "pvedeaths": 0,
+                                "tamed": 0
+                            }
+                        }
+                    if "stats" in players[uid]["ingame"][server_id]:
+                        players[uid]["ingame"][server_id]["stats"][stat] += 1
+        return channels
 
-    # Fetch a user ID from a given character name if it exists
-    @staticmethod
-    async def get_uid(players: dict, character_name: str) -> str:
+    # Fetch a user ID from a given character name if it exists, preferring players on the same map
+    async def get_uid(self, guild: discord.guild, character_name: str, server_id: str = None) -> str:
         if isinstance(character_name, tuple):
             character_name = character_name[0]
             if not character_name:
@@ -517,45 +747,11 @@ class ArkTools(Calls, commands.Cog):
             return ""
         if character_name.lower() in ["human", "humano"]:
             return ""  # Dont bother logging players that dont name their character
-        for uid, data in players.items():
-            ig = data["ingame"]
-            for channel, details in ig.items():
-                if "name" in details:
-                    name = details["name"]
-                    if name == character_name:
-                        return uid
-
-    # Cleans up the most recent live embed posted in the status channel
-    async def status_cleaner(self, status: dict):
-        message = status["message"]
-        multi = status["multi"]
-        channel_id = status["channel"]
-        channel = self.bot.get_channel(channel_id)
-        if not channel:
-            log.warning(f"Status cleaner cant find channel {channel_id}")
-            return
-        try:
-            if message:
-                msg_to_delete = await channel.fetch_message(message)
-                if msg_to_delete:
-                    await msg_to_delete.delete()
-            if multi:
-                for msg in multi:
-                    msg_to_delete = await channel.fetch_message(msg)
-                    if msg_to_delete:
-                        await msg_to_delete.delete()
-        except discord.NotFound:  # Message could have already been deleted
-            return
-        except discord.Forbidden:  # User could have imported config from another bot
-            log.warning(f"Cannot delete message in {channel.name} channel in {channel.guild.name}")
-            return
-        except Exception as e:
-            if "503 Service Unavailable" in str(e):
-                return
-            else:
-                cleanup_type = "Status" if message else "Multi-Status"
-                log.warning(f"{cleanup_type} Cleanup: {e}")
-                return
+        for uid in await self.find_character(guild, character_name, server_id):
+            return uid
+        for uid in await self.find_character(guild, character_name):
+            return uid
+        return ""
 
     # Pull the first (authorized) token found (for api calls where the token owner doesnt matter)
     @staticmethod
@@ -594,13 +790,15 @@ class ArkTools(Calls, commands.Cog):
         return command, arg
 
     # Find xuid from given gamertag
-    @staticmethod
-    async def get_player(gamertag: str, players: dict):
-        for xuid, stats in players.items():
-            if gamertag.lower() == stats["username"].lower():
-                return xuid, stats
-        else:
+    async def get_player(self, guild: discord.guild, gamertag: str, players: dict = None):
+        xuid = await self.find_gamertag(guild, gamertag, players)
+        if not xuid:
             return None, None
+        if players is None or guild.id in self.dbguilds:
+            players = await self.playerdata(guild, [xuid])
+        if xuid in players:
+            return xuid, players[xuid]
+        return None, None
 
     # Is player registered in-game on a server?
     @staticmethod
@@ -618,13 +816,14 @@ class ArkTools(Calls, commands.Cog):
         if implant:
             return implant
 
-    @staticmethod
-    async def check_reg_status(settings: dict, uid: int):
-        stats = settings["players"]
-        for xuid, stat in stats.items():
-            if "discord" in stat:
-                if stat["discord"] == uid:
-                    return stat["username"]
+    async def check_reg_status(self, guild: discord.guild, uid: int):
+        xuids = await self.find_discord(guild, uid)
+        if not xuids:
+            return None
+        stats = await self.playerdata(guild, xuids)
+        for xuid in xuids:
+            if xuid in stats:
+                return stats[xuid]["username"]
 
     @commands.command(name="xboxdm", aliases=["xdm"])
     @commands.guild_only()
@@ -654,25 +853,23 @@ class ArkTools(Calls, commands.Cog):
             return await ctx.send("That server has no tokens")
         tokens = clusters[cname]["servers"][sname]["tokens"]
         async with ctx.typing():
-            async with aiohttp.ClientSession() as session:
-                xbl_client, token = await self.auth_manager(
-                    session,
-                    cname,
-                    sname,
-                    tokens,
-                    ctx
-                )
-                if xbl_client:
-                    try:
-                        await xbl_client.message.send_message(xuid, message)
-                        sent = True
-                    except Exception as e:
-                        log.warning(f"{sname} {cname} failed to send a message to {xuid}: {e}")
-                        sent = False
-                if sent:
-                    await ctx.tick()
-                else:
-                    await ctx.send("Message failed to send!")
+            xbl_client, token = await self.auth_manager(
+                cname,
+                sname,
+                tokens,
+                ctx
+            )
+            if xbl_client:
+                try:
+                    await xbl_client.message.send_message(xuid, message)
+                    sent = True
+                except Exception as e:
+                    log.warning(f"{sname} {cname} failed to send a message to {xuid}: {e}")
+                    sent = False
+            if sent:
+                await ctx.tick()
+            else:
+                await ctx.send("Message failed to send!")
 
     # Hard coded item send for those hard times
     # Sends some in-game items that can help get a player unstuck, or just kill themselves
@@ -741,6 +938,10 @@ class ArkTools(Calls, commands.Cog):
     async def wipe_all_data(self, ctx: commands.Context):
         """Wipe ALL ArkTools cog data"""
         await self.config.guild(ctx.guild).clear()
+        if ctx.guild.id in self.dbguilds:
+            await self.db.clear(ctx.guild.id)
+            self.dbguilds.discard(ctx.guild.id)
+        self.drop_index(ctx.guild)
         await ctx.tick()
 
     # Deletes all player data in the config
@@ -753,9 +954,9 @@ class ArkTools(Calls, commands.Cog):
 
         Includes last seen data and registration.
         """
-        async with self.config.guild(ctx.guild).all() as data:
-            data["players"].clear()
-            await ctx.send(embed=discord.Embed(description="All player data has been wiped."))
+        await self.set_playerdata(ctx.guild, {})
+        self.drop_index(ctx.guild)
+        await ctx.send(embed=discord.Embed(description="All player data has been wiped."))
 
     # Reset graph data
     @commands.command(name="wipegraphdata")
@@ -767,7 +968,9 @@ class ArkTools(Calls, commands.Cog):
             for sname, slist in settings["serverstats"].items():
                 if sname != "expiration":
                     slist.clear()
-            await ctx.tick()
+        await self.graphs.wipe(ctx.guild.id)
+        self.renderer.forget(ctx.guild.id)
+        await ctx.tick()
 
     # Reset tribe data
     @commands.command(name="wipetribedata")
@@ -775,7 +978,7 @@ class ArkTools(Calls, commands.Cog):
     @commands.guild_only()
     async def wipe_tribe_data(self, ctx: commands.Context):
         """Reset all tribe data"""
-        async with self.config.guild(ctx.guild).tribes() as tribes:
+        async with self.tribedata(ctx.guild) as tribes:
             tribes.clear()
             await ctx.tick()
 
@@ -785,17 +988,18 @@ class ArkTools(Calls, commands.Cog):
     @commands.guild_only()
     async def unregister_user(self, ctx: commands.Context, member: discord.Member):
         """Force unregister a discord user"""
-        async with self.config.guild(ctx.guild).players() as players:
+        xuids = await self.find_discord(ctx.guild, member.id)
+        async with self.playerdata(ctx.guild, xuids) as players:
             unreg = []
-            for xuid, data in players.items():
-                if "discord" in data:
-                    if data["discord"] == member.id:
-                        unreg.append((xuid, data["username"]))
+            for xuid in xuids:
+                if xuid in players:
+                    unreg.append((xuid, players[xuid]["username"]))
             if len(unreg) == 0:
                 return await ctx.send(f"{member.mention} not found registered to any Gamertag!")
             for xuid, gamertag in unreg:
                 await ctx.send(f"{member.mention} has been unregistered from the Gamertag {gamertag}")
                 del players[xuid]["discord"]
+                self.reindex(ctx.guild, players, xuid)
 
     # Lets a player unregister themselves
     @commands.command(name="unregisterme")
@@ -807,35 +1011,38 @@ class ArkTools(Calls, commands.Cog):
         Removes you from any Gamertags you have registered to
         """
         myself = ctx.author.id
-        async with self.config.guild(ctx.guild).players() as players:
+        xuids = await self.find_discord(ctx.guild, myself)
+        async with self.playerdata(ctx.guild, xuids) as players:
             unreg = []
-            for xuid, data in players.items():
-                if "discord" in data:
-                    if data["discord"] == myself:
-                        unreg.append((xuid, data["username"]))
+            for xuid in xuids:
+                if xuid in players:
+                    unreg.append((xuid, players[xuid]["username"]))
             if len(unreg) == 0:
                 return await ctx.send(f"You arent registered to any Gamertag!")
             for xuid, gamertag in unreg:
                 await ctx.send(f"Unregistered you from {gamertag}!")
                 del players[xuid]["discord"]
+                self.reindex(ctx.guild, players, xuid)
 
     @commands.command(name="unregistergt")
     @commands.admin()
     @commands.guild_only()
     async def unregister_gamertag(self, ctx: commands.Context, gamertag: str):
         """Force unregister a Gamertag"""
-        async with self.config.guild(ctx.guild).players() as players:
+        xuid = await self.find_gamertag(ctx.guild, gamertag)
+        xuids = [xuid] if xuid else []
+        async with self.playerdata(ctx.guild, xuids) as players:
             unreg = []
-            for xuid, data in players.items():
-                if "discord" in data:
-                    if data["username"].lower() == gamertag.lower():
-                        unreg.append((xuid, data["discord"]))
+            for xuid in xuids:
+                if xuid in players and "discord" in players[xuid]:
+                    unreg.append((xuid, players[xuid]["discord"]))
             if len(unreg) == 0:
                 return await ctx.send(f"{gamertag} not found registered to any Gamertag!")
             for xuid, user in unreg:
                 user = ctx.guild.get_member(user)
                 await ctx.send(f"Removed {user} from {gamertag}")
                 del players[xuid]["discord"]
+                self.reindex(ctx.guild, players, xuid)
 
     # Delete a player from the player data
     @commands.command(name="deleteplayer")
@@ -843,11 +1050,11 @@ class ArkTools(Calls, commands.Cog):
     @commands.guild_only()
     async def delete_player(self, ctx: commands.Context, xuid: str):
         """Delete player data from the server stats"""
-        async with self.config.guild(ctx.guild).players() as players:
-            for pid, data in players.items():
-                if str(xuid) == str(pid):
-                    del players[pid]
-                    return await ctx.tick()
+        async with self.playerdata(ctx.guild, [str(xuid)]) as players:
+            if str(xuid) in players:
+                del players[str(xuid)]
+                self.reindex(ctx.guild, players, str(xuid))
+                return await ctx.tick()
 
     # Initializes a player to the stats section, or appends their discord ID to existing gamertag in database
     @commands.command(name="register")
@@ -859,7 +1066,7 @@ class ArkTools(Calls, commands.Cog):
             return message.author == ctx.author and message.channel == ctx.channel
 
         settings = await self.config.guild(ctx.guild).all()
-        user = await self.check_reg_status(settings, ctx.author.id)
+        user = await self.check_reg_status(ctx.guild, ctx.author.id)
         if user:
             return await ctx.send(f"You are already registered as **{user}**\n"
                                   f"If you want to re-register, type `{ctx.prefix}unregisterme` "
@@ -934,53 +1141,53 @@ class ArkTools(Calls, commands.Cog):
             )
             embed.set_thumbnail(url=LOADING)
             await msg.edit(embed=embed)
-            async with aiohttp.ClientSession() as session:
-                tokens, cname, sname = self.pull_key(clusters)
-                xbl_client, _ = await self.auth_manager(session, cname, sname, tokens, ctx)
-                if not xbl_client:
-                    return
-                try:
-                    profile_data = json.loads((await xbl_client.profile.get_profile_by_gamertag(gamertag)).json())
-                except aiohttp.ClientResponseError:
-                    embed = discord.Embed(
-                        description=f"Looks like **{gamertag}** is an invalid Gamertag. Try again.",
-                        color=discord.Color.red()
-                    )
-                    return await msg.edit(embed=embed)
-                # Format json data
-                gt, xuid, gs, pfp = profile_format(profile_data)
-                async with self.config.guild(ctx.guild).players() as players:
-                    if xuid in players:
-                        if "discord" in players[xuid]:
-                            if players[xuid]["discord"] != ctx.author.id:
-                                claimed = ctx.guild.get_member(players[xuid]["discord"])
-                                if claimed:  # If user is still in guild
-                                    embed = discord.Embed(
-                                        description=f"{claimed.mention} has already claimed this Gamertag",
-                                        color=discord.Color.orange()
-                                    )
-                                    return await msg.edit(embed=embed)
-                                else:
-                                    # Original claim user left guild so that gamertag is up for grabs
-                                    players[xuid]["discord"] = ctx.author.id
-                            if players[xuid]["discord"] == ctx.author.id:
+            tokens, cname, sname = self.pull_key(clusters)
+            xbl_client, _ = await self.auth_manager(cname, sname, tokens, ctx)
+            if not xbl_client:
+                return
+            try:
+                profile_data = json.loads((await xbl_client.profile.get_profile_by_gamertag(gamertag)).json())
+            except aiohttp.ClientResponseError:
+                embed = discord.Embed(
+                    description=f"Looks like **{gamertag}** is an invalid Gamertag. Try again.",
+                    color=discord.Color.red()
+                )
+                return await msg.edit(embed=embed)
+            # Format json data
+            gt, xuid, gs, pfp = profile_format(profile_data)
+            async with self.playerdata(ctx.guild, [xuid]) as players:
+                if xuid in players:
+                    if "discord" in players[xuid]:
+                        if players[xuid]["discord"] != ctx.author.id:
+                            claimed = ctx.guild.get_member(players[xuid]["discord"])
+                            if claimed:  # If user is still in guild
                                 embed = discord.Embed(
-                                    description=f"You have already claimed this Gamertag",
-                                    color=discord.Color.green()
+                                    description=f"{claimed.mention} has already claimed this Gamertag",
+                                    color=discord.Color.orange()
                                 )
                                 return await msg.edit(embed=embed)
-                        players[xuid]["discord"] = ctx.author.id
-                    else:
-                        players[xuid] = {
-                            "discord": ctx.author.id,
-                            "username": gt,
-                            "playtime": {"total": 0},
-                            "lastseen": {
-                                "time": datetime.datetime.now(pytz.timezone("UTC")).isoformat(),
-                                "map": None
-                            },
-                            "ingame": {}
-                        }
+                            else:
+                                # Original claim user left guild so that gamertag is up for grabs
+                                players[xuid]["discord"] = ctx.author.id
+                        if players[xuid]["discord"] == ctx.author.id:
+                            embed = discord.Embed(
+                                description=f"You have already claimed this Gamertag",
+                                color=discord.Color.green()
+                            )
+                            return await msg.edit(embed=embed)
+                    players[xuid]["discord"] = ctx.author.id
+                else:
+                    players[xuid] = {
+                        "discord": ctx.author.id,
+                        "username": gt,
+                        "playtime": {"total": 0},
+                        "lastseen": {
+                            "time": datetime.datetime.now(pytz.timezone("UTC")).isoformat(),
+                            "map": None
+                        },
+                        "ingame": {}
+                    }
+                self.reindex(ctx.guild, players, xuid)
             rem = f"If the image above does not match your Gamertag, use '{ctx.prefix}unregisterme' and try again"
             embed = discord.Embed(
                 title="✅ Registration Successful!",
@@ -1041,7 +1248,7 @@ class ArkTools(Calls, commands.Cog):
                 return await msg.edit(embed=embed)
 
         uid = reply.content
-        players = await self.config.guild(ctx.guild).players()
+        players = await self.playerdata(ctx.guild, [uid])
         if uid in players and "discord" in players[uid]:
             if players[uid]["discord"] != ctx.author.id:
                 claimed = ctx.guild.get_member(players[uid]["discord"])
@@ -1067,7 +1274,7 @@ class ArkTools(Calls, commands.Cog):
             return await msg.edit(embed=discord.Embed(description="You took too long :yawning_face:"))
 
         username = reply.content
-        async with self.config.guild(ctx.guild).players() as players:
+        async with self.playerdata(ctx.guild, [uid]) as players:
             if uid in players:
                 players[uid]["discord"] = ctx.author.id
             else:
@@ -1081,6 +1288,7 @@ class ArkTools(Calls, commands.Cog):
                     },
                     "ingame": {}
                 }
+            self.reindex(ctx.guild, players, uid)
         embed = discord.Embed(
             description=f"Your {nametype} has been set to `{username}`\n"
                         f"{id_type}: `{uid}`",
@@ -1100,12 +1308,12 @@ class ArkTools(Calls, commands.Cog):
 
         This command requires api keys to be set for the servers
         """
-        players = await self.config.guild(ctx.guild).players()
-        for xuid in players:
-            if "discord" in players[xuid]:
-                if ctx.author.id == players[xuid]["discord"]:
-                    ptag = players[xuid]["username"]
-                    break
+        xuids = await self.find_discord(ctx.guild, ctx.author.id)
+        players = await self.playerdata(ctx.guild, xuids)
+        for xuid in xuids:
+            if xuid in players:
+                ptag = players[xuid]["username"]
+                break
         else:
             embed = discord.Embed(description=f"You havent registered yet!\n\n"
                                               f"Register with the `{ctx.prefix}register` command.")
@@ -1160,27 +1368,26 @@ class ArkTools(Calls, commands.Cog):
                 for sname, server in cluster["servers"].items():
                     if "tokens" in server:
                         tokendata = server["tokens"]
-                        async with aiohttp.ClientSession() as session:
-                            xbl_client, token = await self.auth_manager(session, cname, sname, tokendata, ctx)
-                            if not xbl_client:
-                                addstatus += f"`{server['gamertag']}: `❌\n"
-                                continue
-                            status = await self.add_friend(xuid, token)
-                            if 200 <= status <= 204:
-                                embed = discord.Embed(
-                                    description=f"Friend request sent from... `{server['gamertag']}`",
-                                    color=discord.Color.green()
-                                )
-                                embed.set_thumbnail(url=LOADING)
-                                addstatus += f"`{server['gamertag']}: `✅\n"
-                            else:
-                                embed = discord.Embed(
-                                    description=f"Friend request from `{server['gamertag']}` may have failed!",
-                                    color=discord.Color.red()
-                                )
-                                embed.set_thumbnail(url=FAILED)
-                                addstatus += f"`{server['gamertag']}: `❌\n"
-                            await msg.edit(embed=embed)
+                        xbl_client, token = await self.auth_manager(cname, sname, tokendata, ctx)
+                        if not xbl_client:
+                            addstatus += f"`{server['gamertag']}: `❌\n"
+                            continue
+                        status = await self.add_friend(xuid, token)
+                        if 200 <= status <= 204:
+                            embed = discord.Embed(
+                                description=f"Friend request sent from... `{server['gamertag']}`",
+                                color=discord.Color.green()
+                            )
+                            embed.set_thumbnail(url=LOADING)
+                            addstatus += f"`{server['gamertag']}: `✅\n"
+                        else:
+                            embed = discord.Embed(
+                                description=f"Friend request from `{server['gamertag']}` may have failed!",
+                                color=discord.Color.red()
+                            )
+                            embed.set_thumbnail(url=FAILED)
+                            addstatus += f"`{server['gamertag']}: `❌\n"
+                        await msg.edit(embed=embed)
             embed = discord.Embed(color=discord.Color.green(),
                                   description=f"✅ Finished adding `{players[xuid]['username']}` for All Gamertags.\n"
                                               f"You should now be able to join from the Gamertags' profile page.")
@@ -1212,31 +1419,30 @@ class ArkTools(Calls, commands.Cog):
             )
             embed.set_thumbnail(url=LOADING)
             await msg.edit(embed=embed)
-            async with aiohttp.ClientSession() as session:
-                xbl_client, token = await self.auth_manager(session, cname, sname, tokendata, ctx)
-                if not xbl_client:
-                    embed = discord.Embed(
-                        description=f"Friend request from `{gt}` may have failed!",
-                        color=discord.Color.red()
-                    )
-                    embed.set_thumbnail(url=FAILED)
-                    return await msg.edit(embed=embed)
-                status = await self.add_friend(xuid, token)
-                if 200 <= status <= 204:
-                    embed = discord.Embed(color=discord.Color.green(),
-                                          description=f"✅ `{gt}` Successfully added `{ptag}`\n"
-                                                      f"You should now be able to join from the Gamertag's"
-                                                      f" profile page.\n\n"
-                                                      f"**TO ADD MORE:** type `{ctx.prefix}addme` again.")
-                    embed.set_author(name="Success", icon_url=ctx.author.avatar_url)
-                    embed.set_thumbnail(url=SUCCESS)
-                else:
-                    embed = discord.Embed(
-                        description=f"Friend request from `{gt}` may have failed!",
-                        color=discord.Color.red()
-                    )
-                    embed.set_thumbnail(url=FAILED)
-                await msg.edit(embed=embed)
+            xbl_client, token = await self.auth_manager(cname, sname, tokendata, ctx)
+            if not xbl_client:
+                embed = discord.Embed(
+                    description=f"Friend request from `{gt}` may have failed!",
+                    color=discord.Color.red()
+                )
+                embed.set_thumbnail(url=FAILED)
+                return await msg.edit(embed=embed)
+            status = await self.add_friend(xuid, token)
+            if 200 <= status <= 204:
+                embed = discord.Embed(color=discord.Color.green(),
+                                      description=f"✅ `{gt}` Successfully added `{ptag}`\n"
+                                                  f"You should now be able to join from the Gamertag's"
+                                                  f" profile page.\n\n"
+                                                  f"**TO ADD MORE:** type `{ctx.prefix}addme` again.")
+                embed.set_author(name="Success", icon_url=ctx.author.avatar_url)
+                embed.set_thumbnail(url=SUCCESS)
+            else:
+                embed = discord.Embed(
+                    description=f"Friend request from `{gt}` may have failed!",
+                    color=discord.Color.red()
+                )
+                embed.set_thumbnail(url=FAILED)
+            await msg.edit(embed=embed)
         else:
             color = discord.Color.dark_grey()
             return await msg.edit(embed=discord.Embed(description="Incorrect Reply, menu closed.", color=color))
@@ -1266,7 +1472,6 @@ class ArkTools(Calls, commands.Cog):
         cd = settings["countdown"]
         if command.lower() == "doexit" and cd:  # Count down, save world, exit - for clean shutdown
             await ctx.send(f"Beginning {cd} second reboot countdown...")
-            alerts = []
             async with ctx.typing():
                 for server in serverlist:
                     mapchannel = ctx.guild.get_channel(server["chatchannel"])
@@ -1278,103 +1483,46 @@ class ArkTools(Calls, commands.Cog):
                         color=discord.Color.orange()
                     )
                     await mapchannel.send(embed=embed)
-                    broadcast = f'<RichColor Color="1,0,0,1">SERVER REBOOT IN {cd} SECONDS</>\n' \
-                                f'Make sure you are in a bed to avoid your character dying!'
-                    alerts.append(self.executor(ctx.guild, server, f"broadcast {broadcast}"))
-                await asyncio.gather(*alerts)
-                for i in range(cd, 0, -1):
-                    counting = []
-                    for server in serverlist:
-                        counting.append(self.executor(ctx.guild, server, f"serverchat Reboot in {i}"))
-                    await asyncio.gather(*counting)
-                    await asyncio.sleep(1)
-                await ctx.send("Saving maps...")
-                save = []
-                for server in serverlist:
-                    mapchannel = ctx.guild.get_channel(server["chatchannel"])
+                broadcast = f'<RichColor Color="1,0,0,1">SERVER REBOOT IN {cd} SECONDS</>\n' \
+                            f'Make sure you are in a bed to avoid your character dying!'
+                steps = [Step(0, f"broadcast {broadcast}")] + countdown_steps(cd)
+
+                async def before(step: Step):
+                    if step.command != "saveworld":
+                        return
                     embed = discord.Embed(
                         description="Saving map and exiting...",
                         color=discord.Color.purple()
                     )
-                    await mapchannel.send(embed=embed)
-                    save.append(self.executor(ctx.guild, server, f"saveworld"))
-                await asyncio.gather(*save)
-                await asyncio.sleep(2)
-                await ctx.send("Running DoExit...")
-                exiting = []
-                for server in serverlist:
-                    exiting.append(self.executor(ctx.guild, server, f"doexit"))
-                await asyncio.gather(*exiting)
+                    sends = []
+                    for s in serverlist:
+                        mapchannel = ctx.guild.get_channel(s["chatchannel"])
+                        if mapchannel:
+                            sends.append(mapchannel.send(embed=embed))
+                    await asyncio.gather(*sends, return_exceptions=True)
+
+                report = FanOutReport(ctx.channel, f"Reboot of {len(serverlist)} servers")
+                await self.fanout.sequence(serverlist, steps, report, before)
+                report.stage = ""
+                await report.finish()
         else:
-            rtasks = []
-            for server in serverlist:
-                rtasks.append(async_rcon(server, command, ctx.channel))
-            await asyncio.gather(*rtasks)
-
-        if command.lower().startswith("banplayer"):  # Have the host Gamertags block the user that was banned
-            player_id = str(re.search(r'(\d+)', command).group(1))
-            blocked = ""
+            report = FanOutReport(ctx.channel, f"{command} on {len(serverlist)} servers")
+            report.section("", len(serverlist))
             async with ctx.typing():
-                async with aiohttp.ClientSession() as session:
-                    for server in serverlist:
-                        if "tokens" in server:
-                            tokens = server["tokens"]
-                            host = server["gamertag"]
-                            xbl_client, token = await self.auth_manager(
-                                session,
-                                server["cluster"],
-                                server["name"],
-                                tokens,
-                                None,
-                                ctx.guild
-                            )
-                            if token:
-                                try:
-                                    status = await self.block_player(int(player_id), token)
-                                except Exception as e:
-                                    if "semaphore" in str(e):
-                                        pass
-                                if 200 <= status <= 204:
-                                    blocked += f"{host} Successfully blocked XUID: {player_id}\n"
-                                else:
-                                    blocked += f"{host} Failed to block XUID: {player_id} - Status: {status}\n"
-                            else:
-                                blocked += f"{host} Failed to block XUID: {player_id}"
-
-                    if blocked:
-                        await ctx.send(box(blocked, lang="python"))
+                await self.fanout.run(serverlist, command, 5, functools.partial(report.progress, ""))
+            await report.finish()
 
-        if command.lower().startswith("unbanplayer"):  # Have the host Gamertags unblock the user
+        # Have the host Gamertags block or unblock the player, results go to the event log once each host is done
+        if command.lower().startswith(("banplayer", "unbanplayer")):
             player_id = str(re.search(r'(\d+)', command).group(1))
-            unblocked = ""
-            async with ctx.typing():
-                async with aiohttp.ClientSession() as session:
-                    for server in serverlist:
-                        if "tokens" in server:
-                            tokens = server["tokens"]
-                            host = server["gamertag"]
-                            xbl_client, token = await self.auth_manager(
-                                session,
-                                server["cluster"],
-                                server["name"],
-                                tokens,
-                                None,
-                                ctx.guild
-                            )
-                            if token:
-                                try:
-                                    status = await self.unblock_player(int(player_id), token)
-                                except Exception as e:
-                                    if "semaphore" in str(e):
-                                        pass
-                                if 200 <= status <= 204:
-                                    unblocked += f"{host} Successfully unblocked XUID: {player_id}\n"
-                                else:
-                                    unblocked += f"{host} Failed to unblock XUID: {player_id} - Status: {status}\n"
-                            else:
-                                unblocked += f"{host} Failed to unblock XUID: {player_id}\n"
-                    if unblocked:
-                        await ctx.send(box(unblocked, lang="python"))
+            action = UNBLOCK if command.lower().startswith("unbanplayer") else BLOCK
+            hosts = []
+            for server in serverlist:
+                if "tokens" in server:
+                    self.social.put(SocialJob(ctx.guild.id, server["cluster"], server["name"], action, player_id))
+                    hosts.append(server.get("gamertag", f"{server['name']} {server['cluster']}"))
+            if hosts:
+                await ctx.send(box(f"Queued {action} of XUID {player_id} for: {', '.join(hosts)}", lang="python"))
 
     @commands.command(name="bulksend")
     @commands.guild_only()
@@ -1410,24 +1558,16 @@ class ArkTools(Calls, commands.Cog):
         await ctx.send("Sending items in bulk")
         command = f"giveitemtoplayer {implant_id} {blueprint_string}"
 
-        def sender():
-            try:
-                with Client(
-                        host=server['ip'],
-                        port=server['port'],
-                        passwd=server['password'],
-                        timeout=10
-                ) as client:
-                    for i in range(count):
-                        client.run(command)
-            except socket.timeout:
-                return
-            except Exception as e:
-                log.warning(f"Bulksend Error: {e}")
-
         async with ctx.typing():
-            await self.bot.loop.run_in_executor(None, sender)
-        await ctx.send("Bulk send complete")
+            name = f"{server['name']} {server['cluster']}"
+            res = await deliver_server(self.rcon, self.health, server, name, [command] * count)
+        if res.complete:
+            return await ctx.send(f"Bulk send complete, {count} sent in {round(res.took, 1)}s")
+        await ctx.send(f"Bulk send finished with {res.delivered}/{count} delivered ({res.error})")
+
+    async def deliver(self, serverlist: typing.List[typing.Tuple[str, dict]], cmds: typing.List[str]) -> list:
+        """Pipelined delivery of a batch of commands to each (name, server) pair, used by ArkShop"""
+        return await deliver(self.rcon, self.health, serverlist, cmds)
 
     @staticmethod
     def allowed_to_run(ctx: commands.Context, settings: dict, command: str):
@@ -1487,12 +1627,12 @@ class ArkTools(Calls, commands.Cog):
                               description=f"Gathering Data...")
         embed.set_thumbnail(url=LOADING)
         msg = await ctx.send(embed=embed)
-        settings = await self.config.guild(ctx.guild).all()
+        timezone = await self.config.guild(ctx.guild).timezone()
         if not hours:
             hours = 1
         # Convert to float and back to int to handle if someone types a float
         hours = float(hours)
-        file = await get_graph(settings, int(hours))
+        file = await self.graph_file(ctx.guild, int(hours), timezone)
         await msg.delete()
         if file:
             await ctx.send(file=file)
@@ -1504,7 +1644,7 @@ class ArkTools(Calls, commands.Cog):
     @commands.guild_only()
     async def ark_playtime_overview(self, ctx: commands.Context):
         """View overview of players playtimes"""
-        stats = await self.config.guild(ctx.guild).players()
+        stats = await self.playerdata(ctx.guild)
         tz = await self.config.guild(ctx.guild).timezone()
         pages = overview_format(stats, ctx.guild, tz)
         if len(pages) == 0:
@@ -1519,7 +1659,7 @@ class ArkTools(Calls, commands.Cog):
     @commands.guild_only()
     async def ark_leaderboard(self, ctx: commands.Context):
         """View the playtime leaderboard"""
-        stats = await self.config.guild(ctx.guild).players()
+        stats = await self.playerdata(ctx.guild)
         pages = lb_format(stats, ctx.guild)
         if len(pages) == 0:
             return await ctx.send("There are no stats available yet!")
@@ -1533,7 +1673,7 @@ class ArkTools(Calls, commands.Cog):
     @commands.guild_only()
     async def tribe_leaderboard(self, ctx: commands.Context):
         """View leaderboard for all tribes"""
-        tribes = await self.config.guild(ctx.guild).tribes()
+        tribes = await self.tribedata(ctx.guild)
         pages = tribe_lb_format(tribes, ctx.guild)
         if len(pages) == 0:
             return await ctx.send("There are no tribes available yet!")
@@ -1547,7 +1687,7 @@ class ArkTools(Calls, commands.Cog):
     @commands.guild_only()
     async def cluster_stats(self, ctx: commands.Context):
         """View playtime data for all clusters"""
-        stats = await self.config.guild(ctx.guild).players()
+        stats = await self.playerdata(ctx.guild)
         pages = cstats_format(stats, ctx.guild)
         if not pages:
             return await ctx.send("No data to display yet!")
@@ -1578,15 +1718,14 @@ class ArkTools(Calls, commands.Cog):
         @mention
         ```
         """
-        settings = await self.config.guild(ctx.guild).all()
+        settings = await self.full_settings(ctx.guild)
         stats = settings["players"]
         if not gamertag_or_user:
             # If user is registered, pull their own stats
-            for xuid, data in stats.items():
-                if "discord" in data:
-                    if ctx.author.id == data["discord"]:
-                        gamertag = data["username"]
-                        break
+            for xuid in await self.find_discord(ctx.guild, ctx.author.id, stats):
+                if xuid in stats:
+                    gamertag = stats[xuid]["username"]
+                    break
             else:
                 embed = discord.Embed(description=f"You haven't registered yet!\n"
                                                   f"Register with the `{ctx.prefix}register` command.")
@@ -1595,28 +1734,24 @@ class ArkTools(Calls, commands.Cog):
         else:
             if isinstance(gamertag_or_user, discord.Member):
                 # If a discord ID or mention is passed, pull their data from ID
-                for xuid, data in stats.items():
-                    if "discord" in data:
-                        if gamertag_or_user.id == data["discord"]:
-                            gamertag = data["username"]
-                            break
+                for xuid in await self.find_discord(ctx.guild, gamertag_or_user.id, stats):
+                    if xuid in stats:
+                        gamertag = stats[xuid]["username"]
+                        break
                 else:
                     # Check if user is in discord, has the exact same name, but hasnt registered
-                    for data in stats.values():
-                        if data["username"].lower() == str(gamertag_or_user.name).lower():
-                            gamertag = str(gamertag_or_user.name)
-                            break
+                    if await self.find_gamertag(ctx.guild, str(gamertag_or_user.name), stats):
+                        gamertag = str(gamertag_or_user.name)
                     else:
                         embed = discord.Embed(description=f"{gamertag_or_user.name} never registered.")
                         embed.set_thumbnail(url=FAILED)
                         return await ctx.send(embed=embed)
             elif gamertag_or_user.isdigit():
                 # User either entered an XUID, Steam ID, or Discord ID that isnt in guild anymore
-                for xuid, data in stats.items():
-                    if "discord" in data:
-                        if int(gamertag_or_user) == data["discord"]:
-                            gamertag = data["username"]
-                            break
+                for xuid in await self.find_discord(ctx.guild, int(gamertag_or_user), stats):
+                    if xuid in stats:
+                        gamertag = stats[xuid]["username"]
+                        break
                 else:
                     # See if person entered XUID or steam ID instead of discord ID
                     if gamertag_or_user in stats:
@@ -1637,20 +1772,11 @@ class ArkTools(Calls, commands.Cog):
     @commands.guild_only()
     async def find_player_by_character(self, ctx: commands.Context, *, character_name: str):
         """Find player by character name"""
-        players = await self.config.guild(ctx.guild).players()
-        uids = []
+        uids = await self.find_character(ctx.guild, character_name)
+        players = await self.playerdata(ctx.guild, uids)
+        uids = [uid for uid in uids if uid in players]
         headers = ["Gamertag", "PlayerID"]
-        table = []
-        for uid, data in players.items():
-            ig = data["ingame"]
-            for channel, details in ig.items():
-                name = details["name"]
-                if name:
-                    if name.lower() == character_name.lower():
-                        gt = data["username"]
-                        if uid not in uids:
-                            uids.append(uid)
-                            table.append([gt, uid])
+        table = [[players[uid]["username"], uid] for uid in uids]
         if uids:
             found = box(tabulate.tabulate(table, headers, tablefmt="presto"), lang="python")
             embed = discord.Embed(title="Found Matches", description=found)
@@ -1681,7 +1807,10 @@ class ArkTools(Calls, commands.Cog):
         total_seconds = await time_from_string(time)
         if not total_seconds:
             return await ctx.send("I was not able to figure out how much time that is, try wording it differently")
-        data = await self.config.guild(ctx.guild).players()
+        if ctx.guild.id in self.dbguilds:
+            data = await self.db.lastseen(ctx.guild.id)
+        else:
+            data = await self.config.guild(ctx.guild).players()
         if not data:
             return await ctx.send("No player data yet!")
         current_time = datetime.datetime.now(pytz.timezone("UTC"))
@@ -1695,9 +1824,10 @@ class ArkTools(Calls, commands.Cog):
                 if td >= total_seconds:
                     to_delete.append(uid)
             if to_delete:
-                async with self.config.guild(ctx.guild).players() as data:
+                async with self.playerdata(ctx.guild, to_delete) as data:
                     for uid in to_delete:
                         del data[uid]
+                    self.reindex(ctx.guild, data, *to_delete)
                 pruned = len(to_delete)
                 await ctx.send(f"Pruned {pruned} players from cog data")
             else:
@@ -1757,6 +1887,9 @@ class ArkTools(Calls, commands.Cog):
         Sends a full backup of the config as a JSON file to Discord.
         """
         settings = await self.config.all_guilds()
+        for guild_id in settings:
+            if guild_id in self.dbguilds:
+                settings[guild_id]["players"], settings[guild_id]["tribes"] = await self.db.export(guild_id)
         settings = json.dumps(settings)
         filename = f"{ctx.guild}_full_config.json"
         with open(filename, "w") as file:
@@ -1776,7 +1909,10 @@ class ArkTools(Calls, commands.Cog):
 
         Sends a backup of the config as a JSON file to Discord.
         """
-        settings = await self.config.guild(ctx.guild).all()
+        settings = await self.full_settings(ctx.guild)
+        graphdata = self.graphs.export(ctx.guild.id)
+        if graphdata:
+            settings["serverstats"] = graphdata
         settings = json.dumps(settings)
         filename = f"{ctx.guild}_config.json"
         with open(filename, "w") as file:
@@ -1820,7 +1956,7 @@ class ArkTools(Calls, commands.Cog):
 
         Sends a backup of the player stats as a JSON file to Discord.
         """
-        settings = await self.config.guild(ctx.guild).players()
+        settings = await self.playerdata(ctx.guild)
         settings = json.dumps(settings)
         filename = f"{ctx.guild}_playerstats.json"
         with open(filename, "w") as file:
@@ -1840,7 +1976,7 @@ class ArkTools(Calls, commands.Cog):
 
         Sends a backup of the graph data for graphing as a JSON file to Discord.
         """
-        settings = await self.config.guild(ctx.guild).serverstats()
+        settings = self.graphs.export(ctx.guild.id) or await self.config.guild(ctx.guild).serverstats()
         settings = json.dumps(settings)
         filename = f"{ctx.guild}_graphdata.json"
         with open(filename, "w") as file:
@@ -1869,7 +2005,7 @@ class ArkTools(Calls, commands.Cog):
                 guild = self.bot.get_guild(int(guild_id))
                 if not guild:
                     continue
-                await self.config.guild(guild).set(data)
+                await self.save_settings(guild, data)
             await self.initialize()
             return await ctx.send("Config restored from backup file!")
         else:
@@ -1888,7 +2024,7 @@ class ArkTools(Calls, commands.Cog):
             async with aiohttp.ClientSession() as session:
                 async with session.get(attachment_url) as resp:
                     config = await resp.json()
-            await self.config.guild(ctx.guild).set(config)
+            await self.save_settings(ctx.guild, config)
             await self.initialize()
             return await ctx.send("Config restored from backup file!")
         else:
@@ -1927,7 +2063,8 @@ class ArkTools(Calls, commands.Cog):
             async with aiohttp.ClientSession() as session:
                 async with session.get(attachment_url) as resp:
                     config = await resp.json()
-            await self.config.guild(ctx.guild).players.set(config)
+            await self.set_playerdata(ctx.guild, config)
+            self.drop_index(ctx.guild)
             await self.initialize()
             return await ctx.send("Player stats restored from backup file!")
         else:
@@ -1952,6 +2089,152 @@ class ArkTools(Calls, commands.Cog):
         else:
             return await ctx.send("Attach your backup file to the message when using this command.")
 
+    @arktools_main.command(name="graphbench")
+    @commands.is_owner()
+    async def graph_benchmark(self, ctx: commands.Context):
+        """
+        Benchmark graph downsampling
+
+        Times the old every-Nth-point staggering against the min/max and mean downsamplers
+        on 30, 60 and 90 days of generated minute data with 3 clusters.
+        `Peak` is whether the highest player count survived into the drawn points.
+        """
+        async with ctx.typing():
+            rows = await asyncio.get_running_loop().run_in_executor(None, downsample_benchmark)
+        table = tabulate.tabulate(
+            rows,
+            headers=["Window", "Method", "Points", "Took", "Peak"],
+            tablefmt="presto"
+        )
+        await ctx.send(box(table, lang="python"))
+
+    @arktools_main.command(name="chatbench")
+    @commands.is_owner()
+    async def chat_benchmark(self, ctx: commands.Context, source: str = "corpus"):
+        """
+        Benchmark the getchat parser
+
+        Parses getchat output with the old message_handler filtering and the parser.
+        By default this is the bundled corpus, which is synthetic. It should always classify the same way,
+        a mismatch means the parser's behavior changed.
+        Use `captured` to run on this guild's captured RCON traffic instead, see `arktools server capture`.
+        """
+        loop = asyncio.get_running_loop()
+        if source.lower() == "captured":
+            files = self.capture.files(ctx.guild.id)
+            if not files:
+                return await ctx.send("There is no captured traffic for this guild, turn it on with `arktools server capture`")
+            async with ctx.typing():
+                entries = await loop.run_in_executor(None, TrafficCapture.read, files)
+            buffers = [
+                e["response"] for e in entries
+                if e["command"] == "getchat" and e["response"]
+                and "Server received, But no response!!" not in e["response"]
+            ]
+            if not buffers:
+                return await ctx.send("The captures don't have any getchat output yet")
+            expected = None
+        else:
+            buffers = await loop.run_in_executor(None, load_corpus, bundled_data_path(self) / "getchat_corpus.txt")
+            expected = CORPUS_EXPECTED
+        async with ctx.typing():
+            rows, counts = await loop.run_in_executor(None, getchat_benchmark, buffers)
+        table = tabulate.tabulate(
+            rows,
+            headers=["Parser", "Lines", "Took", "Lines/s"],
+            tablefmt="presto"
+        )
+        if expected:
+            kinds = tabulate.tabulate(
+                [[kind, count, expected[kind], "Yes" if count == expected[kind] else "NO"]
+                 for kind, count in counts.items()],
+                headers=["Type", "Parsed", "Expected", "Match"],
+                tablefmt="presto"
+            )
+        else:
+            kinds = tabulate.tabulate(
+                [[kind, count] for kind, count in counts.items()],
+                headers=["Type", "Parsed"],
+                tablefmt="presto"
+            )
+        await ctx.send(box(f"{table}\n\n{kinds}", lang="python"))
+
+    @arktools_main.command(name="friendbench")
+    @commands.is_owner()
+    async def friend_benchmark(self, ctx: commands.Context, size: int = 1000):
+        """
+        Benchmark autofriend's friend list checks
+
+        Times the old full friends/followers scan against the snapshot diff on a generated host
+        with `size` friends and followers. An unchanged poll should hand out nobody.
+        """
+        if not 1 <= size <= 10000:
+            return await ctx.send("Size must be between 1 and 10000")
+        async with ctx.typing():
+            rows = await asyncio.get_running_loop().run_in_executor(None, friendgraph_benchmark, size)
+        table = tabulate.tabulate(
+            rows,
+            headers=["Method", "To Add", "To Drop", "Took"],
+            tablefmt="presto"
+        )
+        await ctx.send(box(table, lang="python"))
+
+    @arktools_main.command(name="loadtest")
+    @commands.is_owner()
+    async def load_test(
+            self,
+            ctx: commands.Context,
+            servers: int = 100,
+            seconds: int = 60,
+            latency: float = 0.02,
+            failures: float = 0.0
+    ):
+        """
+        Load test the polling pipeline against simulated servers
+
+        Starts `servers` fake maps speaking RCON on localhost, with players coming and going,
+        chat and tribe logs. The server pollers, RCON pool, health monitor and parsers run against
+        them for `seconds`. Discord sends and config writes are counted rather than made.
+
+        `latency` is the simulated response time in seconds, `failures` is the chance (0-1)
+        a command times out.
+        """
+        if not 1 <= servers <= 1000:
+            return await ctx.send("Servers must be between 1 and 1000")
+        if not 10 <= seconds <= 600:
+            return await ctx.send("Seconds must be between 10 and 600")
+        config = SimConfig(servers=servers, latency=latency, timeout_rate=min(max(failures, 0.0), 1.0))
+        harness = LoadHarness(self, config, cog_data_path(self) / "loadtest_outages.json")
+        await ctx.send(f"Running a {seconds} second load test against {servers} simulated servers...")
+        async with ctx.typing():
+            rows = await harness.run(seconds)
+        table = tabulate.tabulate(rows, headers=["Metric", "Total", "Per Minute"], tablefmt="presto")
+        await ctx.send(box(table, lang="python"))
+
+    @arktools_main.command(name="replay")
+    @commands.is_owner()
+    async def replay_capture(self, ctx: commands.Context, speed: float = 0):
+        """
+        Replay this guild's captured RCON traffic
+
+        Captured getchat and listplayers responses are fed through the chat, tribe log and join/leave
+        pipeline, with Discord sends and config writes counted instead of made.
+        A `speed` of 0 replays as fast as possible, 1 is real time and 2 is twice as fast.
+        """
+        if speed < 0:
+            return await ctx.send("Speed can't be negative")
+        files = self.capture.files(ctx.guild.id)
+        if not files:
+            return await ctx.send("There is no captured traffic for this guild, turn it on with `arktools server capture`")
+        async with ctx.typing():
+            entries = await asyncio.get_running_loop().run_in_executor(None, TrafficCapture.read, files)
+            if not entries:
+                return await ctx.send("The captures are empty")
+            harness = LoadHarness(self, SimConfig(servers=0), cog_data_path(self) / "replay_outages.json")
+            rows = await harness.replay(entries, speed)
+        table = tabulate.tabulate(rows, headers=["Metric", "Total", "Per Minute"], tablefmt="presto")
+        await ctx.send(box(f"Replayed {len(entries)} records from {len(files)} files\n{table}", lang="python"))
+
     # cleanup graph and map data that no longer exist
     @arktools_main.command(name="cleanup")
     @commands.guildowner()
@@ -1964,15 +2247,96 @@ class ArkTools(Calls, commands.Cog):
         This will also fix your config if you have player data from the Pre-V2 era of ArkTools
         """
         async with ctx.typing():
-            settings = await self.config.guild(ctx.guild).all()
+            settings = await self.full_settings(ctx.guild)
             new_settings, results = await cleanup_config(settings)
 
         if results:
-            await self.config.guild(ctx.guild).set(new_settings)
+            await self.save_settings(ctx.guild, new_settings)
             await ctx.send(results)
         else:
             await ctx.send("Nothing to clean, config looks healthy :thumbsup:")
 
+    @arktools_main.group(name="database")
+    @commands.guildowner()
+    async def database_settings(self, ctx: commands.Context):
+        """
+        Player and tribe storage settings
+
+        By default player and tribe data is stored in the bot's config.
+        Large servers can move it to a local SQLite database so the cog only loads the players it needs.
+        """
+        pass
+
+    @database_settings.command(name="view")
+    async def view_database(self, ctx: commands.Context):
+        """View where player and tribe data is stored"""
+        if ctx.guild.id not in self.dbguilds:
+            return await ctx.send("Player and tribe data is stored in the **Config**")
+        players, tribes = await self.db.counts(ctx.guild.id)
+        size = round(self.db.size / 1048576, 2)
+        await ctx.send(f"Player and tribe data is stored in the **SQLite Database**\n"
+                       f"`Players: `{players}\n"
+                       f"`Tribes:  `{tribes}\n"
+                       f"`DB Size: `{size}MB (shared by all servers)")
+
+    @database_settings.command(name="enable")
+    async def enable_database(self, ctx: commands.Context):
+        """
+        Move player and tribe data into the SQLite database
+
+        Your existing data is migrated in one go and removed from the config.
+        """
+        if ctx.guild.id in self.dbguilds:
+            return await ctx.send("This server is already using the database")
+        async with ctx.typing():
+            # Make sure nothing is left sitting in the stat buffer
+            await self.statstore.flush(ctx.guild)
+            players = await self.config.guild(ctx.guild).players()
+            tribes = await self.config.guild(ctx.guild).tribes()
+            pcount, tcount = await self.db.migrate(ctx.guild.id, players, tribes)
+            if pcount != len(players) or tcount != len(tribes):
+                await self.db.clear(ctx.guild.id)
+                return await ctx.send(f"Migration failed! Only {pcount}/{len(players)} players and "
+                                      f"{tcount}/{len(tribes)} tribes were stored. Your config was not touched.")
+            await self.config.guild(ctx.guild).database.set(True)
+            self.dbguilds.add(ctx.guild.id)
+            self.drop_index(ctx.guild)
+            # Player stats, joins and tribe logs kept writing to the config while the migration ran,
+            # anything that changed since the snapshot is carried over before the config is cleared
+            latest_players = await self.config.guild(ctx.guild).players()
+            latest_tribes = await self.config.guild(ctx.guild).tribes()
+            changed = {k: v for k, v in latest_players.items() if players.get(k) != v}
+            removed = [k for k in players if k not in latest_players]
+            if changed or removed:
+                await self.db.save_players(ctx.guild.id, changed, removed)
+            changed = {k: v for k, v in latest_tribes.items() if tribes.get(k) != v}
+            removed = [k for k in tribes if k not in latest_tribes]
+            if changed or removed:
+                await self.db.save_tribes(ctx.guild.id, changed, removed)
+            await self.config.guild(ctx.guild).players.clear()
+            await self.config.guild(ctx.guild).tribes.clear()
+        await ctx.send(f"Migrated {pcount} players and {tcount} tribes to the database")
+
+    @database_settings.command(name="disable")
+    async def disable_database(self, ctx: commands.Context):
+        """
+        Move player and tribe data back into the config
+
+        Data is exported in the original config format and removed from the database.
+        """
+        if ctx.guild.id not in self.dbguilds:
+            return await ctx.send("This server isn't using the database")
+        async with ctx.typing():
+            await self.statstore.flush(ctx.guild)
+            players, tribes = await self.db.export(ctx.guild.id)
+            await self.config.guild(ctx.guild).players.set(players)
+            await self.config.guild(ctx.guild).tribes.set(tribes)
+            await self.config.guild(ctx.guild).database.set(False)
+            self.dbguilds.discard(ctx.guild.id)
+            self.drop_index(ctx.guild)
+            await self.db.clear(ctx.guild.id)
+        await ctx.send(f"Exported {len(players)} players and {len(tribes)} tribes back to the config")
+
     @arktools_main.group(name="ranks")
     @commands.admin()
     async def ranks_main(self, ctx: commands.Context):
@@ -2085,8 +2449,8 @@ class ArkTools(Calls, commands.Cog):
         embed.set_thumbnail(url=LOADING)
         msg = await ctx.send(embed=embed)
         async with ctx.typing():
-            async with self.config.guild(ctx.guild).all() as settings:
-                stats = settings["players"]
+            settings = await self.config.guild(ctx.guild).all()
+            async with self.playerdata(ctx.guild) as stats:
                 rank_roles = settings["ranks"]
                 if not rank_roles:
                     return await ctx.send("There are no ranks set!")
@@ -2104,7 +2468,7 @@ class ArkTools(Calls, commands.Cog):
                             if int(time) <= hours:
                                 highest_rank = time
                         if highest_rank:
-                            settings["players"][uid]["rank"] = int(rank_roles[highest_rank])
+                            stats[uid]["rank"] = int(rank_roles[highest_rank])
                             role = rank_roles[highest_rank]
                             role = ctx.guild.get_role(int(role))
                             if role:
@@ -2120,7 +2484,7 @@ class ArkTools(Calls, commands.Cog):
                             if int(time) <= hours:
                                 highest_rank = time
                         if highest_rank:
-                            settings["players"][uid]["rank"] = int(rank_roles[highest_rank])
+                            stats[uid]["rank"] = int(rank_roles[highest_rank])
                         for time, role_id in rank_roles.items():
                             role = ctx.guild.get_role(int(role_id))
                             if role and int(time) <= hours:
@@ -2250,7 +2614,7 @@ class ArkTools(Calls, commands.Cog):
     @commands.guildowner()
     async def view_tribe_settings(self, ctx: commands.Context):
         """Overview of all tribes and settings"""
-        settings = await self.config.guild(ctx.guild).all()
+        settings = await self.full_settings(ctx.guild)
         color = discord.Color.dark_purple()
         masterlog = settings["masterlog"] if "masterlog" in settings else None
         masterlog = ctx.guild.get_channel(masterlog)
@@ -2299,7 +2663,7 @@ class ArkTools(Calls, commands.Cog):
                            owner: discord.Member,
                            channel: discord.TextChannel):
         """Assign a tribe to an owner to be managed by ithem."""
-        async with self.config.guild(ctx.guild).tribes() as tribes:
+        async with self.tribedata(ctx.guild) as tribes:
             msg = f"Tribe ID `{tribe_id}` has been assigned to {owner.mention} in {channel.mention}."
             if tribe_id in tribes:
                 tribes[tribe_id]["owner"] = owner.id
@@ -2319,7 +2683,7 @@ class ArkTools(Calls, commands.Cog):
     @commands.guildowner()
     async def unassign_tribe(self, ctx: commands.Context, tribe_id: str):
         """Unassign a tribe owner from a tribe."""
-        async with self.config.guild(ctx.guild).tribes() as tribes:
+        async with self.tribedata(ctx.guild) as tribes:
             if tribe_id not in tribes:
                 return await ctx.send("Tribe ID doesn't exist!")
             await ctx.send(f"Tribe with ID: {tribe_id} has been unassigned.")
@@ -2328,7 +2692,7 @@ class ArkTools(Calls, commands.Cog):
     @tribe_settings.command(name="mytribe")
     async def view_my_tribe(self, ctx):
         """View your tribe(if you've been granted ownership of one."""
-        async with self.config.guild(ctx.guild).tribes() as tribes:
+        async with self.tribedata(ctx.guild) as tribes:
             if tribes == {}:
                 return await ctx.send(f"No tribes found.")
             for tribe in tribes:
@@ -2360,7 +2724,7 @@ class ArkTools(Calls, commands.Cog):
     @tribe_settings.command(name="add")
     async def add_member(self, ctx: commands.Context, member: discord.Member):
         """Add a member to your tribe log channel."""
-        async with self.config.guild(ctx.guild).tribes() as tribes:
+        async with self.tribedata(ctx.guild) as tribes:
             if tribes == {}:
                 return await ctx.send(f"There are no tribes set for this server.")
             for tribe in tribes:
@@ -2376,7 +2740,7 @@ class ArkTools(Calls, commands.Cog):
     @tribe_settings.command(name="remove")
     async def remove_member(self, ctx: commands.Context, member: discord.Member):
         """Remove a member from your tribe log channel."""
-        async with self.config.guild(ctx.guild).tribes() as tribes:
+        async with self.tribedata(ctx.guild) as tribes:
             if tribes == {}:
                 return await ctx.send(f"There are no tribes set for this server.")
             for tribe in tribes:
@@ -2459,38 +2823,37 @@ class ArkTools(Calls, commands.Cog):
         if not clientid:
             return await ctx.send("Bot owner needs to set Client ID and Secret before api commands can be used!")
         clusters = await self.config.guild(ctx.guild).clusters()
-        async with aiohttp.ClientSession() as session:
-            for cname, cluster in clusters.items():
-                description = f"**{cname.upper()} Cluster**\n"
-                async with ctx.typing():
-                    for sname, server in cluster["servers"].items():
-                        if "tokens" in server:
-                            tokens = server["tokens"]
-                            xbl_client, token = await self.auth_manager(session, cname, sname, tokens, ctx)
-                            if xbl_client:
-                                authorized = "True"
-                                friends = json.loads((await xbl_client.people.get_friends_summary_own()).json())
-                                xuid = xbl_client.xuid
-                                profile_data = json.loads((await xbl_client.profile.get_profile_by_xuid(xuid)).json())
-                                gt, _, _, _ = profile_format(profile_data)
-                                gamertag = server["gamertag"]
-                                following = friends["target_following_count"]
-                                followers = friends["target_follower_count"]
-                                description += f"**{sname.capitalize()}**\n" \
-                                               f"`Authorized: `{authorized}\n" \
-                                               f"`Gamertag:   `{gt}\n" \
-                                               f"`Followers:  `{followers}\n" \
-                                               f"`Following:  `{following}\n\n"
-                                if gt.lower() != gamertag.lower():
-                                    async with self.config.guild(ctx.guild).clusters() as clusters:
-                                        clusters[cname]["servers"][sname]["gamertag"] = gt
-                            else:
-                                description += f"**{sname.capitalize()}**\n" \
-                                               f"`Unable to authorize`\n\n"
-                embed = discord.Embed(
-                    description=description
-                )
-                await ctx.send(embed=embed)
+        for cname, cluster in clusters.items():
+            description = f"**{cname.upper()} Cluster**\n"
+            async with ctx.typing():
+                for sname, server in cluster["servers"].items():
+                    if "tokens" in server:
+                        tokens = server["tokens"]
+                        xbl_client, token = await self.auth_manager(cname, sname, tokens, ctx)
+                        if xbl_client:
+                            authorized = "True"
+                            friends = json.loads((await xbl_client.people.get_friends_summary_own()).json())
+                            xuid = xbl_client.xuid
+                            profile_data = json.loads((await xbl_client.profile.get_profile_by_xuid(xuid)).json())
+                            gt, _, _, _ = profile_format(profile_data)
+                            gamertag = server["gamertag"]
+                            following = friends["target_following_count"]
+                            followers = friends["target_follower_count"]
+                            description += f"**{sname.capitalize()}**\n" \
+                                           f"`Authorized: `{authorized}\n" \
+                                           f"`Gamertag:   `{gt}\n" \
+                                           f"`Followers:  `{followers}\n" \
+                                           f"`Following:  `{following}\n\n"
+                            if gt.lower() != gamertag.lower():
+                                async with self.config.guild(ctx.guild).clusters() as clusters:
+                                    clusters[cname]["servers"][sname]["gamertag"] = gt
+                        else:
+                            description += f"**{sname.capitalize()}**\n" \
+                                           f"`Unable to authorize`\n\n"
+            embed = discord.Embed(
+                description=description
+            )
+            await ctx.send(embed=embed)
 
     @api_settings.command(name="view")
     async def view_api_settings(self, ctx: commands.Context):
@@ -2631,6 +2994,8 @@ class ArkTools(Calls, commands.Cog):
                 return await author.send(f"Authorization failed: {e}")
             async with self.config.guild(ctx.guild).clusters() as clusters:
                 clusters[clustername]["servers"][servername]["tokens"] = tokens
+                # Could be a different account now, start its friend snapshot over
+                self.friendgraph.forget(ctx.guild.id, clustername, servername)
                 xbl_client = XboxLiveClient(auth_mgr)
                 xuid = xbl_client.xuid
                 profile_data = json.loads((await xbl_client.profile.get_profile_by_xuid(xuid)).json())
@@ -2918,6 +3283,8 @@ class ArkTools(Calls, commands.Cog):
             embed.add_field(name="Ignore List", value=whitelist, inline=False)
         else:
             embed.add_field(name="Ignore List", value="No one added", inline=False)
+        lookups = tabulate.tabulate(self.altdetect.stats(), tablefmt="presto")
+        embed.add_field(name="Account Lookups", value=box(lookups, lang="python"), inline=False)
         await ctx.send(embed=embed)
 
     # Arktools-Server subgroup
@@ -2938,6 +3305,7 @@ class ArkTools(Calls, commands.Cog):
         else:
             crosschat = "Disabled"
         tz = settings["timezone"]
+        digest = settings["digestwindow"]
         statuschannel = "Not Set"
         eventlog = "Not Set"
         if settings["eventlog"]:
@@ -2950,9 +3318,8 @@ class ArkTools(Calls, commands.Cog):
                 statuschannel = statuschannel.mention
             except AttributeError:
                 statuschannel = "#deleted-channel"
-        stats = settings["serverstats"]["counts"]
         exp = settings["serverstats"]["expiration"]
-        days = int(len(stats) / 1440)
+        days = self.graphs.stored_days(ctx.guild.id)
         clustertype = settings["clustertypes"]
         embed = discord.Embed(
             description=f"`Status Channel:  `{statuschannel}\n"
@@ -2962,6 +3329,8 @@ class ArkTools(Calls, commands.Cog):
                         f"`Graph Storage:   `{exp} days\n"
                         f"`Cluster Type:    `{clustertype.capitalize()}\n"
                         f"`Cross-Chat:      `{crosschat}\n"
+                        f"`JoinLeaveDigest: `{digest}s\n"
+                        f"`Traffic Capture: `{'Enabled' if settings['capture'] else 'Disabled'}\n"
                         f"`DoExitCountdown: `{countdown}",
             color=discord.Color.blue()
         )
@@ -3023,19 +3392,160 @@ class ArkTools(Calls, commands.Cog):
                 )
                 await ctx.send(embed=embed)
 
-    @server_settings.command(name="countdown")
-    async def set_doexit_countdown(self, ctx: commands.Context, seconds: int):
+    @server_settings.command(name="pollstats")
+    async def view_poll_stats(self, ctx: commands.Context):
         """
-        Set a countdown for shutting down the servers with "doexit"
+        View the polling rate of each server
 
-        When the doexit command is used, the servers will begin a countdown and save before exiting.
-
-        **Default is 10 seconds**
+        Maps are polled faster when chat is active, slower when empty,
+        and only probed with exponential backoff while their circuit is open.
+        `Lag` is how late the last poll started compared to when it was scheduled.
+        """
+        rows = self.scheduler.stats(ctx.guild.id)
+        if not rows:
+            return await ctx.send("No servers are being polled right now")
+        table = tabulate.tabulate(
+            rows,
+            headers=["Server", "State", "Health", "GetChat", "ListPlayers", "Lag", "In-Flight"],
+            tablefmt="presto"
+        )
+        for p in pagify(table, page_length=1900):
+            await ctx.send(box(p, lang="python"))
 
-        Set to 0 to skip safe shutdowns and doexit immediately
+    @server_settings.command(name="health")
+    async def view_server_health(self, ctx: commands.Context):
         """
-        await self.config.guild(ctx.guild).countdown.set(seconds)
-        await ctx.tick()
+        View the health of each server
+
+        `Healthy`: calls are succeeding
+        `Degraded`: calls are slow or some of the recent ones failed
+        `Open`: the server is down, only admin commands and a listplayers probe are sent to it.
+        Probes back off from 30 seconds to 10 minutes until one gets through.
+        """
+        tz = pytz.timezone(await self.config.guild(ctx.guild).timezone())
+        rows = []
+        for guild_id, server in self.servers:
+            if guild_id != ctx.guild.id:
+                continue
+            health = self.health.get(server)
+            since = "-"
+            if health.failing_since:
+                since = datetime.datetime.fromtimestamp(health.failing_since, tz).strftime("%m/%d %I:%M %p")
+            rows.append([
+                f"{server['name']} {server['cluster']}",
+                health.state.capitalize(),
+                f"{round(health.error_rate * 100)}%",
+                f"{int(health.latency * 1000)}ms",
+                since,
+                f"{int(health.retry_in())}s" if health.state == OPEN else "-"
+            ])
+        if not rows:
+            return await ctx.send("There are no servers set up")
+        table = tabulate.tabulate(
+            rows,
+            headers=["Server", "State", "Errors", "Latency", "Failing Since", "Next Probe"],
+            tablefmt="presto"
+        )
+        for p in pagify(table, page_length=1900):
+            await ctx.send(box(p, lang="python"))
+
+    @server_settings.command(name="outages")
+    async def view_outages(self, ctx: commands.Context, *, server: str = None):
+        """
+        View the outage history of the servers
+
+        Outages start at the first failed call and end at the first successful one.
+        Optionally filter by server name.
+        """
+        tz = pytz.timezone(await self.config.guild(ctx.guild).timezone())
+        history = self.health.history(ctx.guild.id)
+        if server:
+            history = [(name, outage) for name, outage in history if server.lower() in name.lower()]
+        if not history:
+            return await ctx.send("No outages have been recorded")
+        rows = []
+        for name, outage in history:
+            started = datetime.datetime.fromtimestamp(outage.started, tz).strftime("%m/%d %I:%M %p")
+            if outage.ended and not outage.unknown:
+                ended = datetime.datetime.fromtimestamp(outage.ended, tz).strftime("%m/%d %I:%M %p")
+                duration = time_formatter(int(outage.duration))
+            elif outage in [h.outage for h in self.health.servers.values()]:
+                ended = "Ongoing"
+                duration = time_formatter(int(outage.duration))
+            else:
+                # Was still going when the cog was unloaded
+                ended = "Unknown"
+                duration = "-"
+            rows.append([name, started, ended, duration, outage.probes, outage.reason])
+        table = tabulate.tabulate(
+            rows,
+            headers=["Server", "Started", "Ended", "Duration", "Probes", "Reason"],
+            tablefmt="presto"
+        )
+        for p in pagify(table, page_length=1900):
+            await ctx.send(box(p, lang="python"))
+
+    @server_settings.command(name="flushstats")
+    async def view_flush_stats(self, ctx: commands.Context):
+        """
+        View the last player stats save
+
+        Playtime and last seen data is buffered in memory and saved once per player stats loop.
+        """
+        report = self.statstore.reports.get(ctx.guild.id)
+        if not report:
+            return await ctx.send("Player stats haven't been saved since the cog was loaded")
+        saved = datetime.datetime.fromtimestamp(report.timestamp, pytz.timezone("UTC"))
+        saved = saved.astimezone(pytz.timezone(await self.config.guild(ctx.guild).timezone()))
+        table = tabulate.tabulate(
+            [[
+                report.records,
+                report.skipped,
+                f"{round(report.duration * 1000)}ms",
+                f"{round(report.size / 1024, 1)}KB",
+                self.statstore.pending(ctx.guild.id),
+                saved.strftime("%I:%M:%S %p"),
+            ]],
+            headers=["Saved", "Skipped", "Took", "Written", "Pending", "At"],
+            tablefmt="presto"
+        )
+        await ctx.send(box(table, lang="python"))
+
+    @server_settings.command(name="cachestats")
+    async def view_cache_stats(self, ctx: commands.Context):
+        """
+        View the settings cache hit rate
+
+        Task loops read a frozen copy of the settings that is rebuilt after any command changes them.
+        Hits and misses are counted across all guilds since the cog was loaded.
+        """
+        stats = self.settings.stats(ctx.guild.id)
+        table = tabulate.tabulate(
+            [[
+                stats["version"],
+                "Yes" if stats["current"] else "No",
+                stats["hits"],
+                stats["misses"],
+                f"{stats['ratio']}%",
+            ]],
+            headers=["Version", "Cached", "Hits", "Misses", "Hit Rate"],
+            tablefmt="presto"
+        )
+        await ctx.send(box(table, lang="python"))
+
+    @server_settings.command(name="countdown")
+    async def set_doexit_countdown(self, ctx: commands.Context, seconds: int):
+        """
+        Set a countdown for shutting down the servers with "doexit"
+
+        When the doexit command is used, the servers will begin a countdown and save before exiting.
+
+        **Default is 10 seconds**
+
+        Set to 0 to skip safe shutdowns and doexit immediately
+        """
+        await self.config.guild(ctx.guild).countdown.set(seconds)
+        await ctx.tick()
 
     @server_settings.command(name="graphdata")
     async def graph_data_expiration(self, ctx: commands.Context, days: int):
@@ -3043,8 +3553,12 @@ class ArkTools(Calls, commands.Cog):
         Set graph data storage
 
         How many days worth of graph data to keep saved
+        Hourly and daily peaks are kept for a year and ten years regardless.
         """
+        if days < 1:
+            return await ctx.send("Graph data must be kept for at least 1 day")
         await self.config.guild(ctx.guild).serverstats.expiration.set(days)
+        await self.graphs.resize(ctx.guild.id, days)
         await ctx.tick()
 
     @server_settings.command(name="timezone")
@@ -3255,11 +3769,132 @@ class ArkTools(Calls, commands.Cog):
         Set a channel for the server status monitor.
 
 
-        Server status embed will be created and updated every 60 seconds.
+        Server status embed will be created and edited in place whenever player counts change.
         """
         await self.config.guild(ctx.guild).status.channel.set(channel.id)
         await ctx.send(f"Status channel has been set to {channel.mention}")
 
+    @server_settings.command(name="digestwindow")
+    async def set_digest_window(self, ctx: commands.Context, seconds: int):
+        """
+        Set how long join/leave lines are collected before being sent
+
+        Joins and leaves are sent as one digest message per channel instead of a message per player.
+        A longer window means fewer messages but a bigger delay. Use 0 to send each poll's changes right away.
+
+        **Default is 5 seconds**
+        """
+        if seconds < 0 or seconds > 300:
+            return await ctx.send("The digest window must be between 0 and 300 seconds.")
+        await self.config.guild(ctx.guild).digestwindow.set(seconds)
+        await ctx.send(f"Join/leave digest window set to {seconds} seconds.")
+
+    @server_settings.command(name="capture")
+    async def toggle_capture(self, ctx: commands.Context):
+        """
+        (Toggle) RCON traffic capture
+
+        Every command sent to this guild's servers and its response is recorded to a compressed file per server.
+        Captures rotate at 5MB and the last 5 are kept. The bot owner can replay them with `[p]arktools replay`
+        to reproduce chat and tribe log problems.
+        """
+        capture = await self.config.guild(ctx.guild).capture()
+        await self.config.guild(ctx.guild).capture.set(not capture)
+        if capture:
+            await ctx.send("RCON traffic capture has been **Disabled**")
+        else:
+            await ctx.send("RCON traffic capture has been **Enabled**")
+        await self.initialize()
+
+    @server_settings.command(name="chatqueue")
+    async def view_chat_queue(self, ctx: commands.Context):
+        """
+        View the outbound server chat queues
+
+        Messages relayed to a server are coalesced into as few serverchat commands as possible.
+        Duplicates of a message still waiting in the queue are dropped, and the oldest messages are dropped
+        if a queue backs up (usually because the server is down). Counts are since the cog was loaded.
+        """
+        rows = []
+        for guild_id, server in self.servers:
+            if guild_id != ctx.guild.id:
+                continue
+            key = server["chatchannel"]
+            stats = self.chatqueue.stats.get(key)
+            if not stats:
+                continue
+            rows.append([
+                f"{server['name']} {server['cluster']}",
+                self.chatqueue.depth(key),
+                stats.lines,
+                stats.commands,
+                stats.duplicates,
+                stats.dropped
+            ])
+        if not rows:
+            return await ctx.send("No messages have been relayed to any servers yet.")
+        table = tabulate.tabulate(
+            rows,
+            headers=["Server", "Queued", "Messages", "Commands", "Duplicates", "Dropped"],
+            tablefmt="presto"
+        )
+        for p in pagify(table):
+            await ctx.send(box(p, lang="python"))
+
+    @server_settings.command(name="socialqueue")
+    async def view_social_queue(self, ctx: commands.Context):
+        """
+        View pending Xbox friend, block and message jobs
+
+        Each host Gamertag works through its own queue, paced to stay under Xbox Live's rate limits.
+        Pending jobs are saved and picked back up after a reload, results are posted to the event log.
+        """
+        rows = self.social.stats(ctx.guild.id)
+        footer = f"Done since load: {self.social.done} | Rate limited: {self.social.limited}"
+        if not rows:
+            return await ctx.send(f"No social jobs are pending.\n{footer}")
+        table = tabulate.tabulate(rows, headers=["Host", "Queued", "Waiting", "Running"], tablefmt="presto")
+        for p in pagify(f"{table}\n\n{footer}"):
+            await ctx.send(box(p, lang="python"))
+
+    @server_settings.command(name="friendgraph")
+    async def view_friend_graph(self, ctx: commands.Context):
+        """
+        View the autofriend snapshot for each host Gamertag
+
+        Autofriend only acts on followers and friends that changed since the last poll.
+        Hosts whose lists stay the same are polled less often, up to every 5 minutes, and drop back
+        to every 20 seconds as soon as something changes.
+        """
+        rows = self.friendgraph.stats(ctx.guild.id)
+        if not rows:
+            return await ctx.send("No host Gamertags have been polled by autofriend yet.")
+        table = tabulate.tabulate(
+            rows,
+            headers=["Host", "Friends", "Followers", "Interval", "Next Poll", "Changed/Polls"],
+            tablefmt="presto"
+        )
+        for p in pagify(table):
+            await ctx.send(box(p, lang="python"))
+
+    @server_settings.command(name="statusstats")
+    async def view_status_stats(self, ctx: commands.Context):
+        """
+        View how often the status embed has been updated
+
+        The status embed is edited in place and only when player counts, downtime or the graph changed.
+        Counts are since the cog was loaded.
+        """
+        board = self.boards.get(ctx.guild.id)
+        if not board:
+            return await ctx.send("The status embed hasn't been posted since the cog was loaded.")
+        table = tabulate.tabulate(
+            [[len(board.messages), board.edits, board.sends, board.deletes, board.skipped]],
+            headers=["Pages", "Edits", "Sends", "Deletes", "Unchanged Ticks"],
+            tablefmt="presto"
+        )
+        await ctx.send(box(table, lang="python"))
+
     @server_settings.command(name="statuschannelgraph")
     async def set_statuschannel_graph(self, ctx: commands.Context, hours: int = None):
         """
@@ -3456,7 +4091,7 @@ class ArkTools(Calls, commands.Cog):
         clusters = settings["clusters"]
         if clustername not in clusters:
             return await ctx.send("Cluster not found!")
-        stats = settings["players"]
+        stats = await self.playerdata(ctx.guild, kits)
         for xuid, data in stats.items():
             if xuid in kits:
                 for mapn in data["playtime"].keys():
@@ -3531,15 +4166,20 @@ class ArkTools(Calls, commands.Cog):
     # Cache server data
     async def initialize(self):
         t1 = time.monotonic()
-        self.activeguilds = []
-        self.servercount = 0
-        self.servers = []
-        self.channels = []
+        # Everything is built locally and swapped in at the end so loops never see a partial cache
+        activeguilds = []
+        servers = []
         for guild in self.bot.guilds:
             guild_id = str(guild.id)
             settings = await self.config.guild(guild).all()
             if not settings:
                 continue
+            # Storage mode is updated in place since everything below depends on it
+            if settings["database"]:
+                self.dbguilds.add(guild.id)
+            else:
+                self.dbguilds.discard(guild.id)
+            self.check_index(guild, settings["players"])
             clusters = settings["clusters"]
             if not clusters:
                 continue
@@ -3555,13 +4195,15 @@ class ArkTools(Calls, commands.Cog):
             if results:
                 log.info(results)
                 await self.config.guild(guild).set(newsettings)
+                self.settings.bump(guild.id)
+                self.check_index(guild, newsettings["players"])
             else:
                 log.info("Config health: Good")
-            if guild_id not in self.activeguilds:
-                self.activeguilds.append(guild_id)
+            await self.load_graphdata(guild, newsettings["serverstats"], clusters)
+            if guild_id not in activeguilds:
+                activeguilds.append(guild_id)
             for cluster, data in clusters.items():
                 globalchannel = data["globalchatchannel"]
-                self.channels.append(globalchannel)
                 adminlog = data["adminlogchannel"]
                 joinchannel = data["joinchannel"]
                 leavechannel = data["leavechannel"]
@@ -3576,13 +4218,20 @@ class ArkTools(Calls, commands.Cog):
                     serverdata["guild"] = guild
                     serverdata["eventlog"] = settings["eventlog"]
                     serverdata["crosschat"] = settings["crosschat"]
+                    serverdata["capture"] = settings["capture"]
                     if "extrcon" in data:
                         serverdata["extrcon"] = data["extrcon"]
-                    self.channels.append(serverdata["chatchannel"])
-                    self.servers.append((guild.id, serverdata))
-                    self.servercount += 1
+                    servers.append((guild.id, serverdata))
                     if serverdata["chatchannel"] not in self.playerlist:
                         self.playerlist[serverdata["chatchannel"]] = "offline"
+        router = ChatRouter(servers)
+        self.activeguilds = activeguilds
+        self.servers = servers
+        self.servercount = len(servers)
+        self.router = router
+        # Drop connections to servers that were removed and (re)start the pollers
+        self.rcon.prune([s[1] for s in self.servers])
+        self.scheduler.sync(self.servers)
         t = round(time.monotonic() - t1, 1)
         log.info(f"Config initialized (took {t} seconds)")
 
@@ -3598,14 +4247,12 @@ class ArkTools(Calls, commands.Cog):
         # If message has no content for some reason?
         if not message:
             return
+        router = self.router
         # Check if guild id is initialized
-        if str(message.channel.guild.id) not in self.activeguilds:
-            return
-        # Check if any servers have been initialized
-        if not self.servers:
+        if message.guild.id not in router.guilds:
             return
         # Check if channel id matches any of the active channels
-        if message.channel.id not in self.channels:
+        if message.channel.id not in router.channels:
             return
         # Check whether the cog isn't disabled
         if await self.bot.cog_disabled_in_guild(self, message.guild):
@@ -3629,8 +4276,8 @@ class ArkTools(Calls, commands.Cog):
                 message.content = message.content.replace(f"<@&{mention.id}>", f"@{mention.name}")
 
         # Run checks for what channel the message was sent in to see if its a map channel
-        clusterchannels, allservers = self.globalchannelchecker(message.channel)
-        chatchannel, servermap = self.mapchannelchecker(message.channel)
+        allservers = router.global_servers(message.channel.id)
+        servermap = router.map_server(message.channel.id)
 
         if not allservers and not servermap:
             return
@@ -3644,84 +4291,29 @@ class ArkTools(Calls, commands.Cog):
         if msg == " ":
             return
         guild = message.guild
-        if message.channel.id in clusterchannels:
-            for server in allservers:
-                cmd = f"serverchat {name}: {msg}"
-                task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-ServerChat"
-                asyncio.create_task(self.executor(guild, server, cmd), name=task_name)
-        elif int(message.channel.id) == int(chatchannel):
-            if not servermap["crosschat"]:
-                return
-            cmd = f"serverchat {name}: {msg}"
-            task_name = f"ArkTools-{guild.name}-{servermap['name']}-{servermap['cluster']}-ServerChat"
-            asyncio.create_task(self.executor(guild, servermap, cmd), name=task_name)
+        # Queued per server and coalesced with anything else sent within the chat window
+        if allservers:
+            for record in allservers:
+                self.chatqueue.put(guild, record.data, f"{name}: {msg}")
         else:
-            return
-
-    # Returns all channels and servers related to the message
-    def globalchannelchecker(self, channel: discord.TextChannel):
-        clusterchannels = []
-        allservers = []
-        for tup in self.servers:
-            server = tup[1]
-            if server["globalchatchannel"] == channel.id:
-                clusterchannels.append(server["globalchatchannel"])
-                allservers.append(server)
-        return clusterchannels, allservers
+            server = servermap.data
+            if not server["crosschat"]:
+                return
+            self.chatqueue.put(guild, server, f"{name}: {msg}")
 
-    # Returns the channel and server related to the message
-    def mapchannelchecker(self, channel: discord.TextChannel):
-        for tup in self.servers:
-            server = tup[1]
-            if server["chatchannel"] == channel.id:
-                return channel.id, server
-        return None, None
+    # Keeps a poller running for every server, restarting any that crashed
+    # The pollers themselves handle getchat/listplayers timing per server
+    @tasks.loop(minutes=1)
+    async def poll_manager(self):
+        self.scheduler.sync(self.servers)
 
-    # Initiates the Listplayers loop
-    @tasks.loop(seconds=30)
-    async def listplayers(self):
-        for data in self.servers:
-            guild = self.bot.get_guild(data[0])
-            server = data[1]
-            task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-listplayers"
-            running = [task.get_name() for task in asyncio.all_tasks()]
-            if task_name not in running:
-                asyncio.create_task(self.executor(guild, server, "listplayers"), name=task_name)
-
-    # Initiates the GetChat loop
-    @tasks.loop(seconds=5)
-    async def getchat(self):
-        for data in self.servers:
-            guild = self.bot.get_guild(data[0])
-            server = data[1]
-            task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-getchat"
-            running = [task.get_name() for task in asyncio.all_tasks()]
-            if task_name not in running:
-                asyncio.create_task(self.executor(guild, server, "getchat"), name=task_name)
-
-    # Non-blocking sync executor for rcon task loops
-    # This is the main function for all rcon task loops
-    # Using async rcon for lots of server was overflowing the network buffer
-    async def executor(self, guild: discord.guild, server: dict, command: str):
+    # Main function for all rcon task loops
+    # Commands go through the persistent per-server connections in self.rcon
+    async def executor(self, guild: discord.guild, server: dict, command: str) -> typing.Optional[str]:
         if not server:
             return
         if not guild:
             return
-        # These commands will try to run even if the server is in the waitlist queue
-        priority_commands = ["listplayers", "banplayer", "unbanplayer", "doexit", "saveworld"]
-        for cmd in priority_commands:
-            if cmd in command.lower():
-                priority = True
-                break
-        else:
-            priority = False
-        # If a command is not priority, check if it's in the queue and if it is, skip
-        cstring = str(server["chatchannel"])
-        queued = await self.in_queue(cstring)
-        if not priority and queued:
-            skip = True
-        else:
-            skip = False
         # User probably had a typo when adding the server
         if server["port"] > 65535 or server["port"] < 0:
             eventlog = guild.get_channel(server["eventlog"])
@@ -3733,6 +4325,9 @@ class ArkTools(Calls, commands.Cog):
                 if eventlog.permissions_for(guild.me).send_messages:
                     await eventlog.send(embed=embed)
             return
+        # Nothing but admin commands and the occasional listplayers probe goes to a server with an open circuit
+        # A skipped listplayers still reports the server offline below
+        skip = not self.health.allow(server, command)
 
         # Optimal timeouts for various commands
         if command == "getchat" or "serverchat" in command:
@@ -3742,41 +4337,24 @@ class ArkTools(Calls, commands.Cog):
         else:
             timeout = 3
 
-        if "serverchat" in command and "extrcon" in server:
-            if server["extrcon"]:
-                msg = command.split(" ", 1)[1]
-                command = f"clientchat {msg}"
+        command = rcon_command(server, command)
 
-        def exe():
+        # If server is to be skipped, mock the result for the player_join_leave function
+        res = None
+        if not skip:
+            t1 = time.monotonic()
             try:
-                with Client(
-                        host=server['ip'],
-                        port=server['port'],
-                        passwd=server['password'],
-                        timeout=timeout
-                ) as client:
-                    result = client.run(command)
-                    client.close()
-                    return result
-            except socket.timeout:
-                return
-            except Exception as e:
+                res = await self.rcon.run(server, command, timeout)
+            except asyncio.TimeoutError:
+                pass
+            except (OSError, RconError) as e:
                 if "WinError 10054" in str(e):
                     log.info(f"{guild.name}: Server {server['name']} {server['cluster']} timed out too quickly")
                 else:
                     log.warning(f"Executor-{guild.name}-{server['name']}-{command}: {e}")
-                return
-
-        # If server is to be skipped, mock the result for the player_join_leave function
-        if skip:
-            res = None
-        else:
-            res = await self.bot.loop.run_in_executor(None, exe)
+            if server.get("capture"):
+                self.capture.record(guild.id, server, command, res, time.monotonic() - t1)
 
-        # If result is none and the command was a priority, then servers probably timed out or crashed
-        if not res and not skip:
-            # Put server in queue, loops will ignore that server for 2 minutes and then try again
-            self.add_queue(cstring)
         # Message_handler interprets in-game chat buffer
         if command == "getchat":
             if res:
@@ -3790,22 +4368,20 @@ class ArkTools(Calls, commands.Cog):
                     await self.player_join_leave(guild, server, "empty")
                 else:
                     regex = r"(?:[0-9]+\. )(.+), ([0-9]+)"
-                    res = re.findall(regex, res)
-                    await self.player_join_leave(guild, server, res)
+                    players = re.findall(regex, res)
+                    await self.player_join_leave(guild, server, players)
             else:  # If server is offline return None
                 await self.player_join_leave(guild, server, "offline")
+        return res
 
-    @getchat.before_loop
-    async def before_getchat(self):
-        await self.bot.wait_until_red_ready()
-        await asyncio.sleep(10)
-        log.info("GetChat loop ready")
-
-    @listplayers.before_loop
-    async def before_listplayers(self):
+    @poll_manager.before_loop
+    async def before_poll_manager(self):
         await self.bot.wait_until_red_ready()
+        await self.health.load()
+        await self.timers.load()
+        await self.migrate_cooldowns()
         await self.initialize()
-        log.info("Listplayers loop ready")
+        log.info("Server pollers ready")
 
     # Detect player joins/leaves and log to respective channels
     async def player_join_leave(self, guild: discord.guild, server: dict, newplayerlist: typing.Union[str, list]):
@@ -3832,42 +4408,37 @@ class ArkTools(Calls, commands.Cog):
 
         # Previously cached player list to compare with newplayerlist
         lastplayerlist = self.playerlist[channel]
+        self.playerlist[channel] = newplayerlist
 
-        # If new and last are both strings then just update them, nothing to log
-        # Theyre probably both offline or empty so no notable change
+        # If new and last are both strings then theyre probably both offline or empty, no notable change
+        # If a server goes from offline to populated it's probably cause the cog was reloaded, so ignore
         if isinstance(newplayerlist, str) and isinstance(lastplayerlist, str):
-            self.playerlist[channel] = newplayerlist
+            return
+        if isinstance(newplayerlist, list) and lastplayerlist == "offline":
+            return
+        if not can_send:
+            return
+
+        # Players are (gamertag, id) tuples, diff them as sets and keep the order they were listed in
+        if isinstance(newplayerlist, list):
+            last = set(lastplayerlist) if isinstance(lastplayerlist, list) else set()
+            joined = [player for player in newplayerlist if player not in last]
         else:
-            # Either the newplayerlist, lastplayerlist, or neither are a string, so now we narrow it down
-            # If both are lists then detect change in population
-            if isinstance(newplayerlist, list) and isinstance(lastplayerlist, list):
-                if can_send:
-                    for player in newplayerlist:
-                        # If a player is in the new list but not the last list, then they must have joined
-                        if player not in lastplayerlist:
-                            await joinlog.send(
-                                f":green_circle: `{player[0]}, {player[1]}` joined {mapname} {clustername}")
-                    for player in lastplayerlist:
-                        # If a player is in the last list but not the new list, then they must have left
-                        if player not in newplayerlist:
-                            await leavelog.send(f":red_circle: `{player[0]}, {player[1]}` left {mapname} {clustername}")
-                self.playerlist[channel] = newplayerlist
-            # Went from online and populated to either offline or empty, so just dump the users into leave log
-            elif isinstance(newplayerlist, str) and isinstance(lastplayerlist, list):
-                for player in lastplayerlist:
-                    if can_send:
-                        await leavelog.send(f":red_circle: `{player[0]}, {player[1]}` left {mapname} {clustername}")
-                self.playerlist[channel] = newplayerlist
-            # Went from empty to populated so add everyone in the server to the join log
-            elif isinstance(newplayerlist, list) and isinstance(lastplayerlist, str):
-                if lastplayerlist == "empty":
-                    for player in newplayerlist:
-                        await joinlog.send(
-                            f":green_circle: `{player[0]}, {player[1]}` joined {mapname} {clustername}")
-                self.playerlist[channel] = newplayerlist
-            else:
-                # If a server goes from offline to populated it's probably cause the cog was reloaded, so ignore
-                self.playerlist[channel] = newplayerlist
+            joined = []
+        if isinstance(lastplayerlist, list):
+            new = set(newplayerlist) if isinstance(newplayerlist, list) else set()
+            left = [player for player in lastplayerlist if player not in new]
+        else:
+            left = []
+        if not joined and not left:
+            return
+
+        # Lines are queued and sent as a digest, a whole map joining at once is a message or two
+        window = (await self.settings.get(guild))["digestwindow"]
+        for player in joined:
+            self.outbound.put(joinlog, f":green_circle: `{player[0]}, {player[1]}` joined {mapname} {clustername}", window)
+        for player in left:
+            self.outbound.put(leavelog, f":red_circle: `{player[0]}, {player[1]}` left {mapname} {clustername}", window)
 
     # Sends messages from in-game chat to their designated channels
     async def message_handler(self, guild: discord.guild, server: dict, res: str):
@@ -3877,9 +4448,9 @@ class ArkTools(Calls, commands.Cog):
         # If crosschat is false messages wont be sent to discord but in-game commands *should* still work
         crosschat = server["crosschat"]
         perms = chatchannel.permissions_for(guild.me).send_messages
-        msgs = res.split("\n")
-        settings = await self.config.guild(guild).all()
-        badnames = settings["badnames"]
+        settings = await self.settings.get(guild)
+        # Lowercase name -> name as it was blacklisted, one lookup per chat line instead of a loop
+        badnames = {name.lower(): name for name in settings["badnames"]}
         admin_commands = ""
         globalmessages = ""
         messages = ""
@@ -3887,29 +4458,26 @@ class ArkTools(Calls, commands.Cog):
         chats = []
         servername = server["name"].capitalize()
         clustername = server["cluster"].upper()
-        # Filter messages for feedback loops and invalid strings
-        for msg in msgs:
-            if not msg:
-                continue
-            if msg == " ":
-                continue
-            # This is discord chat being sent to server, so we dont want to loop it
-            if msg.startswith("SERVER:"):
-                continue
-            if msg.startswith("AdminCmd:"):  # Admin command
-                admin_commands += f"**{servername} {clustername}**\n{box(msg, lang='python')}\n"
-                continue
-            elif "Tribe" and ", ID" in msg:  # Tribe log
-                tribe_logs.append(msg)
-            else:
-                # Anything else ignored,
-                # like wrapped sentences from to_server_chat that we dont want sent back to the discord
-                if "):" not in msg:
-                    continue
-                else:
-                    # Send off to the cleaned up message list for further interpretation
-                    chats.append(msg)
-        for msg in chats:
+        # Feedback loops and invalid strings come back as noise
+        for line in parse_getchat(res, functools.partial(self.chatqueue.is_echo, server["chatchannel"])):
+            if line.kind == ADMIN:
+                admin_commands += f"**{servername} {clustername}**\n{box(line.text, lang='python')}\n"
+            elif line.kind == TRIBE:
+                tribe_logs.append(line.text)
+            elif line.kind == CHAT:
+                chats.append(line)
+        # Players are found through the index and loaded once for the whole batch
+        xuids = []
+        for line in chats:
+            if line.gamertag:
+                xuid = await self.find_gamertag(guild, line.gamertag)
+                if xuid:
+                    xuids.append(xuid)
+        players = await self.playerdata(guild, xuids) if xuids else {}
+        # Players whose entry was written during this batch, their loaded copy is out of date
+        written = set()
+        for line in chats:
+            msg = line.text
             # Append messages to be sent to discord
             globalmessages += f"{chatchannel.mention}: {msg}\n"
             messages += f"{msg}\n"
@@ -3931,46 +4499,41 @@ class ArkTools(Calls, commands.Cog):
             # If interchat is enabled, relay message to other servers
             clustername = server["cluster"]
             if settings["clusters"][clustername]["servertoserver"]:  # Maps can talk to each other if true
-                for data in self.servers:
-                    s = data[1]
-                    g = self.bot.get_guild(data[0])
-                    # Send in-game message to all other servers in the same cluster except for the originator
-                    if s["cluster"] == server["cluster"] and s["name"] != server["name"] and g == guild:
-                        await self.executor(guild, s, f"serverchat {server['name'].capitalize()}: {msg}")
-
-            # Break message into groups for interpretation
-            # (gamertag) (character name) (message)
-            reg = r'(.+)\s\((.+)\): (.+)'
-            msg = re.findall(reg, msg)
-            if len(msg) == 0:  # This shouldn't happen but eh...
+                # Send in-game message to all other servers in the same cluster except for the originator
+                for record in self.router.cluster_servers(guild.id, server["cluster"]):
+                    if record.name != server["name"]:
+                        self.chatqueue.put(guild, record.data, f"{server['name'].capitalize()}: {msg}")
+
+            # Parser already broke the message into (gamertag) (character name) (message)
+            if not line.gamertag:  # This shouldn't happen but eh...
                 continue
-            msg = msg[0]
-            gamertag = msg[0]
-            character_name = msg[1]
-            message = msg[2]
-            # Check if any character has a blacklisted name and rename the character to their Gamertag if so
-            for badname in badnames:
-                # User's character name is present in the blacklist
-                if badname.lower() == character_name.lower():
-                    await self.executor(guild, server, f'renameplayer "{badname}" {gamertag}')
-                    cmd = f"serverchat {gamertag}, the name {badname} has been blacklisted, you have been renamed"
-                    await self.executor(guild, server, cmd)
-                    if perms and crosschat:
-                        await chatchannel.send(f"A player named `{badname}` has been renamed to `{gamertag}`.")
+            gamertag = line.gamertag
+            character_name = line.character
+            message = line.message
+            # Check if the character has a blacklisted name and rename the character to their Gamertag if so
+            badname = badnames.get(character_name.lower())
+            if badname:
+                await self.executor(guild, server, f'renameplayer "{badname}" {gamertag}')
+                cmd = f"serverchat {gamertag}, the name {badname} has been blacklisted, you have been renamed"
+                await self.executor(guild, server, cmd)
+                if perms and crosschat:
+                    await chatchannel.send(f"A player named `{badname}` has been renamed to `{gamertag}`.")
             try:
-                xuid, stats = await self.get_player(gamertag, settings["players"])
+                xuid, stats = await self.get_player(guild, gamertag, players)
             except TypeError:
                 stats = None
                 xuid = None
             # In game player name sync
             if stats:
                 server_id = str(server["chatchannel"])
-                if server_id not in settings["players"][xuid]["ingame"]:
+                if server_id not in stats["ingame"]:
                     await self.init_player_map(guild, server_id, xuid, character_name)
+                    written.add(xuid)
                 else:
-                    user = settings["players"][xuid]
+                    user = stats
                     if character_name != user["ingame"][server_id]["name"]:
                         await self.update_name(guild, server_id, xuid, character_name)
+                        written.add(xuid)
             # Check or apply ranks
             if settings["autorename"]:
                 rank = None
@@ -3999,7 +4562,8 @@ class ArkTools(Calls, commands.Cog):
             for p in prefixes:
                 if message.startswith(p):
                     message = message.replace(p, "", 1)
-                    resp = await self.ingame_cmd(guild, p, server, gamertag, character_name, message)
+                    batch = None if xuid in written else players
+                    resp = await self.ingame_cmd(guild, p, server, gamertag, character_name, message, batch)
                     if resp:
                         messages += f"`{resp}`\n"
                     break
@@ -4021,8 +4585,8 @@ class ArkTools(Calls, commands.Cog):
 
     # In game command handler
     async def ingame_cmd(self, guild: discord.guild, prefix: str, server: dict, gamertag: str, char_name: str,
-                         cmd: str) -> str:
-        settings = await self.config.guild(guild).all()
+                         cmd: str, players: dict = None) -> str:
+        settings = await self.settings.get(guild)
         color = random.choice(RICH_COLORS)
         available_cmd = f"{color}IN GAME COMMANDS</>\n" \
                         f"{prefix}register <ID> - Register your implantID to use commands without it\n" \
@@ -4040,7 +4604,6 @@ class ArkTools(Calls, commands.Cog):
         if settings["kit"]["enabled"]:
             available_cmd += f"{prefix}kit - New players can claim a one-time starter kit!\n"
             extras += 1
-        players = settings["players"]
         cid = server["chatchannel"]
         playerlist = self.playerlist[cid]
         server_id = str(cid)
@@ -4048,7 +4611,7 @@ class ArkTools(Calls, commands.Cog):
         com, arg = self.parse_cmd(cmd)
         if not com:
             return ""
-        xuid, stats = await self.get_player(gamertag, players)
+        xuid, stats = await self.get_player(guild, gamertag, players)
         failed = f"In-game command failed! This can happen if you recently changed your Gamertag. " \
                  f"Type {prefix}updategt YourOldGamertag to fix this"
 
@@ -4084,7 +4647,7 @@ class ArkTools(Calls, commands.Cog):
                 await self.executor(guild, server, com)
                 return resp
             else:
-                async with self.config.guild(guild).players() as players:
+                async with self.playerdata(guild, [xuid]) as players:
                     resp = await self.check_implant(guild, server, arg)
                     if resp:
                         return resp
@@ -4108,14 +4671,15 @@ class ArkTools(Calls, commands.Cog):
                 return resp
             else:
                 old_gamertag = arg
-                async with self.config.guild(guild).players() as players:
-                    for xuid, data in players.items():
-                        if old_gamertag.lower() == data["username"].lower():
-                            data["username"] = gamertag
-                            resp = f"Your gamertag has been updated to {gamertag}"
-                            com = f"serverchat {resp}"
-                            await self.executor(guild, server, com)
-                            return resp
+                xuid = await self.find_gamertag(guild, old_gamertag)
+                async with self.playerdata(guild, [xuid] if xuid else []) as players:
+                    if xuid in players:
+                        players[xuid]["username"] = gamertag
+                        self.reindex(guild, players, xuid)
+                        resp = f"Your gamertag has been updated to {gamertag}"
+                        com = f"serverchat {resp}"
+                        await self.executor(guild, server, com)
+                        return resp
 
         # Rename command
         elif com == "rename":
@@ -4125,8 +4689,8 @@ class ArkTools(Calls, commands.Cog):
                 await self.executor(guild, server, com)
                 return resp
             if settings["autorename"]:
-                if "rank" in players[xuid]:
-                    rank = players[xuid]["rank"]
+                if stats and "rank" in stats:
+                    rank = stats["rank"]
                     rank = guild.get_role(rank)
                     arg = f"[{rank}] {arg}"
             com = f'renameplayer "{char_name}" {arg}'
@@ -4155,8 +4719,8 @@ class ArkTools(Calls, commands.Cog):
                 await self.executor(guild, server, com)
                 com = "settimeofday 07:00"
                 await self.executor(guild, server, com)
-                del self.votes[cid]
-                self.update_lastran(cid, vote_type)
+                self.end_votes(cid)
+                await self.update_lastran(guild, cid, vote_type)
                 return resp
         # Vote night command
         elif com == "votenight":
@@ -4178,8 +4742,8 @@ class ArkTools(Calls, commands.Cog):
                 await self.executor(guild, server, com)
                 com = "settimeofday 22:00"
                 await self.executor(guild, server, com)
-                del self.votes[cid]
-                self.update_lastran(cid, vote_type)
+                self.end_votes(cid)
+                await self.update_lastran(guild, cid, vote_type)
                 return resp
         # Dino wipe command
         elif com == "votedinowipe":
@@ -4201,8 +4765,8 @@ class ArkTools(Calls, commands.Cog):
                 await self.executor(guild, server, com)
                 com = "destroywilddinos"
                 await self.executor(guild, server, com)
-                del self.votes[cid]
-                self.update_lastran(cid, vote_type)
+                self.end_votes(cid)
+                await self.update_lastran(guild, cid, vote_type)
                 return resp
         # Vote server cleanup command, wipes beaver dams and spoiled eggs
         elif com == "votecleanup":
@@ -4231,8 +4795,8 @@ class ArkTools(Calls, commands.Cog):
                 ]
                 for cleanup_command in cleanup_commands:
                     await self.executor(guild, server, cleanup_command)
-                del self.votes[cid]
-                self.update_lastran(cid, vote_type)
+                self.end_votes(cid)
+                await self.update_lastran(guild, cid, vote_type)
                 return resp
         # Player count command
         elif com == "players":
@@ -4248,7 +4812,6 @@ class ArkTools(Calls, commands.Cog):
                 return resp
         # Im stuck command
         elif com == "imstuck":
-            canuse = False
             if arg:
                 resp = await self.check_implant(guild, server, arg)
                 if resp:
@@ -4267,39 +4830,23 @@ class ArkTools(Calls, commands.Cog):
                     return resp
                 else:
                     arg = implant
-            async with self.config.guild(guild).cooldowns() as cooldowns:
-                if gamertag not in cooldowns:
-                    cooldowns[gamertag] = {"imstuck": time.isoformat()}
-                    canuse = True
-                elif "imstuck" not in cooldowns[gamertag]:
-                    cooldowns[gamertag]["imstuck"] = time.isoformat()
-                    canuse = True
-                else:
-                    lastused = cooldowns[gamertag]["imstuck"]
-                    lastused = datetime.datetime.fromisoformat(lastused)
-                    td = time - lastused
-                    if td.total_seconds() > 1800:
-                        canuse = True
-                if canuse:
-                    cooldowns[gamertag]["imstuck"] = time.isoformat()
-                    for path in IMSTUCK_BLUEPRINTS:
-                        cmd = f"giveitemtoplayer {arg} {path}"
-                        task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-giveitemtoplayer"
-                        asyncio.create_task(self.executor(guild, server, cmd), name=task_name)
-                    resp = f"{gamertag}, your care package is on the way!"
-                    com = f"serverchat {resp}"
-                    await self.executor(guild, server, com)
-                    return resp
-                else:
-                    lastused = cooldowns[gamertag]["imstuck"]
-                    lastused = datetime.datetime.fromisoformat(lastused)
-                    td = time - lastused
-                    tleft = td.total_seconds()
-                    tleft = time_formatter(int(tleft))
-                    resp = f"{gamertag}, You need to wait {tleft} before using that command again"
-                    com = f"serverchat {resp}"
-                    await self.executor(guild, server, com)
-                    return resp
+            key = f"{guild.id}-{gamertag}-imstuck"
+            left = self.timers.remaining("cooldown", key)
+            if left:
+                tleft = time_formatter(int(left))
+                resp = f"{gamertag}, You need to wait {tleft} before using that command again"
+                com = f"serverchat {resp}"
+                await self.executor(guild, server, com)
+                return resp
+            self.timers.schedule("cooldown", key, time.timestamp() + 1800)
+            for path in IMSTUCK_BLUEPRINTS:
+                cmd = f"giveitemtoplayer {arg} {path}"
+                task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-giveitemtoplayer"
+                asyncio.create_task(self.executor(guild, server, cmd), name=task_name)
+            resp = f"{gamertag}, your care package is on the way!"
+            com = f"serverchat {resp}"
+            await self.executor(guild, server, com)
+            return resp
         # Payday command
         elif com == "payday":
             if not settings["payday"]["enabled"]:
@@ -4307,7 +4854,6 @@ class ArkTools(Calls, commands.Cog):
                 com = f"serverchat {resp}"
                 await self.executor(guild, server, com)
                 return resp
-            canuse = False
             if arg:
                 resp = await self.check_implant(guild, server, arg)
                 if resp:
@@ -4326,46 +4872,29 @@ class ArkTools(Calls, commands.Cog):
                     return resp
                 else:
                     arg = implant
-            async with self.config.guild(guild).cooldowns() as cooldowns:
-                if gamertag not in cooldowns:
-                    cooldowns[gamertag] = {"payday": time.isoformat()}
-                    canuse = True
-                elif "payday" not in cooldowns[gamertag]:
-                    cooldowns[gamertag]["payday"] = time.isoformat()
-                    canuse = True
-                else:
-                    lastused = cooldowns[gamertag]["payday"]
-                    lastused = datetime.datetime.fromisoformat(lastused)
-                    td = time - lastused
-                    if td.total_seconds() > duration:
-                        canuse = True
-                if canuse:
-                    cooldowns[gamertag]["payday"] = time.isoformat()
-                    paths = await self.config.guild(guild).payday.paths()
-                    rand = await self.config.guild(guild).payday.random()
-                    if rand:
-                        path = random.choice(paths)
-                        await self.executor(guild, server, f"giveitemtoplayer {arg} {path}")
-                    else:
-                        for path in paths:
-                            cmd = f"giveitemtoplayer {arg} {path}"
-                            task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-giveitemtoplayer"
-                            asyncio.create_task(self.executor(guild, server, cmd), name=task_name)
-                    resp = f"{gamertag}, your payday rewards have been sent!"
-                    com = f"serverchat {resp}"
-                    await self.executor(guild, server, com)
-                    return resp
-                else:
-                    lastused = cooldowns[gamertag]["payday"]
-                    lastused = datetime.datetime.fromisoformat(lastused)
-                    td = time - lastused
-                    td = td.total_seconds()
-                    tleft = duration - td
-                    time_left = time_formatter(tleft)
-                    resp = f"{gamertag}, You need to wait {time_left} before using that command again"
-                    com = f"serverchat  {resp}"
-                    await self.executor(guild, server, com)
-                    return resp
+            key = f"{guild.id}-{gamertag}-payday"
+            left = self.timers.remaining("cooldown", key)
+            if left:
+                time_left = time_formatter(int(left))
+                resp = f"{gamertag}, You need to wait {time_left} before using that command again"
+                com = f"serverchat  {resp}"
+                await self.executor(guild, server, com)
+                return resp
+            self.timers.schedule("cooldown", key, time.timestamp() + duration)
+            paths = settings["payday"]["paths"]
+            rand = settings["payday"]["random"]
+            if rand:
+                path = random.choice(paths)
+                await self.executor(guild, server, f"giveitemtoplayer {arg} {path}")
+            else:
+                for path in paths:
+                    cmd = f"giveitemtoplayer {arg} {path}"
+                    task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-giveitemtoplayer"
+                    asyncio.create_task(self.executor(guild, server, cmd), name=task_name)
+            resp = f"{gamertag}, your payday rewards have been sent!"
+            com = f"serverchat {resp}"
+            await self.executor(guild, server, com)
+            return resp
         # Starter kit command
         elif com == "kit":
             if not xuid or not stats:
@@ -4373,7 +4902,7 @@ class ArkTools(Calls, commands.Cog):
                 await self.executor(guild, server, com)
                 log.info(f"In-Game command failed for: {gamertag}, {com}")
                 return failed
-            kit = await self.config.guild(guild).kit()
+            kit = settings["kit"]
             if not kit["enabled"]:
                 resp = f"{gamertag}, That command is disabled on this server at the moment"
                 com = f"serverchat {resp}"
@@ -4406,6 +4935,7 @@ class ArkTools(Calls, commands.Cog):
                     return resp
                 else:
                     kit["claimed"].append(xuid)
+                    self.settings.bump(guild.id)
                     for path in kit["paths"]:
                         cmd = f"giveitemtoplayer {arg} {path}"
                         task_name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-giveitemtoplayer"
@@ -4435,90 +4965,82 @@ class ArkTools(Calls, commands.Cog):
         else:
             return None
 
-    def init_lastran(self, cid: str):
-        # ID doesnt exist yet so either cog was just loaded or that vote is new
-        if cid not in self.lastran:
-            self.lastran[cid] = {}
+    async def update_lastran(self, guild: discord.guild, cid, vote_type: str):
+        # Start the cooldown for a vote type on this map
+        cooldown = int((await self.settings.get(guild))["votecooldown"])
+        self.timers.schedule("votecooldown", f"{cid}-{vote_type}", datetime.datetime.now().timestamp() + cooldown)
 
-    def update_lastran(self, cid: str, vote_type: str):
-        self.init_lastran(cid)
-        time = datetime.datetime.now()
-        self.lastran[cid][vote_type] = time
+    def end_votes(self, cid):
+        # A vote went through, so every open session on the map is done
+        for vote_type in self.votes.pop(cid, {}):
+            self.timers.cancel("vote", f"{cid}-{vote_type}")
 
     # Determines if a vote is valid or not
     async def vote_handler(self, guild, channel_id, server, gamertag, vote_type):
-        time = datetime.datetime.now()
-        self.init_lastran(channel_id)
-        if vote_type not in self.lastran[channel_id]:
-            can_run = True
+        left = self.timers.remaining("votecooldown", f"{channel_id}-{vote_type}")
+        if left:
+            tleft = time_formatter(int(left))
+            msg = f"{vote_type} in cooldown, wait {tleft}"
+            return msg
+        playerlist = self.playerlist[channel_id]
+        if playerlist:
+            count = len(playerlist)
         else:
-            last_ran = self.lastran[channel_id][vote_type]
-            td = time - last_ran
-            td = td.total_seconds()
-            td = int(td)
-            cooldown = await self.config.guild(guild).votecooldown()
-            cooldown = int(cooldown)
-            if td > cooldown:
-                can_run = True
-            else:
-                tleft = cooldown - td
-                tleft = time_formatter(tleft)
-                msg = f"{vote_type} in cooldown, wait {tleft}"
-                return msg
-        if can_run:
-            time_till_expired = time + datetime.timedelta(minutes=2)
-            playerlist = self.playerlist[channel_id]
-            if playerlist:
-                count = len(playerlist)
-            else:
-                count = 1
-            min_votes = math.ceil(count / 2)
-            if count == 1:
-                min_votes = 1
-            if count > 10:
-                min_votes = math.ceil(math.sqrt(2 * count))
-            if channel_id not in self.votes:
-                self.votes[channel_id] = {}
-            if vote_type not in self.votes[channel_id]:
-                self.votes[channel_id][vote_type] = {
-                    "expires": time_till_expired,
-                    "votes": [],
-                    "minvotes": min_votes,
-                    "server": server
-                }
-            if gamertag not in self.votes[channel_id][vote_type]["votes"]:
-                self.votes[channel_id][vote_type]["votes"].append(gamertag)
-            min_votes = self.votes[channel_id][vote_type]["minvotes"]
-            current = len(self.votes[channel_id][vote_type]["votes"])
-            remaining = min_votes - current
-            return int(remaining)
-
-    @tasks.loop(seconds=10)
-    async def vote_sessions(self):
-        expired = []
-        for cid in self.votes:
-            for votetype, session in self.votes[cid].items():
-                self.init_lastran(cid)
-                time = datetime.datetime.now()
-                if time > session["expires"]:
-                    if len(session["votes"]) < session["minvotes"]:
-                        guild = session["server"]["guild"]
-                        await self.executor(guild, session["server"], f"serverchat {votetype} session expired")
-                        self.update_lastran(cid, votetype)
-                        channel = guild.get_channel(int(cid))
-                        crosschat = await self.config.guild(guild).crosschat()
-                        if channel and crosschat:
-                            await channel.send(f"`{votetype} session expired`")
-                        if cid not in expired:
-                            expired.append(cid)
-        for cid in expired:
+            count = 1
+        min_votes = math.ceil(count / 2)
+        if count == 1:
+            min_votes = 1
+        if count > 10:
+            min_votes = math.ceil(math.sqrt(2 * count))
+        if channel_id not in self.votes:
+            self.votes[channel_id] = {}
+        if vote_type not in self.votes[channel_id]:
+            self.votes[channel_id][vote_type] = {
+                "votes": [],
+                "minvotes": min_votes,
+                "server": server
+            }
+            # Sessions only live in memory, so their timers aren't saved either
+            expires = datetime.datetime.now().timestamp() + 120
+            self.timers.schedule("vote", f"{channel_id}-{vote_type}", expires, (channel_id, vote_type), persist=False)
+        if gamertag not in self.votes[channel_id][vote_type]["votes"]:
+            self.votes[channel_id][vote_type]["votes"].append(gamertag)
+        min_votes = self.votes[channel_id][vote_type]["minvotes"]
+        current = len(self.votes[channel_id][vote_type]["votes"])
+        remaining = min_votes - current
+        return int(remaining)
+
+    # Vote session ran out before it got enough votes
+    async def vote_expired(self, timer: Timer):
+        cid, votetype = timer.data
+        session = self.votes.get(cid, {}).pop(votetype, None)
+        if session is None:
+            return
+        if not self.votes[cid]:
             del self.votes[cid]
-
-    @vote_sessions.before_loop
-    async def before_vote_sessions(self):
-        await self.bot.wait_until_red_ready()
-        await asyncio.sleep(10)
-        log.info("Vote session manager ready")
+        guild = session["server"]["guild"]
+        await self.executor(guild, session["server"], f"serverchat {votetype} session expired")
+        await self.update_lastran(guild, cid, votetype)
+        channel = guild.get_channel(int(cid))
+        crosschat = (await self.settings.get(guild))["crosschat"]
+        if channel and crosschat:
+            await channel.send(f"`{votetype} session expired`")
+
+    # In-game cooldowns used to be saved in the config, anything still running moves onto the timer wheel
+    async def migrate_cooldowns(self):
+        for guild in self.bot.guilds:
+            cooldowns = await self.config.guild(guild).cooldowns()
+            if not cooldowns:
+                continue
+            payday = int(await self.config.guild(guild).payday.cooldown()) * 3600
+            now = time.time()
+            for gamertag, used in cooldowns.items():
+                for command, last in used.items():
+                    length = 1800 if command == "imstuck" else payday
+                    expires = datetime.datetime.fromisoformat(last).timestamp() + length
+                    if expires > now:
+                        self.timers.schedule("cooldown", f"{guild.id}-{gamertag}-{command}", expires)
+            await self.config.guild(guild).cooldowns.set({})
 
     @tasks.loop(seconds=60)
     async def gather_graphdata(self):
@@ -4526,7 +5048,7 @@ class ArkTools(Calls, commands.Cog):
             guild = self.bot.get_guild(int(guild_id))
             if not guild:
                 continue
-            clusters = await self.config.guild(guild).clusters()
+            clusters = (await self.settings.get(guild))["clusters"]
             cluster_counts = {}
             total_players = 0
             for cname, cdata in clusters.items():
@@ -4540,14 +5062,7 @@ class ArkTools(Calls, commands.Cog):
                         total_players += len(plist)
                         ctotal += len(plist)
                 cluster_counts[cname] = ctotal
-            now = datetime.datetime.now(pytz.timezone("UTC"))
-            async with self.config.guild(guild).serverstats() as serverstats:
-                serverstats["dates"].append(now.isoformat())
-                serverstats["counts"].append(total_players)
-                for cname, count in cluster_counts.items():
-                    if cname not in serverstats:
-                        serverstats[cname] = []
-                    serverstats[cname].append(count)
+            await self.graphs.append(guild.id, int(time.time()), total_players, cluster_counts)
 
     @gather_graphdata.before_loop
     async def before_gather_graphdata(self):
@@ -4561,11 +5076,10 @@ class ArkTools(Calls, commands.Cog):
             guild = self.bot.get_guild(int(guild_id))
             if not guild:
                 continue
-            settings = await self.config.guild(guild).all()
-            thumbnail = LIVE
-            status = ""
-            totalplayers = 0
-            dest_channel = settings["status"]["channel"]
+            settings = await self.settings.get(guild)
+            # Message ids are written by this loop so they aren't part of the snapshot
+            status_data = await self.config.guild(guild).status()
+            dest_channel = status_data["channel"]
             if not dest_channel:
                 error = f"{guild.name} has not set a status channel"
                 if error not in self.warnings:
@@ -4584,15 +5098,20 @@ class ArkTools(Calls, commands.Cog):
             if not send_perms:
                 log.warning(f"Can't send messages to status channel in {guild.name}")
                 continue
-            # Get graph
-            hours = settings["status"]["time"]
-            file = await get_graph(settings, int(hours))
-            img = "attachment://plot.png"
-            # Gather server player counts
+            board = self.boards.get(guild.id)
+            if board is None or board.channel_id != dest_channel.id:
+                message_ids = list(status_data["multi"]) or ([status_data["message"]] if status_data["message"] else [])
+                if board is not None:
+                    # Status channel was changed, take the old pages down
+                    await board.clear(guild.get_channel(board.channel_id))
+                    message_ids = []
+                board = StatusBoard(dest_channel.id, message_ids)
+                self.boards[guild.id] = board
+
+            # Gather server player counts, downtime and alerts are tracked every tick
+            state = []
             for cluster in settings["clusters"]:
                 cname = cluster
-                clustertotal = 0
-                status += f"**{cluster.upper()}**\n"
                 servers = settings["clusters"][cluster]["servers"]
                 clustersettngs = settings["clusters"][cluster]
                 alertchannel = guild.get_channel(clustersettngs["adminlogchannel"])
@@ -4606,6 +5125,7 @@ class ArkTools(Calls, commands.Cog):
                 else:
                     pingrole = "Failed to Ping admin role... BUT,"
                 alerts = ""
+                rows = []
                 for server in servers:
                     sname = server
                     server = servers[server]
@@ -4614,44 +5134,21 @@ class ArkTools(Calls, commands.Cog):
                     # Get cached player count data
                     playerlist = self.playerlist[channel]
 
-                    if channel not in self.downtime:
-                        self.downtime[channel] = 0
-
-                    count = self.downtime[channel]
                     if playerlist == "offline":
-                        thumbnail = FAILED
-                        inc = "Minutes."
-                        if count >= 60:
-                            count = count / 60
-                            inc = "Hours."
-                            count = int(count)
-                        schannel = guild.get_channel(channel)
-                        if schannel:
-                            schannel = schannel.mention
-                        else:
-                            schannel = channel
-                        status += f"{schannel}: Offline for {count} {inc}\n"
-                        if self.downtime[channel] == 10:
+                        # Downtime counts from the first failed call, not from when this loop noticed
+                        health = self.health.get(server)
+                        since = health.failing_since or time.time()
+                        downtime = int((time.time() - since) / 60)
+                        # Shown in whole hours past 60 minutes, so the text only changes when the hour does
+                        rows.append((channel, "offline", downtime if downtime < 60 else downtime // 60 * 60))
+                        if downtime >= 10 and health.failing_since and not health.alerted:
+                            health.alerted = True
                             alerts += f"The **{sname} {cname}** server has been offline for 10 minutes now!\n"
-                        self.downtime[channel] += 2
-
                     elif playerlist == "empty":
-                        status += f"{guild.get_channel(channel).mention}: 0 Players\n"
-                        self.downtime[channel] = 0
-
+                        rows.append((channel, "empty", 0))
                     else:
-                        playercount = len(playerlist)
-                        clustertotal += playercount
-                        totalplayers += playercount
-                        if playercount == 1:
-                            status += f"{guild.get_channel(channel).mention}: {playercount} player\n"
-                        else:
-                            status += f"{guild.get_channel(channel).mention}: {playercount} players\n"
-
-                if clustertotal == 1:
-                    status += f"`{clustertotal}` player cluster wide\n\n"
-                else:
-                    status += f"`{clustertotal}` players cluster wide\n\n"
+                        rows.append((channel, "online", len(playerlist)))
+                state.append((cname, tuple(rows)))
 
                 if alerts and perms and alertchannel:
                     await alertchannel.send(
@@ -4659,63 +5156,98 @@ class ArkTools(Calls, commands.Cog):
                         allowed_mentions=mentions
                     )
 
+            # Text is only rebuilt when a count or downtime changed, the graph on its own interval
+            hours = int(status_data["time"])
+            graph_due = board.graph_due(hours)
+            if board.changed(tuple(state)):
+                board.status, board.totalplayers, board.thumbnail = self.status_text(guild, state)
+                board.updated = datetime.datetime.now(pytz.timezone("UTC"))
+            elif not graph_due:
+                board.skipped += 1
+                continue
+            png = None
+            if graph_due:
+                window = self.graphs.window(guild.id, hours * 3600)
+                png = await self.renderer.render(guild.id, window, settings["timezone"], hours)
+
             # Embed setup
-            tz = settings["timezone"]
-            tz = pytz.timezone(tz)
-            # Cleanup previous message/messages
-            status_data = settings["status"]
-            task_name = f"ArkTools-{guild.name}-StatusCleanup"
-            asyncio.create_task(self.status_cleaner(status_data), name=task_name)
-            now = datetime.datetime.now(pytz.timezone("UTC"))
+            tz = pytz.timezone(settings["timezone"])
+            embeds = []
             # Nice simple single embed status channel for normal people
-            if len(status) <= 4096:
+            if len(board.status) <= 4096:
                 embed = discord.Embed(
-                    description=status,
-                    color=discord.Color.random(),
-                    timestamp=now.astimezone(tz)
+                    description=board.status,
+                    color=board.color,
+                    timestamp=board.updated.astimezone(tz)
                 )
                 embed.set_author(name="Server Status", icon_url=guild.icon_url)
-                embed.add_field(name="Total Players", value=f"`{totalplayers}`")
-                embed.set_thumbnail(url=thumbnail)
-                embed.set_image(url=img)
-                if file:
-                    message = await dest_channel.send(embed=embed, file=file)
-                else:
-                    message = await dest_channel.send(embed=embed)
-                await self.config.guild(guild).status.multi.set([])
-                await self.config.guild(guild).status.message.set(message.id)
+                embed.add_field(name="Total Players", value=f"`{board.totalplayers}`")
+                embed.set_thumbnail(url=board.thumbnail)
+                embeds.append(embed)
             else:  # Person must have a fuck ton of servers for the bot to have use this ugh
                 # Embed is too dummy thicc and needs multiple embeds
-                pages = 0
-                for _ in pagify(status):
-                    pages += 1
-                new_message_list = []
-                count = 1
-                color = discord.Color.random()
-                for p in pagify(status):
-                    if count == pages:
+                pages = list(pagify(board.status))
+                for count, p in enumerate(pages, start=1):
+                    if count == len(pages):
                         embed = discord.Embed(
                             description=p,
-                            color=color,
-                            timestamp=now.astimezone(tz)
+                            color=board.color,
+                            timestamp=board.updated.astimezone(tz)
                         )
                     else:
                         embed = discord.Embed(
                             description=p,
-                            color=color
+                            color=board.color
                         )
                     if count == 1:
                         embed.set_author(name="Server Status", icon_url=guild.icon_url)
-                        embed.set_thumbnail(url=thumbnail)
-                    if count == pages:
-                        embed.set_image(url=img)
-                        message = await dest_channel.send(embed=embed, file=file)
+                        embed.set_thumbnail(url=board.thumbnail)
+                    embeds.append(embed)
+
+            if await board.sync(dest_channel, embeds, png):
+                if len(board.message_ids) == 1:
+                    await self.config.guild(guild).status.multi.set([])
+                    await self.config.guild(guild).status.message.set(board.message_ids[0])
+                else:
+                    await self.config.guild(guild).status.message.set(None)
+                    await self.config.guild(guild).status.multi.set(board.message_ids)
+
+    # Status embed text from the player counts gathered by the status loop
+    def status_text(self, guild: discord.guild, state: list) -> typing.Tuple[str, int, str]:
+        thumbnail = LIVE
+        status = ""
+        totalplayers = 0
+        for cluster, rows in state:
+            clustertotal = 0
+            status += f"**{cluster.upper()}**\n"
+            for channel, kind, count in rows:
+                schannel = guild.get_channel(channel)
+                if schannel:
+                    schannel = schannel.mention
+                else:
+                    schannel = channel
+                if kind == "offline":
+                    thumbnail = FAILED
+                    inc = "Minutes."
+                    if count >= 60:
+                        count = int(count / 60)
+                        inc = "Hours."
+                    status += f"{schannel}: Offline for {count} {inc}\n"
+                elif kind == "empty":
+                    status += f"{schannel}: 0 Players\n"
+                else:
+                    clustertotal += count
+                    totalplayers += count
+                    if count == 1:
+                        status += f"{schannel}: {count} player\n"
                     else:
-                        message = await dest_channel.send(embed=embed)
-                    count += 1
-                    new_message_list.append(message.id)
-                await self.config.guild(guild).status.message.set(None)
-                await self.config.guild(guild).status.multi.set(new_message_list)
+                        status += f"{schannel}: {count} players\n"
+
+            if clustertotal == 1:
+                status += f"`{clustertotal}` player cluster wide\n\n"
+            else:
+                status += f"`{clustertotal}` players cluster wide\n\n"
+        return status, totalplayers, thumbnail
 
     @status_channel.before_loop
     async def before_status_channel(self):
@@ -4729,95 +5261,86 @@ class ArkTools(Calls, commands.Cog):
         current_time = datetime.datetime.now(pytz.timezone("UTC"))
         if not self.time:
             self.time = current_time.isoformat()
-        for data in self.servers:
-            guild_id = str(data[0])
-            guild = self.bot.get_guild(int(guild_id))
-            if guild_id not in self.activeguilds:
+        last = datetime.datetime.fromisoformat(str(self.time))
+        timedifference = int((current_time - last).total_seconds())
+        # Group servers by guild so each guild's config is read once and written once per tick
+        guilds = {}
+        for guild_id, server in self.servers:
+            guilds.setdefault(guild_id, []).append(server)
+        for guild_id, servers in guilds.items():
+            if str(guild_id) not in self.activeguilds:
                 continue
-            settings = await self.config.guild(guild).all()
-            autofriend = settings["autofriend"]
-            server = data[1]
-            channel = server["chatchannel"]
-            sname = server["name"]
-            cname = server["cluster"]
-            mapstring = f"{sname} {cname}"
-            if channel not in self.playerlist:
-                log.warning(f"Player_Stats: {mapstring} not found in playerlist!")
-                continue
-            if not self.playerlist[channel]:
-                continue
-            if self.playerlist[channel] == "offline":
-                continue
-            if self.playerlist[channel] == "empty":
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
                 continue
-            players = settings["players"]
-            for player in self.playerlist[channel]:
-                last = datetime.datetime.fromisoformat(str(self.time))
-                timedifference = current_time - last
-                timedifference = int(timedifference.total_seconds())
-                xuid = player[1]
-                gamertag = player[0]
-                if xuid not in players:  # New player found
-                    task_name = f"ArkTools-{guild.name}-InitNewPlayer"
-                    asyncio.create_task(
-                        self.init_new_player(
-                            guild, settings, server, xuid, gamertag
-                        ),
-                        name=task_name
-                    )
-                else:
-                    last_seen = players[xuid]["lastseen"]["map"]
+            settings = await self.settings.get(guild)
+            autofriend = settings["autofriend"]
+            # Only load the players that are online right now (the whole config if not using the database)
+            online = []
+            for server in servers:
+                playerlist = self.playerlist.get(server["chatchannel"])
+                if isinstance(playerlist, list):
+                    online.extend(player[1] for player in playerlist)
+            players = await self.playerdata(guild, online)
+            ranks = settings["ranks"]
+            for server in servers:
+                channel = server["chatchannel"]
+                sname = server["name"]
+                cname = server["cluster"]
+                mapstring = f"{sname} {cname}"
+                if channel not in self.playerlist:
+                    log.warning(f"Player_Stats: {mapstring} not found in playerlist!")
+                    continue
+                if not self.playerlist[channel]:
+                    continue
+                if self.playerlist[channel] == "offline":
+                    continue
+                if self.playerlist[channel] == "empty":
+                    continue
+                for player in self.playerlist[channel]:
+                    xuid = player[1]
+                    gamertag = player[0]
+                    if xuid not in players:  # New player found
+                        task_name = f"ArkTools-{guild.name}-InitNewPlayer"
+                        asyncio.create_task(
+                            self.init_new_player(
+                                guild, settings, server, xuid, gamertag
+                            ),
+                            name=task_name
+                        )
+                        continue
+                    # Decisions are made from the stored data plus anything not flushed yet
+                    stats = self.statstore.view(guild_id, xuid, players[xuid])
+                    last_seen = stats["lastseen"]["map"]
                     if not last_seen:
                         if "tokens" in server and autofriend:
-                            async with aiohttp.ClientSession() as session:
-                                tokens = server["tokens"]
-                                xbl_client, token = await self.auth_manager(
-                                    session,
-                                    cname,
-                                    sname,
-                                    tokens,
-                                    ctx=None,
-                                    guild=guild
-                                )
-                                if autofriend and xbl_client:
-                                    task_name = f"ArkTools-{guild.name}-AutoFriend"
-                                    asyncio.create_task(self.add_friend(str(xuid), token), name=task_name)
-                    async with self.config.guild(guild).players() as stats:
-                        if str(channel) not in stats[xuid]["ingame"]:
-                            stats[xuid]["ingame"][str(channel)] = {
-                                "implant": None,
-                                "name": None,
-                                "previous_names": [],
-                                "stats": {
-                                    "pvpkills": 0,
-                                    "pvpdeaths": 0,
-                                    "pvedeaths": 0,
-                                    "tamed": 0
-                                }
-                            }
-                        if mapstring not in stats[xuid]["playtime"]:
-                            stats[xuid]["playtime"][mapstring] = 0
-                        else:
-                            stats[xuid]["playtime"][mapstring] += timedifference
-                            stats[xuid]["playtime"]["total"] += timedifference
-                            stats[xuid]["lastseen"] = {
-                                "time": current_time.isoformat(),
-                                "map": mapstring
-                            }
-                            ranks = settings["ranks"]
-                            hours = int(stats[xuid]["playtime"]["total"] / 3600)
-                            if str(hours) in ranks:
-                                role = ranks[str(hours)]
-                                role = guild.get_role(role)
-                                if role and "rank" in stats[xuid] and "discord" in stats[xuid]:
-                                    current_rank = stats[xuid]["rank"]
-                                    if role.id != current_rank:
-                                        task_name = f"ArkTools-{guild.name}-UpdatingRanks"
-                                        asyncio.create_task(
-                                            self.update_ranks(guild, settings, stats, xuid),
-                                            name=task_name
-                                        )
-                                stats[xuid]["rank"] = role.id
+                            self.social.put(SocialJob(guild.id, cname, sname, FRIEND, xuid, gamertag))
+                    pending = self.statstore.record(guild_id, xuid)
+                    if str(channel) not in stats["ingame"]:
+                        pending.ingame.add(str(channel))
+                    if mapstring not in stats["playtime"]:
+                        pending.playtime[mapstring] = 0
+                        continue
+                    pending.playtime[mapstring] = pending.playtime.get(mapstring, 0) + timedifference
+                    pending.total += timedifference
+                    pending.lastseen = {
+                        "time": current_time.isoformat(),
+                        "map": mapstring
+                    }
+                    stats = self.statstore.view(guild_id, xuid, players[xuid])
+                    hours = int(stats["playtime"]["total"] / 3600)
+                    if str(hours) in ranks:
+                        role = guild.get_role(ranks[str(hours)])
+                        if not role:
+                            continue
+                        if "rank" in stats and "discord" in stats and role.id != stats["rank"]:
+                            task_name = f"ArkTools-{guild.name}-UpdatingRanks"
+                            asyncio.create_task(
+                                self.update_ranks(guild, settings, {xuid: stats}, xuid),
+                                name=task_name
+                            )
+                        pending.rank = role.id
+            await self.statstore.flush(guild)
         self.time = datetime.datetime.now(pytz.timezone("UTC")).isoformat()
 
     @staticmethod
@@ -4888,123 +5411,52 @@ class ArkTools(Calls, commands.Cog):
                    f"Everyone say hi to {gamertag}!!!\n```"
             if channel_obj:
                 await channel_obj.send(welc)
-        async with self.config.guild(guild).players() as stats:
+        async with self.playerdata(guild, [xuid]) as stats:
             stats[xuid] = {
                 "playtime": {"total": 0},
                 "username": gamertag,
                 "lastseen": {"time": current_time.isoformat(), "map": mapstring},
                 "ingame": {}
             }
+            self.reindex(guild, stats, xuid)
         newplayermessage = f"**{gamertag}** added to the database.\n"
         if "tokens" in server and (autowelcome or autofriend):
-            async with aiohttp.ClientSession() as session:
-                host = server["gamertag"]
-                tokens = server["tokens"]
-                xbl_client, token = await self.auth_manager(
-                    session,
-                    cname,
-                    sname,
-                    tokens,
-                    ctx=None,
-                    guild=guild
-                )
-                if autowelcome and xbl_client:
-                    try:
-                        inv = await guild.vanity_invite()
-                    except discord.Forbidden:
-                        try:
-                            inv = await channel_obj.create_invite(unique=False, reason="New Player")
-                        except Exception as e:
-                            log.exception(f"INVITE CREATION FAILED: {e}")
-                    if settings["welcomemsg"]:
-                        params = {
-                            "discord": guild.name,
-                            "gamertag": gamertag,
-                            "link": inv
-                        }
-                        welcome = settings["welcomemsg"]
-                        welcome = welcome.format(**params)
-                    else:
-                        welcome = f"Welcome to {guild.name}!\nThis is an automated message:\n" \
-                                  f"You appear to be a new player, " \
-                                  f"here is an invite to the Discord server:\n\n{inv}"
+            host = server["gamertag"]
+            welcome = ""
+            if autowelcome:
+                inv = None
+                try:
+                    inv = await guild.vanity_invite()
+                except discord.Forbidden:
                     try:
-                        task_name = f"ArkTools-{guild.name}-NewPlayerSendXboxDM"
-                        asyncio.create_task(
-                            xbl_client.message.send_message(str(xuid), welcome), name=task_name
-                        )
-                        newplayermessage += f"DM sent: ✅\n"
+                        inv = await channel_obj.create_invite(unique=False, reason="New Player")
                     except Exception as e:
-                        log.warning(f"{gamertag} Failed to DM New Player in guild {guild}: {e}")
-                        newplayermessage += f"DM sent: ❌ {e}\n"
-
-                if autofriend and xbl_client:
-                    status = await self.add_friend(str(xuid), token)
-                    if 200 <= status <= 204:
-                        newplayermessage += f"Added by {host}: ✅\n"
-                    else:
-                        log.warning(f"{host} FAILED to add {gamertag} in guild {guild}")
-                        newplayermessage += f"Added by {host}: ❌\n"
+                        log.exception(f"INVITE CREATION FAILED: {e}")
+                if settings["welcomemsg"]:
+                    params = {
+                        "discord": guild.name,
+                        "gamertag": gamertag,
+                        "link": inv
+                    }
+                    welcome = settings["welcomemsg"]
+                    welcome = welcome.format(**params)
+                else:
+                    welcome = f"Welcome to {guild.name}!\nThis is an automated message:\n" \
+                              f"You appear to be a new player, " \
+                              f"here is an invite to the Discord server:\n\n{inv}"
+            # Friend requests and DMs go through the social queue, failures show up in its event log digest
+            if autofriend:
+                # The welcome DM is sent once the friend request goes through
+                self.social.put(SocialJob(guild.id, cname, sname, FRIEND, xuid, gamertag, text=welcome))
+                newplayermessage += f"Friend request from {host}: queued\n"
+            else:
+                self.social.put(SocialJob(guild.id, cname, sname, MESSAGE, xuid, gamertag, welcome))
+            if welcome:
+                newplayermessage += "Welcome DM: queued\n"
 
-                alt = settings["alt"]
-                if alt["on"] and xbl_client:  # If alt detection is on
-                    try:
-                        profile = json.loads(
-                            (
-                                await xbl_client.profile.get_profile_by_gamertag(gamertag)
-                            ).json()
-                        )
-                        friends = json.loads(
-                            (
-                                await xbl_client.people.get_friends_summary_by_gamertag(gamertag)
-                            ).json()
-                        )
-                    except aiohttp.ClientResponseError:
-                        profile = None
-                        friends = None
-                    if profile and friends:
-                        sus, reasons = detect_sus(alt, profile, friends)
-                        if sus:
-                            yes = "✅"
-                            no = "❌"
-                            if alt["autoban"] and int(xuid) not in alt["whitelist"]:
-                                banned = yes
-                                command = f"banplayer {xuid}"
-                                for tup in self.servers:
-                                    sguild = tup[0]
-                                    server = tup[1]
-                                    task_name = f"ArkTools-{guild.name}-{server['name']}-" \
-                                                f"{server['cluster']}-Banplayer"
-                                    if sguild == guild.id:
-                                        asyncio.create_task(
-                                            self.executor(guild, server, command),
-                                            name=task_name
-                                        )
-                                log.info(f"Banning {gamertag} - {xuid} from all servers")
-                            else:
-                                banned = no
-                            if alt["msgtoggle"] and alt["msg"]:
-                                warning = yes
-                                params = {"reasons": reasons}
-                                msg = alt["msg"].format(**params)
-                                await xbl_client.message.send_message(str(xuid), msg)
-                            else:
-                                warning = no
-                            if eventlog:
-                                embed = discord.Embed(
-                                    description=f"**Suspicious account detected!**\n"
-                                                f"**{gamertag}** - `{xuid}`\n"
-                                                f"`Auto-Banned:  `{banned}\n"
-                                                f"`Sent Warning: `{warning}\n"
-                                                f"**Reasons**\n"
-                                                f"{box(reasons)}",
-                                    color=discord.Color.orange()
-                                )
-                                try:
-                                    await eventlog.send(embed=embed)
-                                except discord.HTTPException:
-                                    log.warning("Sus account message failed.")
-                                    pass
+        # Alt detection is batched per host gamertag and judged once the account has been looked up
+        if settings["alt"]["on"] and "tokens" in server:
+            self.altdetect.put(AltCheck(guild.id, cname, sname, str(xuid), gamertag))
 
         if eventlog:
             embed = discord.Embed(
@@ -5021,6 +5473,7 @@ class ArkTools(Calls, commands.Cog):
     async def before_player_stats(self):
         await self.bot.wait_until_red_ready()
         await asyncio.sleep(7)
+        await self.altdetect.load()
         log.info("Playerstats loop ready")
 
     @commands.Cog.listener()
@@ -5029,6 +5482,12 @@ class ArkTools(Calls, commands.Cog):
         if not autoclear:
             return
         await self.config.guild(guild).clear()
+        if guild.id in self.dbguilds:
+            await self.db.clear(guild.id)
+            self.dbguilds.discard(guild.id)
+        self.drop_index(guild)
+        self.settings.drop(guild.id)
+        self.boards.pop(guild.id, None)
         await self.initialize()
         log.info(f"Guild {guild.name}'s config has been cleared for kicking the bot")
 
@@ -5044,40 +5503,20 @@ class ArkTools(Calls, commands.Cog):
         autofriend = settings["autofriend"]
         if not autofriend:
             return
-        eventlog = settings["eventlog"]
-        tokendata = []
-        for xuid, data in settings["players"].items():
-            if "discord" in data:
-                if int(member.id) == int(data["discord"]):
-                    async with self.config.guild(member.guild).players() as stats:
-                        stats[xuid]["leftdiscordon"] = time.isoformat()
-                    for cname, cluster in settings["clusters"].items():
-                        for sname, server in cluster["servers"].items():
-                            if "tokens" in server:
-                                tokendata.append((xuid, cname, sname, server["tokens"]))
-        if len(tokendata) == 0:
-            return
-        async with aiohttp.ClientSession() as session:
-            for item in tokendata:
-                xbl_client, token = await self.auth_manager(
-                    session,
-                    item[1],
-                    item[2],
-                    item[3],
-                    ctx=None,
-                    guild=member.guild
-                )
-                if token:
-                    task_name = f"ArkTools-{member.guild.name}-Unfriending-{member.name}"
-                    asyncio.create_task(self.remove_friend(item[0], token), name=task_name)
-            if eventlog:
-                eventlog = member.guild.get_channel(eventlog)
-                embed = discord.Embed(
-                    description=f"**{member.display_name}** - `{member.id}` was unfriended by the host Gamertags "
-                                f"for leaving the Discord.",
-                    color=discord.Color.blurple()
-                )
-                await eventlog.send(embed=embed)
+        for xuid in await self.find_discord(member.guild, member.id, settings["players"]):
+            async with self.playerdata(member.guild, [xuid]) as stats:
+                if xuid not in stats:
+                    continue
+                stats[xuid]["leftdiscordon"] = time.isoformat()
+                gamertag = stats[xuid].get("username", "")
+            # Results are posted to the event log once each host's queue is done
+            for cname, cluster in settings["clusters"].items():
+                for sname, server in cluster["servers"].items():
+                    if "tokens" in server:
+                        self.social.put(SocialJob(
+                            member.guild.id, cname, sname, UNFRIEND, xuid, gamertag,
+                            reason=f"for leaving the Discord ({member.display_name})"
+                        ))
 
     # Unfriends players if they havent been seen on any server for the set amount of time
     @tasks.loop(hours=2)
@@ -5087,68 +5526,34 @@ class ArkTools(Calls, commands.Cog):
             return
         for guild in self.activeguilds:
             guild = self.bot.get_guild(int(guild))
-            settings = await self.config.guild(guild).all()
+            settings = await self.settings.get(guild)
             autofriend = settings["autofriend"]
             if not autofriend:
                 continue
-            eventlog = settings["eventlog"]
-            eventlog = guild.get_channel(eventlog)
-            stats = settings["players"]
+            if guild.id in self.dbguilds:
+                stats = await self.db.lastseen(guild.id)
+            else:
+                stats = await self.playerdata(guild)
             unfriendtime = int(settings["unfriendafter"])
             # List of users who havent been detected on the servers in X amount of time
             expired = await expired_players(stats, unfriendtime)
             if len(expired) == 0:
                 continue
 
-            tokendata = []
+            # Remove players from host Gamertags' friends list, their last seen map is cleared once that's done
+            msg = "This is an automated message:\n\n" \
+                  "You have been unfriended by this Gamertag.\n" \
+                  f"Reason: No activity in any server over the last {unfriendtime} days\n" \
+                  f"To play this map again simply friend the account and join session."
             for cname, cluster in settings["clusters"].items():
                 for sname, server in cluster["servers"].items():
-                    if "tokens" in server:
-                        tokendata.append((cname, sname, server["tokens"]))
-            if len(tokendata) == 0:
-                continue
-
-            # Remove players from host Gamertags' friends list
-            async with aiohttp.ClientSession() as session:
-                for item in tokendata:
-                    xbl_client, token = await self.auth_manager(
-                        session,
-                        item[0],
-                        item[1],
-                        item[2],
-                        ctx=None,
-                        guild=guild
-                    )
-                    if token:
-                        host = f"{item[1].capitalize()} {item[0].upper()}"
-                        # Adding expired players to unfriend queue
-                        async with self.config.guild(guild).players() as playerstats:
-                            for user in expired:
-                                xuid = user[0]
-                                playerstats[xuid]["lastseen"]["map"] = None
-                                player = user[1]
-                                status = await self.remove_friend(xuid, token)
-                                if 200 <= status <= 204:
-                                    # Set last seen to None
-                                    msg = "This is an automated message:\n\n" \
-                                          "You have been unfriended by this Gamertag.\n" \
-                                          f"Reason: No activity in any server over the last {unfriendtime} days\n" \
-                                          f"To play this map again simply friend the account and join session."
-                                    await xbl_client.message.send_message(str(xuid), msg)
-                                else:
-                                    log.info(f"Failed to unfriend {player} - {xuid} by the host {host} "
-                                             f"for exceeding {unfriendtime} days of inactivity.")
-
-            if eventlog:
-                for user in expired:
-                    player = user[1]
-                    xuid = user[0]
-                    embed = discord.Embed(
-                        description=f"**{player}** - `{xuid}` was unfriended by the "
-                                    f"host Gamertags for exceeding {unfriendtime} days of inactivity.",
-                        color=discord.Color.purple()
-                    )
-                    await eventlog.send(embed=embed)
+                    if "tokens" not in server:
+                        continue
+                    for xuid, player in expired:
+                        self.social.put(SocialJob(
+                            guild.id, cname, sname, UNFRIEND, xuid, player, text=msg,
+                            reason=f"for exceeding {unfriendtime} days of inactivity", expire=True
+                        ))
 
     @maintenance.before_loop
     async def before_maintenance(self):
@@ -5163,12 +5568,10 @@ class ArkTools(Calls, commands.Cog):
             return
         for guild in self.activeguilds:
             guild = self.bot.get_guild(int(guild))
-            settings = await self.config.guild(guild).all()
+            settings = await self.settings.get(guild)
             autofriend = settings["autofriend"]
             if not autofriend:
                 continue
-            eventlog = settings["eventlog"]
-            eventlog = guild.get_channel(eventlog)
             tokendata = []
             for cname, cluster in settings["clusters"].items():
                 for sname, server in cluster["servers"].items():
@@ -5177,16 +5580,17 @@ class ArkTools(Calls, commands.Cog):
             if len(tokendata) == 0:
                 continue
 
-            async with aiohttp.ClientSession() as session:
-                for item in tokendata:
-                    cname = item[0]
-                    sname = item[1]
-                    tokens = item[2]
-                    await self.autofriend_session(session, guild, cname, sname, tokens, eventlog)
+            for item in tokendata:
+                cname = item[0]
+                sname = item[1]
+                tokens = item[2]
+                # Hosts whose lists haven't been changing are checked less often
+                if not self.friendgraph.due(guild.id, cname, sname):
+                    continue
+                await self.autofriend_session(guild, cname, sname, tokens)
 
-    async def autofriend_session(self, session, guild: discord.guild, cname, sname, tokens, eventlog):
+    async def autofriend_session(self, guild: discord.guild, cname, sname, tokens):
         xbl_client, token = await self.auth_manager(
-            session,
             cname,
             sname,
             tokens,
@@ -5210,105 +5614,29 @@ class ArkTools(Calls, commands.Cog):
                 return
             followers = followers["people"]
 
-            # Detecting friend requests
-            people_to_add = await detect_friends(friends, followers)
-            sname = sname.capitalize()
-            cname = cname.upper()
-            if len(people_to_add) > 0:
-                for xuid, username in people_to_add:
-                    status = await self.add_friend(xuid, token)
-                    if 200 <= status <= 204 and eventlog:
-                        embed = discord.Embed(
-                            description=f"**{sname} {cname}** accepted **{username}**'s friend request.",
-                            color=discord.Color.green()
-                        )
-                        if eventlog:
-                            try:
-                                await eventlog.send(embed=embed)
-                            except discord.NotFound:
-                                pass
-                        welcome = f"Friend request accepted! " \
-                                  f"{username}, you can now join session from this account's profile page"
-                        await xbl_client.message.send_message(str(xuid), welcome)
-                    else:
-                        embed = discord.Embed(
-                            description=f"**{sname} {cname}** failed to accept **{username}**'s friend request.",
-                            color=discord.Color.red()
-                        )
-                        log.info(f"{sname} {cname} failed to accept {username}'s friend request.")
-                        if eventlog:
-                            try:
-                                await eventlog.send(embed=embed)
-                            except discord.NotFound:
-                                pass
-
-            # Detecting non-following players
-            for person in friends:
-                xuid = person["xuid"]
-                username = person["gamertag"]
-                following = person["is_following_caller"]
-                added = person["added_date_time_utc"]
-                added = fix_timestamp(str(added))
-                tz = pytz.timezone("UTC")
-                added = added.astimezone(tz)
-                time = datetime.datetime.now(tz)
-                timedifference = time - added
-                if not following and timedifference.days > 0:
-                    status = await self.remove_friend(xuid, token)
-                    if 200 <= status <= 204:
-                        ustatus = "successfully"
-                        msg = f"Hi {username}, you have been unfollowed by this account for not following back.\n" \
-                              "To play this map again simply add the account again and join session."
-                        await xbl_client.message.send_message(str(xuid), msg)
-                    else:
-                        ustatus = "unsuccessfully"
-                    if eventlog:
-                        embed = discord.Embed(
-                            description=f"**{username}** - `{xuid}` was {ustatus} removed by **{sname} {cname}**"
-                                        f" for unfollowing.",
-                            color=discord.Color.red()
-                        )
-                        await eventlog.send(embed=embed)
+            # Only new followers and friends that stopped following back come out of the snapshot diff,
+            # adds and removals go through the social queue and are reported in batches
+            people_to_add, people_to_drop = self.friendgraph.poll(guild.id, cname, sname, friends, followers)
+            for xuid, username in people_to_add:
+                welcome = f"Friend request accepted! " \
+                          f"{username}, you can now join session from this account's profile page"
+                self.social.put(SocialJob(guild.id, cname, sname, FRIEND, xuid, username, text=welcome))
+
+            for xuid, username in people_to_drop:
+                msg = f"Hi {username}, you have been unfollowed by this account for not following back.\n" \
+                      "To play this map again simply add the account again and join session."
+                self.social.put(SocialJob(
+                    guild.id, cname, sname, UNFRIEND, xuid, username, text=msg, reason="for unfollowing"
+                ))
 
     @autofriend.before_loop
     async def before_autofriend(self):
         await self.bot.wait_until_red_ready()
         await asyncio.sleep(30)
+        await self.social.load()
+        await self.friendgraph.load()
         log.info("Autofriend loop ready")
 
-    @tasks.loop(hours=5)
-    async def graphdata_prune(self):
-        pruned = 0
-        for guild in self.activeguilds:
-            guild = self.bot.get_guild(int(guild))
-            if not guild:
-                continue
-            stats = {}
-            data = await self.config.guild(guild).serverstats()
-            exp = data["expiration"]
-            curcounts = data["counts"]
-            to_keep = exp * 1440
-            stats["expiration"] = exp
-            for item, dat in data.items():
-                if item != "expiration":
-                    if len(dat) > to_keep:
-                        dat.reverse()
-                        newdat = dat[:to_keep]
-                        newdat.reverse()
-                        stats[str(item)] = newdat
-            if len(curcounts) > to_keep:
-                diff = len(curcounts) - to_keep
-                pruned += diff
-                await self.config.guild(guild).serverstats.set(stats)
-        if pruned:
-            log.info(f"Pruned {pruned} graph data points")
-
-    @graphdata_prune.before_loop
-    async def before_graphdata_prune(self):
-        await self.bot.wait_until_red_ready()
-        await asyncio.sleep(60)
-        log.info("Janitor ready")
-
     @commands.command(name="alltasks")
     @commands.is_owner()
     @commands.guild_only()
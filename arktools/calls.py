@@ -1,51 +1,129 @@
+import asyncio
 import json
+import time
+import typing
 
 import aiohttp
 
-HEADERS = {
-    'x-xbl-contract-version': '2',
-    'Authorization': '',
-    'Accept-Language': 'en-US',
-}
+# Refresh a host's tokens this many seconds before the XSTS token runs out
+EXPIRY_MARGIN = 300
+# Connections kept open to each Xbox Live host
+POOL_PER_HOST = 10
+
+
+def xbl_headers(token: str) -> dict:
+    return {
+        'x-xbl-contract-version': '2',
+        'Authorization': token,
+        'Accept-Language': 'en-US',
+    }
+
+
+class CachedToken(typing.NamedTuple):
+    client: typing.Any  # XboxLiveClient
+    xsts: str
+    # The refresh token that was stored alongside this XSTS token, a different one means it was re-authorized
+    refresh_token: str
+    expires: float  # Unix time
+
+
+class TokenCache:
+    """
+    XSTS tokens per host gamertag, reused until they're about to expire
+
+    Concurrent refreshes for the same host share one request (single-flight), so autofriend,
+    player_stats and a ban running at once only spend the host's single-use refresh token once.
+    """
+
+    def __init__(self):
+        self.tokens: typing.Dict[tuple, CachedToken] = {}
+        self.inflight: typing.Dict[tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.refreshes = 0
+        self.collapsed = 0
+
+    def get(self, key: tuple, tokens: dict) -> typing.Optional[CachedToken]:
+        entry = self.tokens.get(key)
+        if entry is None:
+            return None
+        if not tokens or entry.refresh_token != tokens.get("refresh_token"):
+            self.tokens.pop(key, None)
+            return None
+        if time.time() >= entry.expires - EXPIRY_MARGIN:
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, entry: CachedToken):
+        self.tokens[key] = entry
+
+    async def single_flight(self, key: tuple, refresh: typing.Callable[[], typing.Awaitable]):
+        future = self.inflight.get(key)
+        if future is not None:
+            self.collapsed += 1
+        else:
+            self.refreshes += 1
+            future = asyncio.ensure_future(refresh())
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # A caller giving up shouldn't cancel the refresh everyone else is waiting on
+        return await asyncio.shield(future)
+
+    def clear(self):
+        self.tokens.clear()
 
 
 class Calls:
     """XSAPI endpoints that xbox-webapi doesn't have"""
+    _http: typing.Optional[aiohttp.ClientSession] = None
+
+    @property
+    def http(self) -> aiohttp.ClientSession:
+        """One pooled session for every Xbox Live call the cog makes"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=POOL_PER_HOST))
+        return self._http
+
+    async def close_http(self):
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+
+    async def xbl_request(self, method: str, url: str, token: str, data: str = None) -> typing.Tuple[int, float]:
+        """Status code and how long Xbox Live asked us to back off for (0 unless rate limited)"""
+        async with self.http.request(method, url=url, headers=xbl_headers(token), data=data) as res:
+            retry_after = 0.0
+            if res.status == 429:
+                try:
+                    retry_after = float(res.headers.get("Retry-After", 0))
+                except ValueError:
+                    pass
+            return res.status, retry_after
+
     async def add_friend(self, xuid: str, token: str) -> int:
         url = f"https://social.xboxlive.com/users/me/people/xuid({xuid})"
-        HEADERS["Authorization"] = token
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url=url, headers=HEADERS) as res:
-                return res.status
+        async with self.http.put(url=url, headers=xbl_headers(token)) as res:
+            return res.status
 
     async def remove_friend(self, xuid: str, token: str) -> int:
         url = f"https://social.xboxlive.com/users/me/people/xuid({xuid})"
-        HEADERS["Authorization"] = token
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(url=url, headers=HEADERS) as res:
-                return res.status
+        async with self.http.delete(url=url, headers=xbl_headers(token)) as res:
+            return res.status
 
     async def block_player(self, xuid: int, token: str) -> int:
         url = f"https://privacy.xboxlive.com/users/me/people/never"
-        HEADERS["Authorization"] = token
         payload = {"xuid": xuid}
         payload = json.dumps(payload)
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url=url, headers=HEADERS, data=payload) as res:
-                return res.status
+        async with self.http.put(url=url, headers=xbl_headers(token), data=payload) as res:
+            return res.status
 
     async def unblock_player(self, xuid: int, token: str) -> int:
         url = f"https://privacy.xboxlive.com/users/me/people/never"
-        HEADERS["Authorization"] = token
         payload = {"xuid": xuid}
         payload = json.dumps(payload)
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(url=url, headers=HEADERS, data=payload) as res:
-                return res.status
+        async with self.http.delete(url=url, headers=xbl_headers(token), data=payload) as res:
+            return res.status
 
     async def get_followers_own(self, token: str) -> dict:
         url = "https://peoplehub.xboxlive.com/users/me/people/followers/decoration/details"
-        HEADERS["Authorization"] = token
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=url, headers=HEADERS) as res:
-                return await res.json()
+        async with self.http.get(url=url, headers=xbl_headers(token)) as res:
+            return await res.json()
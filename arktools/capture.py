@@ -0,0 +1,117 @@
+import asyncio
+import gzip
+import json
+import logging
+import pathlib
+import threading
+import time
+import typing
+
+log = logging.getLogger("red.vrt.arktools.capture")
+
+# A server's capture is rotated once its file is this big (compressed)
+MAX_BYTES = 5 * 1024 * 1024
+# Rotated files kept per server, name.1.jsonl.gz is the newest
+KEEP = 5
+# Records are buffered and written together at most this often
+FLUSH_INTERVAL = 10
+
+
+class TrafficCapture:
+    """
+    Records RCON commands and responses for servers with capture turned on
+
+    Each server gets its own gzipped JSON lines file under captures/<guild id>/, rotated by size.
+    Records are buffered in memory and written off the event loop, so capturing costs a dict and
+    a json.dumps per command.
+    """
+
+    def __init__(self, root: pathlib.Path):
+        self.root = root
+        self.buffer: typing.Dict[pathlib.Path, typing.List[str]] = {}
+        self.flushing: typing.Optional[asyncio.Task] = None
+        # Held while a buffer is appended, so the write on unload waits for one still running in the executor
+        self.lock = threading.Lock()
+        self.records = 0
+
+    def path(self, guild_id: int, server: dict) -> pathlib.Path:
+        return self.root / str(guild_id) / f"{server['chatchannel']}.jsonl.gz"
+
+    def record(self, guild_id: int, server: dict, command: str, response: typing.Optional[str], took: float):
+        entry = {
+            "time": time.time(),
+            "took": round(took, 4),
+            "server": server["chatchannel"],
+            "name": server["name"],
+            "cluster": server["cluster"],
+            "command": command,
+            "response": response,
+        }
+        self.buffer.setdefault(self.path(guild_id, server), []).append(json.dumps(entry))
+        self.records += 1
+        if self.flushing is None or self.flushing.done():
+            self.flushing = asyncio.create_task(self.flush(), name="ArkTools-CaptureFlush")
+
+    async def flush(self):
+        await asyncio.sleep(FLUSH_INTERVAL)
+        buffer, self.buffer = self.buffer, {}
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write, buffer)
+        except OSError as e:
+            log.warning(f"Failed to write traffic capture: {e}")
+
+    @staticmethod
+    def rotate(path: pathlib.Path):
+        base = path.name[:-len(".jsonl.gz")]
+        for i in range(KEEP, 0, -1):
+            older = path.with_name(f"{base}.{i}.jsonl.gz")
+            if not older.exists():
+                continue
+            if i == KEEP:
+                older.unlink()
+            else:
+                older.replace(path.with_name(f"{base}.{i + 1}.jsonl.gz"))
+        path.replace(path.with_name(f"{base}.1.jsonl.gz"))
+
+    def write(self, buffer: typing.Dict[pathlib.Path, typing.List[str]]):
+        with self.lock:
+            for path, lines in buffer.items():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                if path.exists() and path.stat().st_size >= MAX_BYTES:
+                    self.rotate(path)
+                # Each write appends a gzip member, readers see one continuous stream
+                with gzip.open(path, "at", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+
+    def close(self):
+        """Write out whatever is still buffered after any write in progress, called on unload"""
+        if self.flushing:
+            self.flushing.cancel()
+        buffer, self.buffer = self.buffer, {}
+        try:
+            self.write(buffer)
+        except OSError as e:
+            log.warning(f"Failed to write traffic capture: {e}")
+
+    def files(self, guild_id: int) -> typing.List[pathlib.Path]:
+        folder = self.root / str(guild_id)
+        if not folder.exists():
+            return []
+        return sorted(folder.glob("*.jsonl.gz"))
+
+    @staticmethod
+    def read(paths: typing.List[pathlib.Path]) -> typing.List[dict]:
+        """Every record in the given files, oldest first across all servers"""
+        entries = []
+        for path in paths:
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entries.append(json.loads(line))
+            except (OSError, EOFError, ValueError) as e:
+                # A capture cut off mid write still replays up to where it broke
+                log.warning(f"Stopped reading {path.name}: {e}")
+        # Stable sort keeps each server's own order for records with the same timestamp
+        entries.sort(key=lambda e: e["time"])
+        return entries
@@ -0,0 +1,123 @@
+import asyncio
+import collections
+import logging
+import time
+import typing
+
+import discord
+
+log = logging.getLogger("red.vrt.arktools.chatqueue")
+
+# Messages arriving this close together go out as one serverchat command
+WINDOW = 0.5
+# Keep each command short enough for the in-game chat box to show in full
+MAX_LINES = 4
+MAX_LENGTH = 400
+# Oldest lines are dropped past this, a backed up queue is worse than a few lost lines
+MAX_DEPTH = 50
+# How long sent lines are remembered so their getchat echo isn't relayed back
+ECHO_TTL = 300
+
+
+class ChatStats:
+    def __init__(self):
+        self.lines = 0
+        self.commands = 0
+        self.duplicates = 0
+        self.dropped = 0
+
+
+class ServerChatQueue:
+    """
+    Outbound serverchat lines for each server, coalesced into as few commands as possible
+
+    Every server has one FIFO and one worker. Lines that arrive within the window are joined
+    into multi-line serverchat commands, so a busy global chat is a handful of commands per map
+    instead of a task per message. Lines already waiting in the queue are dropped as duplicates,
+    and lines for a server that isn't ready (its circuit is open) are dropped right away.
+
+    Only the first line of a multi-line command comes back from getchat with the SERVER: prefix,
+    so every sent line is remembered for a while and message_handler skips its echo.
+    """
+
+    def __init__(
+            self,
+            send: typing.Callable[[discord.Guild, dict, str], typing.Awaitable],
+            ready: typing.Callable[[dict], bool] = None,
+            window: float = WINDOW
+    ):
+        self.send = send
+        self.ready = ready
+        self.window = window
+        self.queues: typing.Dict[int, typing.Deque[str]] = {}
+        self.workers: typing.Dict[int, asyncio.Task] = {}
+        self.stats: typing.Dict[int, ChatStats] = {}
+        self.sent: typing.Dict[int, typing.Dict[str, float]] = {}
+
+    def put(self, guild: discord.Guild, server: dict, line: str):
+        key = server["chatchannel"]
+        queue = self.queues.setdefault(key, collections.deque())
+        stats = self.stats.setdefault(key, ChatStats())
+        stats.lines += 1
+        # Don't queue up chat for a server that is down, it would only be sent stale or dropped
+        if self.ready and not self.ready(server):
+            stats.dropped += 1
+            return
+        if line in queue:
+            stats.duplicates += 1
+            return
+        if len(queue) >= MAX_DEPTH:
+            queue.popleft()
+            stats.dropped += 1
+        queue.append(line)
+        if key not in self.workers:
+            name = f"ArkTools-{guild.name}-{server['name']}-{server['cluster']}-ServerChat"
+            self.workers[key] = asyncio.create_task(self.drain(guild, server), name=name)
+
+    @staticmethod
+    def batch(queue: typing.Deque[str]) -> typing.List[str]:
+        """Take lines off the front of the queue while they fit in one command"""
+        lines = [queue.popleft()]
+        length = len(lines[0])
+        while queue and len(lines) < MAX_LINES and length + len(queue[0]) + 1 <= MAX_LENGTH:
+            line = queue.popleft()
+            length += len(line) + 1
+            lines.append(line)
+        return lines
+
+    async def drain(self, guild: discord.Guild, server: dict):
+        key = server["chatchannel"]
+        queue = self.queues[key]
+        try:
+            await asyncio.sleep(self.window)
+            while queue:
+                lines = self.batch(queue)
+                self.remember(key, lines)
+                await self.send(guild, server, "serverchat " + "\n".join(lines))
+                self.stats[key].commands += 1
+        except Exception as e:
+            log.warning(f"ServerChat queue for {server['name']} {server['cluster']} failed: {e}")
+        finally:
+            self.workers.pop(key, None)
+
+    def remember(self, key: int, lines: typing.List[str]):
+        now = time.monotonic()
+        sent = self.sent.setdefault(key, {})
+        for line, expires in list(sent.items()):
+            if expires < now:
+                del sent[line]
+        for line in lines:
+            sent[line.strip()] = now + ECHO_TTL
+
+    def is_echo(self, key: int, line: str) -> bool:
+        expires = self.sent.get(key, {}).get(line.strip())
+        return expires is not None and expires >= time.monotonic()
+
+    def depth(self, key: int) -> int:
+        return len(self.queues.get(key, ()))
+
+    def close(self):
+        for task in self.workers.values():
+            task.cancel()
+        self.workers.clear()
+        self.queues.clear()
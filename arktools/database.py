@@ -0,0 +1,437 @@
+import asyncio
+import copy
+import functools
+import json
+import logging
+import os
+import sqlite3
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("red.vrt.arktools.database")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    guild_id INTEGER NOT NULL,
+    xuid TEXT NOT NULL,
+    username TEXT,
+    username_cf TEXT,
+    discord,
+    rank,
+    lastseen_time TEXT,
+    lastseen_map TEXT,
+    extra TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (guild_id, xuid)
+);
+CREATE INDEX IF NOT EXISTS players_username ON players (guild_id, username_cf);
+CREATE INDEX IF NOT EXISTS players_discord ON players (guild_id, discord);
+
+CREATE TABLE IF NOT EXISTS ingame (
+    guild_id INTEGER NOT NULL,
+    xuid TEXT NOT NULL,
+    server_id TEXT NOT NULL,
+    name TEXT,
+    name_cf TEXT,
+    implant,
+    previous_names TEXT NOT NULL DEFAULT '[]',
+    pvpkills INTEGER NOT NULL DEFAULT 0,
+    pvpdeaths INTEGER NOT NULL DEFAULT 0,
+    pvedeaths INTEGER NOT NULL DEFAULT 0,
+    tamed INTEGER NOT NULL DEFAULT 0,
+    extra TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (guild_id, xuid, server_id)
+);
+CREATE INDEX IF NOT EXISTS ingame_name ON ingame (guild_id, name_cf, server_id);
+
+CREATE TABLE IF NOT EXISTS playtime (
+    guild_id INTEGER NOT NULL,
+    xuid TEXT NOT NULL,
+    map TEXT NOT NULL,
+    seconds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, xuid, map)
+);
+
+CREATE TABLE IF NOT EXISTS tribes (
+    guild_id INTEGER NOT NULL,
+    tribe_id TEXT NOT NULL,
+    tribename TEXT,
+    owner,
+    channel,
+    allowed TEXT NOT NULL DEFAULT '[]',
+    kills INTEGER NOT NULL DEFAULT 0,
+    servername TEXT,
+    extra TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (guild_id, tribe_id)
+);
+
+CREATE TABLE IF NOT EXISTS tribe_members (
+    guild_id INTEGER NOT NULL,
+    tribe_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (guild_id, tribe_id, position)
+);
+"""
+
+PLAYER_KEYS = ("username", "discord", "rank", "lastseen", "playtime", "ingame")
+STAT_KEYS = ("pvpkills", "pvpdeaths", "pvedeaths", "tamed")
+INGAME_KEYS = ("name", "implant", "previous_names", "stats")
+TRIBE_KEYS = ("tribename", "owner", "channel", "allowed", "kills", "servername", "members")
+
+# SQLite's default limit on host parameters is 999
+CHUNK = 500
+
+
+def fold(name: typing.Optional[str]) -> typing.Optional[str]:
+    return name.casefold() if isinstance(name, str) and name else None
+
+
+def chunks(items: list, size: int = CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class PlayerDB:
+    """
+    Optional SQLite storage for player and tribe data
+
+    The data is kept in the same shape as the config so the rest of the cog doesn't care
+    where it came from. All queries run on a single worker thread so the event loop never blocks on disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.conn: typing.Optional[sqlite3.Connection] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ArkToolsDB")
+
+    async def run(self, func: typing.Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    def connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+        return self.conn
+
+    def close(self):
+        def _close():
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        self.executor.submit(_close)
+        self.executor.shutdown(wait=False)
+
+    # -------------------- Players --------------------
+    def _write_players(self, conn: sqlite3.Connection, guild_id: int, players: dict):
+        for xuid, data in players.items():
+            lastseen = data.get("lastseen") or {}
+            extra = {k: v for k, v in data.items() if k not in PLAYER_KEYS}
+            conn.execute(
+                "INSERT INTO players (guild_id, xuid, username, username_cf, discord, rank, "
+                "lastseen_time, lastseen_map, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, xuid) DO UPDATE SET username=excluded.username, "
+                "username_cf=excluded.username_cf, discord=excluded.discord, rank=excluded.rank, "
+                "lastseen_time=excluded.lastseen_time, lastseen_map=excluded.lastseen_map, extra=excluded.extra",
+                (
+                    guild_id, xuid, data.get("username"), fold(data.get("username")), data.get("discord"),
+                    data.get("rank"), lastseen.get("time"), lastseen.get("map"), json.dumps(extra)
+                )
+            )
+            conn.execute("DELETE FROM ingame WHERE guild_id = ? AND xuid = ?", (guild_id, xuid))
+            conn.execute("DELETE FROM playtime WHERE guild_id = ? AND xuid = ?", (guild_id, xuid))
+            conn.executemany(
+                "INSERT INTO ingame VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        guild_id, xuid, str(server_id), details.get("name"), fold(details.get("name")),
+                        details.get("implant"), json.dumps(details.get("previous_names", [])),
+                        *(details.get("stats", {}).get(k, 0) for k in STAT_KEYS),
+                        json.dumps({k: v for k, v in details.items() if k not in INGAME_KEYS})
+                    )
+                    for server_id, details in data.get("ingame", {}).items()
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO playtime VALUES (?, ?, ?, ?)",
+                [(guild_id, xuid, mapstring, seconds) for mapstring, seconds in data.get("playtime", {}).items()]
+            )
+
+    def _delete_players(self, conn: sqlite3.Connection, guild_id: int, xuids: list):
+        for chunk in chunks(xuids):
+            marks = ", ".join("?" * len(chunk))
+            for table in ("players", "ingame", "playtime"):
+                conn.execute(f"DELETE FROM {table} WHERE guild_id = ? AND xuid IN ({marks})", (guild_id, *chunk))
+
+    def _read_players(self, guild_id: int, xuids: list = None) -> dict:
+        conn = self.connect()
+        if xuids is None:
+            batches = [None]
+        else:
+            batches = list(chunks(list(dict.fromkeys(xuids))))
+        players = {}
+        for chunk in batches:
+            where = "guild_id = ?"
+            params = (guild_id,)
+            if chunk is not None:
+                where += f" AND xuid IN ({', '.join('?' * len(chunk))})"
+                params += tuple(chunk)
+            for row in conn.execute(
+                    f"SELECT xuid, username, discord, rank, lastseen_time, lastseen_map, extra "
+                    f"FROM players WHERE {where} ORDER BY rowid", params
+            ):
+                xuid, username, discord_id, rank, ls_time, ls_map, extra = row
+                player = json.loads(extra)
+                player.update({
+                    "username": username,
+                    "playtime": {},
+                    "lastseen": {"time": ls_time, "map": ls_map},
+                    "ingame": {}
+                })
+                if discord_id is not None:
+                    player["discord"] = discord_id
+                if rank is not None:
+                    player["rank"] = rank
+                players[xuid] = player
+            for row in conn.execute(
+                    f"SELECT xuid, server_id, name, implant, previous_names, {', '.join(STAT_KEYS)}, extra "
+                    f"FROM ingame WHERE {where}", params
+            ):
+                if row[0] not in players:
+                    continue
+                details = json.loads(row[-1])
+                details.update({
+                    "implant": row[3],
+                    "name": row[2],
+                    "previous_names": json.loads(row[4]),
+                    "stats": dict(zip(STAT_KEYS, row[5:9]))
+                })
+                players[row[0]]["ingame"][row[1]] = details
+            for xuid, mapstring, seconds in conn.execute(
+                    f"SELECT xuid, map, seconds FROM playtime WHERE {where}", params
+            ):
+                if xuid in players:
+                    players[xuid]["playtime"][mapstring] = seconds
+        for player in players.values():
+            player["playtime"].setdefault("total", 0)
+        return players
+
+    def _save_players(self, guild_id: int, players: dict, removed: list = None):
+        conn = self.connect()
+        with conn:
+            self._write_players(conn, guild_id, players)
+            if removed:
+                self._delete_players(conn, guild_id, removed)
+
+    def _find(self, query: str, params: tuple) -> typing.List[str]:
+        return [row[0] for row in self.connect().execute(query, params)]
+
+    async def get_players(self, guild_id: int, xuids: list = None) -> dict:
+        return await self.run(self._read_players, guild_id, xuids)
+
+    async def save_players(self, guild_id: int, players: dict, removed: list = None):
+        await self.run(self._save_players, guild_id, players, removed)
+
+    async def find_gamertag(self, guild_id: int, gamertag: str) -> typing.Optional[str]:
+        found = await self.run(
+            self._find,
+            "SELECT xuid FROM players WHERE guild_id = ? AND username_cf = ? ORDER BY rowid LIMIT 1",
+            (guild_id, fold(gamertag))
+        )
+        return found[0] if found else None
+
+    async def find_discord(self, guild_id: int, user_id: int) -> typing.List[str]:
+        return await self.run(
+            self._find,
+            "SELECT xuid FROM players WHERE guild_id = ? AND discord = ? ORDER BY rowid",
+            (guild_id, int(user_id))
+        )
+
+    async def find_character(self, guild_id: int, name: str, server_id: str = None) -> typing.List[str]:
+        if server_id is None:
+            query = "SELECT DISTINCT xuid FROM ingame WHERE guild_id = ? AND name_cf = ?"
+            params = (guild_id, fold(name))
+        else:
+            query = "SELECT xuid FROM ingame WHERE guild_id = ? AND name_cf = ? AND server_id = ?"
+            params = (guild_id, fold(name), str(server_id))
+        return await self.run(self._find, query, params)
+
+    def _lastseen(self, guild_id: int) -> dict:
+        rows = self.connect().execute(
+            "SELECT xuid, username, lastseen_time, lastseen_map FROM players WHERE guild_id = ?", (guild_id,)
+        )
+        return {
+            xuid: {"username": username, "lastseen": {"time": ls_time, "map": ls_map}}
+            for xuid, username, ls_time, ls_map in rows
+        }
+
+    async def lastseen(self, guild_id: int) -> dict:
+        """Username and last seen data for every player, enough for expired_players"""
+        return await self.run(self._lastseen, guild_id)
+
+    # -------------------- Tribes --------------------
+    def _write_tribes(self, conn: sqlite3.Connection, guild_id: int, tribes: dict):
+        for tribe_id, data in tribes.items():
+            extra = {k: v for k, v in data.items() if k not in TRIBE_KEYS}
+            # Remember if the old config never had a member list so exports round trip exactly
+            if "members" not in data:
+                extra["_nomembers"] = True
+            conn.execute(
+                "INSERT INTO tribes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (guild_id, tribe_id) DO UPDATE SET tribename=excluded.tribename, "
+                "owner=excluded.owner, channel=excluded.channel, allowed=excluded.allowed, "
+                "kills=excluded.kills, servername=excluded.servername, extra=excluded.extra",
+                (
+                    guild_id, tribe_id, data.get("tribename"), data.get("owner"), data.get("channel"),
+                    json.dumps(data.get("allowed", [])), data.get("kills", 0), data.get("servername"),
+                    json.dumps(extra)
+                )
+            )
+            conn.execute("DELETE FROM tribe_members WHERE guild_id = ? AND tribe_id = ?", (guild_id, tribe_id))
+            conn.executemany(
+                "INSERT INTO tribe_members VALUES (?, ?, ?, ?)",
+                [(guild_id, tribe_id, i, name) for i, name in enumerate(data.get("members", []))]
+            )
+
+    def _delete_tribes(self, conn: sqlite3.Connection, guild_id: int, tribe_ids: list):
+        for chunk in chunks(tribe_ids):
+            marks = ", ".join("?" * len(chunk))
+            for table in ("tribes", "tribe_members"):
+                conn.execute(f"DELETE FROM {table} WHERE guild_id = ? AND tribe_id IN ({marks})", (guild_id, *chunk))
+
+    def _read_tribes(self, guild_id: int, tribe_ids: list = None) -> dict:
+        conn = self.connect()
+        if tribe_ids is None:
+            batches = [None]
+        else:
+            batches = list(chunks(list(dict.fromkeys(tribe_ids))))
+        tribes = {}
+        for chunk in batches:
+            where = "guild_id = ?"
+            params = (guild_id,)
+            if chunk is not None:
+                where += f" AND tribe_id IN ({', '.join('?' * len(chunk))})"
+                params += tuple(chunk)
+            for row in conn.execute(
+                    f"SELECT tribe_id, tribename, owner, channel, allowed, kills, servername, extra "
+                    f"FROM tribes WHERE {where} ORDER BY rowid", params
+            ):
+                tribe = json.loads(row[7])
+                nomembers = tribe.pop("_nomembers", False)
+                tribe.update({
+                    "tribename": row[1],
+                    "owner": row[2],
+                    "channel": row[3],
+                    "allowed": json.loads(row[4]),
+                    "kills": row[5],
+                })
+                if row[6] is not None:
+                    tribe["servername"] = row[6]
+                if not nomembers:
+                    tribe["members"] = []
+                tribes[row[0]] = tribe
+            for tribe_id, name in conn.execute(
+                    f"SELECT tribe_id, name FROM tribe_members WHERE {where} ORDER BY position", params
+            ):
+                if tribe_id in tribes:
+                    tribes[tribe_id].setdefault("members", []).append(name)
+        return tribes
+
+    def _save_tribes(self, guild_id: int, tribes: dict, removed: list = None):
+        conn = self.connect()
+        with conn:
+            self._write_tribes(conn, guild_id, tribes)
+            if removed:
+                self._delete_tribes(conn, guild_id, removed)
+
+    async def get_tribes(self, guild_id: int, tribe_ids: list = None) -> dict:
+        return await self.run(self._read_tribes, guild_id, tribe_ids)
+
+    async def save_tribes(self, guild_id: int, tribes: dict, removed: list = None):
+        await self.run(self._save_tribes, guild_id, tribes, removed)
+
+    # -------------------- Whole guild --------------------
+    def _replace(self, guild_id: int, players: dict = None, tribes: dict = None):
+        conn = self.connect()
+        with conn:
+            if players is not None:
+                for table in ("players", "ingame", "playtime"):
+                    conn.execute(f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,))
+                self._write_players(conn, guild_id, players)
+            if tribes is not None:
+                for table in ("tribes", "tribe_members"):
+                    conn.execute(f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,))
+                self._write_tribes(conn, guild_id, tribes)
+
+    async def replace(self, guild_id: int, players: dict = None, tribes: dict = None):
+        """Overwrite a guild's players and/or tribes in a single transaction"""
+        await self.run(self._replace, guild_id, players, tribes)
+
+    async def migrate(self, guild_id: int, players: dict, tribes: dict) -> typing.Tuple[int, int]:
+        """One-shot import of a guild's config data, returns the player and tribe counts stored"""
+        await self.replace(guild_id, players, tribes)
+        return await self.run(self._counts, guild_id)
+
+    async def export(self, guild_id: int) -> typing.Tuple[dict, dict]:
+        """A guild's players and tribes in the same format the config uses"""
+        return await self.get_players(guild_id), await self.get_tribes(guild_id)
+
+    async def clear(self, guild_id: int):
+        await self.replace(guild_id, {}, {})
+
+    def _counts(self, guild_id: int) -> typing.Tuple[int, int]:
+        conn = self.connect()
+        players = conn.execute("SELECT COUNT(*) FROM players WHERE guild_id = ?", (guild_id,)).fetchone()[0]
+        tribes = conn.execute("SELECT COUNT(*) FROM tribes WHERE guild_id = ?", (guild_id,)).fetchone()[0]
+        return players, tribes
+
+    async def counts(self, guild_id: int) -> typing.Tuple[int, int]:
+        return await self.run(self._counts, guild_id)
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+
+class StoredValue:
+    """
+    Stand-in for a Red config value that reads and writes the database instead
+
+    Supports `await` and `async with` just like `self.config.guild(guild).players()`.
+    When keys are given only those records are loaded, and on exit only records that
+    changed are written back.
+    """
+
+    def __init__(self, db: PlayerDB, guild_id: int, kind: str, keys: list = None):
+        self.db = db
+        self.guild_id = guild_id
+        self.kind = kind
+        self.keys = keys
+        self.value = None
+        self.original = None
+
+    async def read(self) -> dict:
+        if self.kind == "players":
+            return await self.db.get_players(self.guild_id, self.keys)
+        return await self.db.get_tribes(self.guild_id, self.keys)
+
+    def __await__(self):
+        return self.read().__await__()
+
+    async def __aenter__(self) -> dict:
+        self.value = await self.read()
+        self.original = copy.deepcopy(self.value)
+        return self.value
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Mirror Red's behavior of saving even if the block raised
+        changed = {k: v for k, v in self.value.items() if self.original.get(k) != v}
+        removed = [k for k in self.original if k not in self.value]
+        if not changed and not removed:
+            return
+        if self.kind == "players":
+            await self.db.save_players(self.guild_id, changed, removed)
+        else:
+            await self.db.save_tribes(self.guild_id, changed, removed)
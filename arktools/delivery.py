@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+import typing
+
+from .rcon import RconError
+
+log = logging.getLogger("red.vrt.arktools.delivery")
+
+# Commands in flight per connection, the server still runs them in order
+PIPELINE = 8
+# Servers delivered to at once
+CONCURRENCY = 8
+
+
+class Delivery:
+    """How much of a batch made it to one server"""
+
+    def __init__(self, name: str, total: int):
+        self.name = name
+        self.total = total
+        self.delivered = 0
+        self.failed = 0
+        self.skipped = 0
+        self.error: typing.Optional[str] = None
+        self.took = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return self.delivered == self.total
+
+
+async def deliver_server(
+        pool,
+        health,
+        server: dict,
+        name: str,
+        commands: typing.List[str],
+        timeout: float = 10.0,
+        pipeline: int = PIPELINE
+) -> Delivery:
+    """
+    Pipeline a batch of commands down one server's connection
+
+    Up to `pipeline` commands are written before the first response comes back instead of
+    waiting out a round trip each. Once the server's circuit opens the rest aren't sent.
+    """
+    result = Delivery(name, len(commands))
+    if not health.available(server):
+        result.skipped = len(commands)
+        result.error = "offline"
+        return result
+    sem = asyncio.Semaphore(pipeline)
+    start = time.monotonic()
+
+    async def send(command: str):
+        async with sem:
+            if not health.available(server):
+                result.skipped += 1
+                return
+            try:
+                await pool.run(server, command, timeout)
+            except asyncio.TimeoutError:
+                result.failed += 1
+                result.error = "timed out"
+                return
+            except (OSError, RconError) as e:
+                result.failed += 1
+                result.error = str(e) or e.__class__.__name__
+                return
+            result.delivered += 1
+
+    await asyncio.gather(*(send(command) for command in commands))
+    result.took = time.monotonic() - start
+    if result.error:
+        log.info(f"Delivery to {name}: {result.delivered}/{result.total} ({result.error})")
+    return result
+
+
+async def deliver(
+        pool,
+        health,
+        servers: typing.List[typing.Tuple[str, dict]],
+        commands: typing.List[str],
+        timeout: float = 10.0,
+        pipeline: int = PIPELINE,
+        concurrency: int = CONCURRENCY
+) -> typing.List[Delivery]:
+    """Deliver the same batch to each (name, server) pair, servers in parallel"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(name: str, server: dict) -> Delivery:
+        async with sem:
+            return await deliver_server(pool, health, server, name, commands, timeout, pipeline)
+
+    return await asyncio.gather(*(one(name, server) for name, server in servers))
@@ -0,0 +1,166 @@
+import array
+import datetime
+import math
+import time
+import types
+import typing
+
+import numpy as np
+
+from .timeseries import TYPECODE
+
+# Points drawn per line, the old stagger logic aimed for about this many too
+DISPLAY_POINTS = 1000
+MODES = ("minmax", "mean")
+
+
+def align(window) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack the total and every cluster into one matrix on the total's timestamps
+
+    All series are sampled on the same tick, so cluster timestamps are a subset of the total's.
+    Samples a cluster doesn't have (it was added later) are NaN.
+    """
+    # Ring buffer slices are stdlib arrays, numpy reads them through the buffer protocol without a copy
+    times = np.asarray(window.total[0]).astype(np.int64)
+    matrix = np.full((len(window.clusters) + 1, len(times)), np.nan)
+    matrix[0] = window.total[1]
+    for row, (ctimes, cvalues) in enumerate(window.clusters.values(), start=1):
+        ctimes = np.asarray(ctimes).astype(np.int64)
+        tail = len(times) - len(ctimes)
+        if tail >= 0 and np.array_equal(times[tail:], ctimes):
+            # Usual case, the cluster has existed for (at least the end of) the whole window
+            matrix[row, tail:] = cvalues
+            continue
+        idx = np.searchsorted(times, ctimes)
+        found = idx < len(times)
+        found[found] = times[idx[found]] == ctimes[found]
+        matrix[row, idx[found]] = np.asarray(cvalues)[found]
+    return times, matrix
+
+
+def bucket_starts(times: np.ndarray, buckets: int) -> np.ndarray:
+    """Index of the first sample in each non-empty time bucket"""
+    edges = np.linspace(times[0], times[-1] + 1, buckets + 1)[:-1]
+    return np.unique(np.searchsorted(times, edges))
+
+
+def downsample(
+        times: np.ndarray,
+        matrix: np.ndarray,
+        points: int = DISPLAY_POINTS,
+        mode: str = "minmax"
+) -> typing.List[typing.Tuple[np.ndarray, np.ndarray]]:
+    """
+    Reduce every row of the matrix to about `points` display points in one pass
+
+    minmax: the lowest and highest sample of each bucket in the order they happened, so peaks survive
+    mean: one averaged point per bucket
+    Returns (timestamps, values) for each row, buckets a row has no data for come out as NaN.
+    """
+    rows = matrix.shape[0]
+    if len(times) <= points:
+        return [(times, matrix[i]) for i in range(rows)]
+    if mode == "mean":
+        starts = bucket_starts(times, points)
+        present = ~np.isnan(matrix)
+        sums = np.add.reduceat(np.where(present, matrix, 0), starts, axis=1)
+        counts = np.add.reduceat(present, starts, axis=1)
+        sizes = np.diff(np.append(starts, len(times)))
+        bucket_times = (np.add.reduceat(times, starts) // sizes).astype(np.int64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        return [(bucket_times, means[i]) for i in range(rows)]
+
+    starts = bucket_starts(times, max(points // 2, 1))
+    sizes = np.diff(np.append(starts, len(times)))
+    positions = np.broadcast_to(np.arange(len(times)), matrix.shape)
+    # NaN only comes out of a bucket that is NaN for the whole row
+    with np.errstate(invalid="ignore"):
+        highs = np.fmax.reduceat(matrix, starts, axis=1)
+        lows = np.fmin.reduceat(matrix, starts, axis=1)
+    # First position of each bucket's high/low, positions that don't match are pushed past the end
+    last = len(times)
+    high_at = np.minimum.reduceat(np.where(matrix == np.repeat(highs, sizes, axis=1), positions, last), starts, axis=1)
+    low_at = np.minimum.reduceat(np.where(matrix == np.repeat(lows, sizes, axis=1), positions, last), starts, axis=1)
+    # Empty buckets point at their own start so the timestamps stay in order
+    high_at = np.where(high_at == last, starts, high_at)
+    low_at = np.where(low_at == last, starts, low_at)
+    first = np.minimum(low_at, high_at)
+    second = np.maximum(low_at, high_at)
+    low_first = low_at <= high_at
+    first_values = np.where(low_first, lows, highs)
+    second_values = np.where(low_first, highs, lows)
+    results = []
+    for i in range(rows):
+        idx = np.column_stack((first[i], second[i])).ravel()
+        values = np.column_stack((first_values[i], second_values[i])).ravel()
+        # A bucket where the high and low are the same sample only needs one point
+        keep = np.ones(len(idx), dtype=bool)
+        keep[1::2] = second[i] != first[i]
+        results.append((times[idx[keep]], values[keep]))
+    return results
+
+
+def synthetic(days: int, clusters: int = 3) -> types.SimpleNamespace:
+    """A graph window of minute samples with a daily cycle and the odd spike, for benchmarks"""
+    rng = np.random.default_rng(days)
+    samples = days * 1440
+    times = np.arange(samples, dtype=np.int64) * 60 + 1_600_000_000
+    cycle = (np.sin(np.arange(samples) / 1440 * 2 * np.pi) + 1) * 10
+    matrix = np.empty((clusters + 1, samples))
+    for row in range(1, clusters + 1):
+        matrix[row] = np.maximum(cycle + rng.normal(0, 2, samples), 0).round()
+        spikes = rng.integers(0, samples, days)
+        matrix[row, spikes] += 25
+    matrix[0] = matrix[1:].sum(axis=0)
+    stamps = array.array(TYPECODE, times.tolist())
+    return types.SimpleNamespace(
+        total=(stamps, array.array(TYPECODE, matrix[0].astype(int).tolist())),
+        clusters={
+            f"cluster{row}": (stamps, array.array(TYPECODE, matrix[row].astype(int).tolist()))
+            for row in range(1, clusters + 1)
+        }
+    )
+
+
+def legacy(window) -> typing.Tuple[list, float]:
+    """The old config based graph prep, ISO date strings and list slicing"""
+    dates = [datetime.datetime.fromtimestamp(t, datetime.timezone.utc).isoformat() for t in window.total[0]]
+    counts = list(window.total[1])
+    lists = [list(countlist) for _, countlist in window.clusters.values()]
+    t1 = time.perf_counter()
+    lim = len(dates)
+    stagger = math.ceil(lim * 0.001)
+    for countlist in lists:
+        cl = countlist[:-lim:-stagger]
+        cl.reverse()
+    x = [datetime.datetime.fromisoformat(d) for d in dates[:-lim:-stagger]]
+    y = counts[:-lim:-stagger]
+    unstaggered = counts[:-lim:-1]
+    unstaggered.reverse()
+    max(unstaggered)
+    x.reverse()
+    y.reverse()
+    return y, time.perf_counter() - t1
+
+
+def benchmark(windows: typing.Iterable[int] = (30, 60, 90), runs: int = 5) -> typing.List[list]:
+    """Time the old stagger prep against each downsampling mode, returns table rows"""
+    rows = []
+    for days in windows:
+        window = synthetic(days)
+        peak = max(window.total[1])
+        y, _ = legacy(window)
+        best = min(legacy(window)[1] for _ in range(runs))
+        rows.append([f"{days}d", "stagger (old)", len(y), f"{round(best * 1000, 1)}ms", max(y) == peak])
+        for mode in MODES:
+            timings = []
+            for _ in range(runs):
+                t1 = time.perf_counter()
+                result = downsample(*align(window), mode=mode)
+                timings.append(time.perf_counter() - t1)
+            total = result[0][1]
+            kept = int(np.nanmax(total)) == peak
+            rows.append([f"{days}d", mode, len(total), f"{round(min(timings) * 1000, 1)}ms", kept])
+    return rows
@@ -0,0 +1,213 @@
+import asyncio
+import collections
+import functools
+import logging
+import time
+import typing
+
+import discord
+from redbot.core.utils.chat_formatting import box, pagify
+
+from .rcon import RconError
+
+log = logging.getLogger("red.vrt.arktools.fanout")
+
+# Servers talked to at once
+CONCURRENCY = 16
+# Seconds between edits of the live summary
+UPDATE_INTERVAL = 2.0
+# Live summary is cut to this, the full results are posted at the end
+LIVE_LENGTH = 1900
+NO_RESPONSE = "Server received, But no response!!"
+
+
+def rcon_command(server: dict, command: str) -> str:
+    """Servers running extended RCON take clientchat instead of serverchat"""
+    if command.startswith("serverchat") and server.get("extrcon"):
+        return f"clientchat {command.split(' ', 1)[1]}"
+    return command
+
+
+class Result(typing.NamedTuple):
+    name: str
+    ok: bool
+    response: str
+    latency: float
+
+
+class Step(typing.NamedTuple):
+    at: float  # Seconds after the sequence started
+    command: str
+    label: str = ""  # Steps with a label are reported in the summary
+    wait: bool = False  # Later steps wait for this one to finish
+    timeout: float = 5.0
+
+
+def countdown_steps(seconds: int) -> typing.List[Step]:
+    """Count down in chat once a second, save, then exit once every map has saved"""
+    steps = [Step(seconds - i, f"serverchat Reboot in {i}", timeout=1.0) for i in range(seconds, 0, -1)]
+    steps.append(Step(seconds, "saveworld", "Saving maps", wait=True, timeout=30.0))
+    steps.append(Step(seconds + 2, "doexit", "Running DoExit", wait=True))
+    return steps
+
+
+class FanOutReport:
+    """
+    One live message summarizing a fan-out instead of a message per server
+
+    Identical responses are grouped, each server is listed with its latency.
+    """
+
+    def __init__(self, channel: discord.TextChannel, title: str):
+        self.channel = channel
+        self.title = title
+        self.stage = ""
+        self.sections: typing.Dict[str, typing.Tuple[int, typing.List[Result]]] = {}
+        self.message: typing.Optional[discord.Message] = None
+        self.edited = 0.0
+
+    def section(self, label: str, total: int):
+        self.sections[label] = (total, [])
+
+    def add(self, label: str, result: Result):
+        self.sections[label][1].append(result)
+
+    async def progress(self, label: str, result: Result):
+        self.add(label, result)
+        await self.update()
+
+    def render(self) -> str:
+        lines = [self.title]
+        if self.stage:
+            lines.append(self.stage)
+        for label, (total, results) in self.sections.items():
+            lines.append("")
+            lines.append(f"{label}: {len(results)}/{total}" if label else f"{len(results)}/{total} done")
+            groups = collections.OrderedDict()
+            for result in results:
+                groups.setdefault((result.ok, result.response), []).append(result)
+            for (ok, response), group in sorted(groups.items(), key=lambda i: (not i[0][0], -len(i[1]))):
+                mark = "+" if ok else "-"
+                text = "Success" if response == NO_RESPONSE else response
+                lines.append(f"{mark} [{len(group)}] {text}")
+                servers = ", ".join(f"{r.name} {int(r.latency * 1000)}ms" for r in group)
+                lines.append(f"    {servers}")
+        return "\n".join(lines)
+
+    async def update(self, force: bool = False):
+        if not force and time.monotonic() - self.edited < UPDATE_INTERVAL:
+            return
+        self.edited = time.monotonic()
+        text = self.render()
+        if len(text) > LIVE_LENGTH:
+            text = text[:LIVE_LENGTH] + "\n..."
+        try:
+            if self.message:
+                await self.message.edit(content=box(text, lang="diff"))
+            else:
+                self.message = await self.channel.send(box(text, lang="diff"))
+        except discord.HTTPException as e:
+            log.warning(f"FanOut summary update failed: {e}")
+
+    async def finish(self):
+        """Final summary, long results continue in more messages"""
+        pages = list(pagify(self.render(), page_length=LIVE_LENGTH))
+        self.edited = 0.0
+        if len(pages) == 1:
+            return await self.update(force=True)
+        first, *rest = pages
+        if self.message:
+            await self.message.edit(content=box(first, lang="diff"))
+        else:
+            await self.channel.send(box(first, lang="diff"))
+        for page in rest:
+            await self.channel.send(box(page, lang="diff"))
+
+
+class FanOut:
+    """
+    Runs a command across a set of servers over the persistent connections
+
+    At most `concurrency` servers are in flight at once. Servers with an open circuit are
+    skipped unless the command is allowed through (admin commands are).
+    """
+
+    def __init__(self, pool, health, concurrency: int = CONCURRENCY):
+        self.pool = pool
+        self.health = health
+        self.concurrency = concurrency
+
+    async def one(self, sem: asyncio.Semaphore, server: dict, command: str, timeout: float) -> Result:
+        name = f"{server['name']} {server['cluster']}"
+        if "gamertag" in server:
+            name = f"{name} ({server['gamertag']})"
+        if not self.health.allow(server, command):
+            return Result(name, False, "Skipped, server is down", 0.0)
+        async with sem:
+            start = time.monotonic()
+            try:
+                res = await self.pool.run(server, rcon_command(server, command), timeout)
+            except asyncio.TimeoutError:
+                return Result(name, False, "Timed out and may be down", time.monotonic() - start)
+            except (OSError, RconError) as e:
+                return Result(name, False, f"Error: {e}", time.monotonic() - start)
+        return Result(name, True, res.strip() or NO_RESPONSE, time.monotonic() - start)
+
+    async def run(
+            self,
+            servers: typing.List[dict],
+            command: str,
+            timeout: float = 5.0,
+            progress: typing.Callable[[Result], typing.Awaitable] = None
+    ) -> typing.List[Result]:
+        sem = asyncio.Semaphore(self.concurrency)
+        results = []
+        for done in asyncio.as_completed([self.one(sem, server, command, timeout) for server in servers]):
+            result = await done
+            results.append(result)
+            if progress:
+                await progress(result)
+        return results
+
+    async def sequence(
+            self,
+            servers: typing.List[dict],
+            steps: typing.List[Step],
+            report: FanOutReport = None,
+            before: typing.Callable[[Step], typing.Awaitable] = None
+    ) -> typing.Dict[str, typing.List[Result]]:
+        """
+        Run steps at their offsets on the loop's monotonic clock
+
+        Each step is scheduled against the start time rather than the previous step, so a slow
+        server can't stretch a countdown. Steps marked `wait` hold everything after them until
+        every step so far has finished.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        running = []
+        results = {}
+        for step in steps:
+            delay = start + step.at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if before:
+                await before(step)
+            progress = None
+            if report and step.label:
+                report.section(step.label, len(servers))
+                progress = functools.partial(report.progress, step.label)
+            elif report:
+                report.stage = step.command.split(" ", 1)[-1]
+                await report.update()
+            task = asyncio.ensure_future(self.run(servers, step.command, step.timeout, progress))
+            running.append((step, task))
+            if step.wait:
+                await asyncio.gather(*(t for _, t in running))
+                # Later steps run from when this one finished if it overran its slot
+                start = max(start, loop.time() - step.at)
+        for step, task in running:
+            result = await task
+            if step.label:
+                results[step.label] = result
+        return results
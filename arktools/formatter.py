@@ -1,5 +1,4 @@
 import datetime
-import io
 import logging
 import math
 import re
@@ -8,9 +7,6 @@ import unicodedata
 import discord
 import pytz
 import tabulate
-from matplotlib import pyplot as plt
-from matplotlib.dates import DateFormatter
-from matplotlib.ticker import MaxNLocator, AutoMinorLocator
 from redbot.core.utils.chat_formatting import box, pagify
 
 log = logging.getLogger("red.vrt.arktools")
@@ -529,33 +525,6 @@ def player_stats(settings: dict, guild: discord.guild, gamertag: str):
             return embed
 
 
-# Detect recent followers and return list of people to add back
-async def detect_friends(friends: list, followers: list) -> list:
-    people_to_add = []
-    xuids = []
-    # Friends list is who the Gamertag is following
-    # Followers are the people following the gamertag
-    for friend in friends:
-        # Make list of all xuid's the GT is following
-        xuids.append(friend["xuid"])
-
-    for follower in followers:
-        # Person not found in GT's friends list
-        if follower["xuid"] not in xuids:
-            followed_back = follower["isFollowedByCaller"]
-            # Person is following GT but GT isnt following them back, lets see if this was recent
-            if not followed_back:
-                date_followed = follower["follower"]["followedDateTime"]
-                date_followed = fix_timestamp(date_followed)
-                time = datetime.datetime.utcnow()
-                timedifference = time - date_followed
-                # If the person followed the GT less than an hour ago then its recent
-                if int(timedifference.total_seconds()) < 3600:
-                    # Add to the list of people to be added back
-                    people_to_add.append((follower["xuid"], follower["gamertag"]))
-    return people_to_add
-
-
 # Detect if a user account is suspicious based on cogs settings
 def detect_sus(alt: dict, profile: dict, friends: dict):
     reasons = ""
@@ -726,128 +695,3 @@ async def cleanup_config(settings: dict):
     else:
         cleanup_status = cleanup_status.rstrip("\n")
     return settings, cleanup_status
-
-
-# Plot player count for each cluster
-# Instead of relying on matplotlibs date formatter, the data points are selected manually with set ticks
-async def get_graph(settings: dict, hours: int):
-    lim = hours * 60
-    days = int(hours / 24)
-    times = settings["serverstats"]["dates"]
-    counts = settings["serverstats"]["counts"]
-    timezone = settings['timezone']
-    tz = pytz.timezone(timezone)
-    if len(counts) == 0 or len(times) == 0:
-        return None
-    title = f"Player Count Over the Past {int(hours)} Hours"
-    if days > 3:
-        title = f"Player Count Over the Past {days} Days"
-    if len(times) < lim:  # Time input is greater or equal to available time recorded
-        hours = int(len(times) / 60)
-        days = int(hours / 24)
-        if days > 3:
-            title = f"Player Count Over Lifetime ({days} Days)"
-        else:
-            title = f"Player Count Over Lifetime ({hours} Hours)"
-        lim = len(times)
-    if hours == 1:
-        title = f"Player Count Over the Last Hour"
-    stagger = math.ceil(lim * 0.001)
-    c = {}
-    for cname, countlist in settings["serverstats"].items():
-        cname = str(cname.lower())
-        if cname != "dates" and cname != "counts" and cname != "expiration":
-            cl = countlist[:-lim:-stagger]
-            cl.reverse()
-            c[cname] = cl
-    dates = times[:-lim:-stagger]
-    x = []
-    y = counts[:-lim:-stagger]
-    # Unstaggered list is for the max player count for the given time
-    y_unstaggered = counts[:-lim:-1]
-    y_unstaggered.reverse()
-    maxplayers = max(y_unstaggered)
-    for d in dates:
-        d = datetime.datetime.fromisoformat(d)
-        x.append(d)
-
-    # Reverse the new lists, so they're in the correct order
-    x.reverse()
-    y.reverse()
-    if len(y) < 3:
-        return None
-    clist = ["red",
-             "cyan",
-             "gold",
-             "white",
-             "magenta",
-             "wheat",
-             "yellow",
-             "salmon",
-             "darkblue",
-             "aqua",
-             "plum",
-             "purple"]
-    cindex = 0
-    with plt.style.context("dark_background"):
-        fig, ax = plt.subplots()
-        clusters = len(c.keys())
-        if len(clist) >= clusters:
-            usecolors = True
-        else:
-            usecolors = False
-        # Plot each cluster in addition to the total graph line
-        for cname, countlist in c.items():
-            if len(countlist) < len(y):
-                countlist.reverse()
-                n = 0
-                while n == 0:
-                    countlist.append(0)
-                    if len(countlist) == len(y):
-                        countlist.reverse()
-                        n += 1
-                        break
-            if len(clist) >= cindex - 1 and usecolors:
-                color = f"xkcd:{clist[cindex]}"
-                plt.plot(x, countlist, label=cname, color=color, linewidth=0.7)
-            else:
-                plt.plot(x, countlist, label=cname, linewidth=0.7)
-            cindex += 1
-        plt.plot(x, y, color="xkcd:green", label="Total", linewidth=0.7)
-        plt.ylim([0, max(y) + 2])
-        plt.xlabel(f"Time ({timezone})", fontsize=10)
-        plt.ylabel(f"Player Count (Max: {maxplayers})", fontsize=10)
-        plt.title(title)
-        plt.tight_layout()
-        plt.legend(loc=3)
-        plt.yticks(fontsize=10)
-        plt.subplots_adjust(bottom=0.2)
-        plt.grid(axis="y")
-        plt.grid(axis="x")
-
-        # Major x-axis ticks/size
-        major_locator = MaxNLocator(nbins='auto', integer=True, min_n_ticks=10)
-        major_fmt = DateFormatter('%I:%M %p', tz=tz)
-        size = 9
-        if days > 1:
-            size = 8
-            major_fmt = DateFormatter('%I:%M %p\n%m/%d', tz=tz)
-        if days >= 10:
-            major_fmt = DateFormatter('%b %d', tz=tz)
-        ax.xaxis.set_major_formatter(major_fmt)
-        ax.xaxis.set_major_locator(major_locator)
-
-        # Minor x-axis ticks
-        minor_locator = AutoMinorLocator()
-        ax.xaxis.set_minor_locator(minor_locator)
-
-        plt.xticks(fontsize=size)
-
-        fig.autofmt_xdate()
-        result = io.BytesIO()
-        plt.savefig(result, format="png", dpi=200)
-        plt.close()
-        result.seek(0)
-        file = discord.File(result, filename="plot.png")
-        result.close()
-        return file
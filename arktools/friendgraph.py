@@ -0,0 +1,315 @@
+import asyncio
+import datetime
+import json
+import logging
+import pathlib
+import random
+import time
+import typing
+
+from .formatter import fix_timestamp
+
+log = logging.getLogger("red.vrt.arktools.friendgraph")
+
+# Followers get added back if they followed within this many seconds
+FOLLOW_WINDOW = 3600
+# Friends that still aren't following back this long after being added get removed
+FOLLOW_BACK_GRACE = 86400
+# A host that was offered someone and still has them waiting tries again after this long
+REOFFER = 300
+# Poll interval per host, grows while its lists stay the same and drops back once they change
+MIN_INTERVAL = 20
+MAX_INTERVAL = 300
+BACKOFF = 1.5
+
+
+def timestamp(value) -> float:
+    """Unix time of an Xbox Live date, naive dates are UTC"""
+    parsed = fix_timestamp(str(value))
+    if not isinstance(parsed, datetime.datetime):
+        return time.time()
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+class HostGraph:
+    """What a host gamertag's friends and followers looked like last time it was polled"""
+
+    def __init__(
+            self,
+            friends: typing.Dict[str, list] = None,
+            followers: typing.Dict[str, list] = None,
+            offered: typing.Dict[str, float] = None,
+            dropped: typing.Dict[str, float] = None,
+            interval: float = MIN_INTERVAL,
+            polls: int = 0,
+            changes: int = 0
+    ):
+        # xuid -> [gamertag, following back, added (unix time)]
+        self.friends = friends or {}
+        # xuid -> [gamertag, followed back, followed (unix time)]
+        self.followers = followers or {}
+        # xuid -> when they were last handed out to be added or removed
+        self.offered = offered or {}
+        self.dropped = dropped or {}
+        self.interval = interval
+        self.polls = polls
+        self.changes = changes
+        self.due = 0.0  # Loop time, not saved so every host is polled once after a reload
+
+    def to_dict(self) -> dict:
+        return {
+            "friends": self.friends, "followers": self.followers, "offered": self.offered,
+            "dropped": self.dropped, "interval": self.interval, "polls": self.polls, "changes": self.changes
+        }
+
+    def update(self, friends: typing.List[dict], followers: typing.List[dict]) -> bool:
+        """Swap in the latest lists, dates are only parsed for people that weren't there last time"""
+        new_friends = {}
+        for person in friends:
+            xuid = person["xuid"]
+            known = self.friends.get(xuid)
+            added = known[2] if known else timestamp(person["added_date_time_utc"])
+            new_friends[xuid] = [person["gamertag"], bool(person["is_following_caller"]), added]
+        new_followers = {}
+        for person in followers:
+            xuid = person["xuid"]
+            known = self.followers.get(xuid)
+            followed = known[2] if known else timestamp(person["follower"]["followedDateTime"])
+            new_followers[xuid] = [person["gamertag"], bool(person["isFollowedByCaller"]), followed]
+        changed = new_friends != self.friends or new_followers != self.followers
+        self.friends = new_friends
+        self.followers = new_followers
+        return changed
+
+    def diff(self, now: float) -> typing.Tuple[typing.List[tuple], typing.List[tuple]]:
+        """
+        Followers to add back and friends to drop, as (xuid, gamertag) pairs
+
+        Each person is only handed out once per REOFFER, so a host isn't re-queueing the same
+        requests every poll while the social queue works through them.
+        """
+        to_add = []
+        for xuid in self.followers.keys() - self.friends.keys():
+            gamertag, followed_back, followed = self.followers[xuid]
+            if followed_back or now - followed >= FOLLOW_WINDOW:
+                continue
+            if now - self.offered.get(xuid, 0) < REOFFER:
+                continue
+            self.offered[xuid] = now
+            to_add.append((xuid, gamertag))
+        to_drop = []
+        for xuid, (gamertag, following, added) in self.friends.items():
+            if following or now - added <= FOLLOW_BACK_GRACE:
+                continue
+            if now - self.dropped.get(xuid, 0) < REOFFER:
+                continue
+            self.dropped[xuid] = now
+            to_drop.append((xuid, gamertag))
+        # Forget offers for people that have since been added or left
+        self.offered = {k: v for k, v in self.offered.items() if k in self.followers and k not in self.friends}
+        self.dropped = {k: v for k, v in self.dropped.items() if k in self.friends}
+        return to_add, to_drop
+
+    def reschedule(self, changed: bool, loop_time: float):
+        self.polls += 1
+        if changed:
+            self.changes += 1
+            self.interval = MIN_INTERVAL
+        else:
+            self.interval = min(self.interval * BACKOFF, MAX_INTERVAL)
+        self.due = loop_time + self.interval
+
+
+class FriendGraph:
+    """
+    Friend and follower snapshots for every host gamertag running autofriend
+
+    Autofriend downloads both lists either way, but with the last snapshot kept around only new
+    followers and friends that stopped following back come out of a poll, dates are parsed once
+    per person, and hosts whose lists haven't changed get polled less and less often.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.hosts: typing.Dict[str, HostGraph] = {}
+        self.saving: typing.Optional[asyncio.Task] = None
+
+    @staticmethod
+    def key(guild_id: int, cname: str, sname: str) -> str:
+        return f"{guild_id}-{cname}-{sname}"
+
+    def host(self, guild_id: int, cname: str, sname: str) -> HostGraph:
+        key = self.key(guild_id, cname, sname)
+        if key not in self.hosts:
+            self.hosts[key] = HostGraph()
+        return self.hosts[key]
+
+    def due(self, guild_id: int, cname: str, sname: str) -> bool:
+        return asyncio.get_running_loop().time() >= self.host(guild_id, cname, sname).due
+
+    def poll(
+            self,
+            guild_id: int,
+            cname: str,
+            sname: str,
+            friends: typing.List[dict],
+            followers: typing.List[dict]
+    ) -> typing.Tuple[typing.List[tuple], typing.List[tuple]]:
+        """Take in a host's latest lists, returns who to add back and who to drop"""
+        host = self.host(guild_id, cname, sname)
+        changed = host.update(friends, followers)
+        to_add, to_drop = host.diff(time.time())
+        host.reschedule(changed, asyncio.get_running_loop().time())
+        if changed:
+            self.save()
+        return to_add, to_drop
+
+    def forget(self, guild_id: int, cname: str, sname: str):
+        """Drop a host's snapshot, for when its gamertag is re-authorized or removed"""
+        if self.hosts.pop(self.key(guild_id, cname, sname), None):
+            self.save()
+
+    def stats(self, guild_id: int) -> typing.List[list]:
+        rows = []
+        prefix = f"{guild_id}-"
+        loop_time = asyncio.get_running_loop().time()
+        for key, host in self.hosts.items():
+            if not key.startswith(prefix):
+                continue
+            rows.append([
+                key[len(prefix):],
+                len(host.friends),
+                len(host.followers),
+                f"{int(host.interval)}s",
+                f"{max(0, int(host.due - loop_time))}s",
+                f"{host.changes}/{host.polls}",
+            ])
+        return rows
+
+    def dump(self) -> dict:
+        return {key: host.to_dict() for key, host in self.hosts.items()}
+
+    def write(self, data: dict):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data))
+        tmp.replace(self.path)
+
+    def read(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Failed to read friend snapshots: {e}")
+            return {}
+
+    async def load(self):
+        data = await asyncio.get_running_loop().run_in_executor(None, self.read)
+        for key, entry in data.items():
+            self.hosts[key] = HostGraph(**entry)
+
+    def save(self):
+        if self.saving and not self.saving.done():
+            return
+        self.saving = asyncio.create_task(self.flush(), name="ArkTools-FriendGraphSave")
+
+    async def flush(self):
+        await asyncio.sleep(10)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write, self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save friend snapshots: {e}")
+
+    def close(self):
+        try:
+            self.write(self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save friend snapshots: {e}")
+
+
+def legacy(friends: typing.List[dict], followers: typing.List[dict]) -> typing.Tuple[list, list]:
+    """The old detect_friends and non-follower scan from autofriend_session, kept for the benchmark"""
+    people_to_add = []
+    xuids = []
+    for friend in friends:
+        xuids.append(friend["xuid"])
+    for follower in followers:
+        if follower["xuid"] not in xuids:
+            if not follower["isFollowedByCaller"]:
+                date_followed = fix_timestamp(follower["follower"]["followedDateTime"])
+                timedifference = datetime.datetime.utcnow() - date_followed
+                if int(timedifference.total_seconds()) < 3600:
+                    people_to_add.append((follower["xuid"], follower["gamertag"]))
+    to_drop = []
+    tz = datetime.timezone.utc
+    for person in friends:
+        added = fix_timestamp(str(person["added_date_time_utc"])).astimezone(tz)
+        timedifference = datetime.datetime.now(tz) - added
+        if not person["is_following_caller"] and timedifference.days > 0:
+            to_drop.append((person["xuid"], person["gamertag"]))
+    return people_to_add, to_drop
+
+
+def synthetic(size: int = 1000, seed: int = 0) -> typing.Tuple[typing.List[dict], typing.List[dict]]:
+    """A capped out host, `size` friends and followers shaped like the Xbox Live responses"""
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow().replace(microsecond=123456)
+    friends = []
+    followers = []
+    for i in range(size):
+        xuid = str(2533274900000000 + i)
+        added = now - datetime.timedelta(seconds=rng.randint(60, 90 * 86400))
+        friends.append({
+            "xuid": xuid,
+            "gamertag": f"Friend {i}",
+            "is_following_caller": rng.random() < 0.95,
+            "added_date_time_utc": added.isoformat() + "+00:00",
+        })
+    for i in range(size):
+        # Most followers are friends already, the rest followed recently or long ago
+        if i < size * 0.9:
+            xuid = str(2533274900000000 + i)
+        else:
+            xuid = str(2533275000000000 + i)
+        followed = now - datetime.timedelta(seconds=rng.randint(60, 2 * FOLLOW_WINDOW))
+        followers.append({
+            "xuid": xuid,
+            "gamertag": f"Follower {i}",
+            "isFollowedByCaller": i < size * 0.9,
+            "follower": {"followedDateTime": followed.isoformat() + "0"},
+        })
+    return friends, followers
+
+
+def benchmark(size: int = 1000, runs: int = 20) -> typing.List[list]:
+    """Time the old full scan against a poll with and without a snapshot, returns table rows"""
+    friends, followers = synthetic(size)
+    rows = []
+    best = None
+    for _ in range(runs):
+        t1 = time.perf_counter()
+        to_add, to_drop = legacy(friends, followers)
+        took = time.perf_counter() - t1
+        best = took if best is None else min(best, took)
+    rows.append(["full scan (old)", len(to_add), len(to_drop), f"{round(best * 1000, 2)}ms"])
+
+    # First poll parses everything, after that nothing changed so only the set diff runs
+    first = None
+    steady = None
+    for _ in range(runs):
+        host = HostGraph()
+        t1 = time.perf_counter()
+        host.update(friends, followers)
+        new_add, new_drop = host.diff(time.time())
+        took = time.perf_counter() - t1
+        first = took if first is None else min(first, took)
+        t1 = time.perf_counter()
+        host.update(friends, followers)
+        again_add, again_drop = host.diff(time.time())
+        took = time.perf_counter() - t1
+        steady = took if steady is None else min(steady, took)
+    rows.append(["snapshot (first poll)", len(new_add), len(new_drop), f"{round(first * 1000, 2)}ms"])
+    rows.append(["snapshot (unchanged)", len(again_add), len(again_drop), f"{round(steady * 1000, 2)}ms"])
+    return rows
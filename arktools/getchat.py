@@ -0,0 +1,101 @@
+import pathlib
+import re
+import time
+import typing
+
+CHAT = "chat"
+ADMIN = "admin"
+TRIBE = "tribe"
+NOISE = "noise"
+KINDS = (CHAT, ADMIN, TRIBE, NOISE)
+
+# (gamertag) (character name) (message)
+CHAT_LINE = re.compile(r"(.+)\s\((.+)\): (.+)")
+
+# Line counts the bundled synthetic corpus was generated with, a mismatch means the parser's behavior changed
+CORPUS_EXPECTED = {CHAT: 96, ADMIN: 16, TRIBE: 48, NOISE: 40}
+
+
+class Line(typing.NamedTuple):
+    kind: str
+    text: str
+    gamertag: typing.Optional[str] = None
+    character: typing.Optional[str] = None
+    message: typing.Optional[str] = None
+
+
+def parse(buffer: str, echo: typing.Callable[[str], bool] = None) -> typing.List[Line]:
+    """
+    Split a getchat buffer into typed lines in one pass
+
+    Lines starting with SERVER: are discord chat being sent to the server, and the following lines
+    of a coalesced serverchat come back without the prefix, `echo` picks those out so chat doesn't loop.
+    """
+    lines = []
+    append = lines.append
+    match = CHAT_LINE.match
+    for text in buffer.split("\n"):
+        if not text or text == " " or text.startswith("SERVER:") or (echo and echo(text)):
+            append(Line(NOISE, text))
+        elif text.startswith("AdminCmd:"):
+            append(Line(ADMIN, text))
+        elif ", ID" in text and "Tribe" in text:
+            append(Line(TRIBE, text))
+        elif "):" not in text:
+            # Anything else without a character name, like wrapped sentences from to_server_chat, is ignored
+            append(Line(NOISE, text))
+        else:
+            found = match(text)
+            if found:
+                append(Line(CHAT, text, *found.groups()))
+            else:
+                # Still relayed as is, there just isn't a player to attach it to
+                append(Line(CHAT, text))
+    return lines
+
+
+def legacy(buffer: str) -> typing.List[tuple]:
+    """The old message_handler filtering, kept for the benchmark"""
+    chats = []
+    for msg in buffer.split("\n"):
+        if not msg:
+            continue
+        if msg == " ":
+            continue
+        if msg.startswith("SERVER:"):
+            continue
+        if msg.startswith("AdminCmd:"):
+            continue
+        elif ", ID" in msg:
+            continue
+        elif "):" in msg:
+            chats.append(msg)
+    return [re.findall(r'(.+)\s\((.+)\): (.+)', msg) for msg in chats]
+
+
+def load_corpus(path: pathlib.Path, size: int = 20) -> typing.List[str]:
+    """The corpus as getchat sized buffers, without its header comments"""
+    lines = path.read_text(encoding="utf-8").split("\n")
+    while lines and lines[0].startswith("#"):
+        lines.pop(0)
+    return ["\n".join(lines[i:i + size]) for i in range(0, len(lines), size)]
+
+
+def benchmark(buffers: typing.List[str], runs: int = 20) -> typing.Tuple[typing.List[list], dict]:
+    """Lines per second for the old filtering and the parser, plus how the buffers were classified"""
+    lines = sum(len(b.split("\n")) for b in buffers)
+    counts = dict.fromkeys(KINDS, 0)
+    for buffer in buffers:
+        for line in parse(buffer):
+            counts[line.kind] += 1
+    rows = []
+    for name, func in (("message_handler (old)", legacy), ("getchat.parse", parse)):
+        best = None
+        for _ in range(runs):
+            t1 = time.perf_counter()
+            for buffer in buffers:
+                func(buffer)
+            took = time.perf_counter() - t1
+            best = took if best is None else min(best, took)
+        rows.append([name, lines, f"{round(best * 1000, 2)}ms", f"{int(lines / best):,}"])
+    return rows, counts
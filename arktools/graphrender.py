@@ -0,0 +1,207 @@
+import asyncio
+import collections
+import io
+import logging
+import multiprocessing
+import pickle
+import typing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import matplotlib
+import numpy as np
+import pytz
+from matplotlib import pyplot as plt
+from matplotlib.dates import DateFormatter
+from matplotlib.ticker import MaxNLocator, AutoMinorLocator
+
+from .downsample import align, downsample
+
+# Worker processes import this module on its own, so the backend is set here too
+matplotlib.use("agg")
+plt.switch_backend("agg")
+
+log = logging.getLogger("red.vrt.arktools.graphrender")
+
+CLUSTER_COLORS = [
+    "red",
+    "cyan",
+    "gold",
+    "white",
+    "magenta",
+    "wheat",
+    "yellow",
+    "salmon",
+    "darkblue",
+    "aqua",
+    "plum",
+    "purple"
+]
+
+
+def build_payload(window, timezone: str, hours: int) -> typing.Optional[dict]:
+    """Everything the renderer needs as plain lists, so it can be sent to another process"""
+    if window is None:
+        return None
+    days = int(hours / 24)
+    times, counts = window.total
+    if len(counts) == 0:
+        return None
+    title = f"Player Count Over the Past {int(hours)} Hours"
+    if days > 3:
+        title = f"Player Count Over the Past {days} Days"
+    if window.span < hours * 3600:  # Time input is greater or equal to available time recorded
+        hours = int(window.span / 3600)
+        days = int(hours / 24)
+        if days > 3:
+            title = f"Player Count Over Lifetime ({days} Days)"
+        else:
+            title = f"Player Count Over Lifetime ({hours} Hours)"
+    if hours == 1:
+        title = "Player Count Over the Last Hour"
+    # Every line is reduced to a fixed number of points in one pass, keeping the highs and lows
+    lines = downsample(*align(window), mode="minmax")
+    if len(lines[0][1]) < 3:
+        return None
+    clusters = {}
+    for cname, (ctimes, countlist) in zip(window.clusters, lines[1:]):
+        clusters[str(cname.lower())] = (ctimes.tolist(), countlist.tolist())
+    return {
+        "title": title,
+        "timezone": timezone,
+        "days": days,
+        "maxplayers": max(counts),
+        "total": (lines[0][0].tolist(), lines[0][1].tolist()),
+        "clusters": clusters,
+    }
+
+
+# Plot player count for each cluster
+# Timestamps are plotted as UTC datetime64, the date formatter converts them to the guild's timezone
+def render_graph(payload: dict) -> bytes:
+    """Runs in the worker, returns the graph as PNG bytes"""
+    tz = pytz.timezone(payload["timezone"])
+    days = payload["days"]
+    times, y = payload["total"]
+    x = np.asarray(times, dtype="datetime64[s]")
+    c = payload["clusters"]
+    cindex = 0
+    with plt.style.context("dark_background"):
+        fig, ax = plt.subplots()
+        usecolors = len(CLUSTER_COLORS) >= len(c)
+        # Plot each cluster in addition to the total graph line
+        for cname, (ctimes, countlist) in c.items():
+            # Clusters added after the graph started have NaN (a gap) before then
+            cx = np.asarray(ctimes, dtype="datetime64[s]")
+            if usecolors:
+                plt.plot(cx, countlist, label=cname, color=f"xkcd:{CLUSTER_COLORS[cindex]}", linewidth=0.7)
+            else:
+                plt.plot(cx, countlist, label=cname, linewidth=0.7)
+            cindex += 1
+        plt.plot(x, y, color="xkcd:green", label="Total", linewidth=0.7)
+        plt.ylim([0, np.nanmax(y) + 2])
+        plt.xlabel(f"Time ({payload['timezone']})", fontsize=10)
+        plt.ylabel(f"Player Count (Max: {payload['maxplayers']})", fontsize=10)
+        plt.title(payload["title"])
+        plt.tight_layout()
+        plt.legend(loc=3)
+        plt.yticks(fontsize=10)
+        plt.subplots_adjust(bottom=0.2)
+        plt.grid(axis="y")
+        plt.grid(axis="x")
+
+        # Major x-axis ticks/size
+        major_locator = MaxNLocator(nbins='auto', integer=True, min_n_ticks=10)
+        major_fmt = DateFormatter('%I:%M %p', tz=tz)
+        size = 9
+        if days > 1:
+            size = 8
+            major_fmt = DateFormatter('%I:%M %p\n%m/%d', tz=tz)
+        if days >= 10:
+            major_fmt = DateFormatter('%b %d', tz=tz)
+        ax.xaxis.set_major_formatter(major_fmt)
+        ax.xaxis.set_major_locator(major_locator)
+
+        # Minor x-axis ticks
+        minor_locator = AutoMinorLocator()
+        ax.xaxis.set_minor_locator(minor_locator)
+
+        plt.xticks(fontsize=size)
+
+        fig.autofmt_xdate()
+        result = io.BytesIO()
+        plt.savefig(result, format="png", dpi=200)
+        plt.close(fig)
+        return result.getvalue()
+
+
+class GraphRenderer:
+    """
+    Renders graphs in a worker process and caches the PNGs
+
+    Images are cached by guild, window and the newest data point, so status refreshes and
+    servergraph requests reuse the same image until a new sample is recorded.
+    The worker is a fresh interpreter that imports render_graph from this module. If it can't be used
+    (some setups can't re-import the cog in a child process) rendering falls back to a single
+    worker thread, which still keeps it off the event loop.
+    """
+
+    def __init__(self, size: int = 32):
+        self.size = size
+        self.cache: typing.OrderedDict[tuple, typing.Tuple[tuple, bytes]] = collections.OrderedDict()
+        self.pool: typing.Optional[Executor] = None
+        self.threaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def executor(self) -> Executor:
+        if self.pool is None:
+            if self.threaded:
+                self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ArkToolsRender")
+            else:
+                # Spawned rather than forked, the bot already has threads running that a fork could copy mid-lock
+                context = multiprocessing.get_context("spawn")
+                self.pool = ProcessPoolExecutor(max_workers=1, mp_context=context)
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+    async def run(self, payload: dict) -> bytes:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor(), render_graph, payload)
+        except (BrokenProcessPool, pickle.PicklingError, ImportError) as e:
+            if self.threaded:
+                raise
+            log.warning("Graph worker process failed, rendering in a thread from now on", exc_info=e)
+            self.close()
+            self.threaded = True
+            return await loop.run_in_executor(self.executor(), render_graph, payload)
+
+    async def render(self, guild_id: int, window, timezone: str, hours: int) -> typing.Optional[bytes]:
+        if window is None:
+            return None
+        key = (guild_id, hours, timezone)
+        stamp = (window.latest, window.tier)
+        cached = self.cache.get(key)
+        if cached and cached[0] == stamp:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return cached[1]
+        self.misses += 1
+        payload = build_payload(window, timezone, hours)
+        if payload is None:
+            return None
+        png = await self.run(payload)
+        self.cache[key] = (stamp, png)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return png
+
+    def forget(self, guild_id: int):
+        for key in [k for k in self.cache if k[0] == guild_id]:
+            del self.cache[key]
@@ -0,0 +1,276 @@
+import asyncio
+import collections
+import json
+import logging
+import pathlib
+import time
+import typing
+
+log = logging.getLogger("red.vrt.arktools.health")
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+OPEN = "open"
+
+# Rolling window of recent calls per server
+WINDOW = 20
+# Degraded once this share of the window failed, or calls are this slow on average
+DEGRADED_ERRORS = 0.2
+DEGRADED_LATENCY = 2.0
+# Consecutive failures that open the circuit
+OPEN_AFTER = 3
+# Half-open probe backoff while the circuit is open
+PROBE_BASE = 30
+PROBE_MAX = 600
+# Closed outages kept per server
+HISTORY = 25
+
+# These still go out while the circuit is open, an admin asked for them
+ADMIN_COMMANDS = ("banplayer", "unbanplayer", "doexit", "saveworld")
+# The poller's liveness check doubles as the half-open probe
+PROBE_COMMAND = "listplayers"
+
+
+class Outage:
+    def __init__(self, started: float, reason: str, ended: float = None, probes: int = 0, unknown: bool = False):
+        self.started = started
+        self.ended = ended
+        self.reason = reason
+        self.probes = probes
+        # Still open when the cog unloaded, so when it actually ended is unknown
+        self.unknown = unknown
+
+    @property
+    def duration(self) -> float:
+        if self.unknown:
+            return 0.0
+        return (self.ended or time.time()) - self.started
+
+    def to_dict(self) -> dict:
+        return {
+            "started": self.started, "ended": self.ended, "reason": self.reason,
+            "probes": self.probes, "unknown": self.unknown
+        }
+
+
+class ServerHealth:
+    """Rolling call stats and circuit state for a single server"""
+
+    def __init__(self):
+        self.state = HEALTHY
+        self.calls: typing.Deque[typing.Tuple[bool, float]] = collections.deque(maxlen=WINDOW)
+        self.consecutive = 0
+        # Wall clock time of the first failure in the current streak
+        self.failing_since: typing.Optional[float] = None
+        self.outage: typing.Optional[Outage] = None
+        self.history: typing.Deque[Outage] = collections.deque(maxlen=HISTORY)
+        self.backoff = PROBE_BASE
+        self.retry_at = 0.0  # Monotonic
+        # Task that was let through as the half-open probe, only its own call decides the probe's outcome
+        self.probe: typing.Optional[asyncio.Task] = None
+        self.alerted = False
+
+    @property
+    def error_rate(self) -> float:
+        if not self.calls:
+            return 0.0
+        return sum(1 for ok, _ in self.calls if not ok) / len(self.calls)
+
+    @property
+    def latency(self) -> float:
+        times = [latency for ok, latency in self.calls if ok]
+        return sum(times) / len(times) if times else 0.0
+
+    def retry_in(self) -> float:
+        return max(0.0, self.retry_at - time.monotonic())
+
+    @property
+    def probing(self) -> bool:
+        # A probe task that ended without reporting back doesn't hold up the next one
+        return self.probe is not None and not self.probe.done()
+
+    def is_probe(self) -> bool:
+        """Whether the call being reported is the probe, it runs in the task that was let through"""
+        return self.probe is not None and self.probe is asyncio.current_task()
+
+    def release(self):
+        """The probe never finished (it was cancelled), let the next one through"""
+        if self.is_probe():
+            self.probe = None
+
+    def allow(self, command: str) -> bool:
+        if self.state != OPEN:
+            return True
+        if command.lower().startswith(ADMIN_COMMANDS):
+            return True
+        if command == PROBE_COMMAND and not self.probing and time.monotonic() >= self.retry_at:
+            self.probe = asyncio.current_task()
+            return True
+        return False
+
+    def grade(self):
+        if len(self.calls) >= 5 and self.error_rate >= DEGRADED_ERRORS:
+            self.state = DEGRADED
+        elif self.latency >= DEGRADED_LATENCY:
+            self.state = DEGRADED
+        else:
+            self.state = HEALTHY
+
+    def success(self, latency: float) -> typing.Optional[Outage]:
+        """Returns the outage this call ended, if any"""
+        self.calls.append((True, latency))
+        self.consecutive = 0
+        self.failing_since = None
+        self.alerted = False
+        self.probe = None
+        ended = None
+        if self.outage:
+            self.outage.ended = time.time()
+            self.history.append(self.outage)
+            ended = self.outage
+            self.outage = None
+        self.backoff = PROBE_BASE
+        self.grade()
+        return ended
+
+    def failure(self, reason: str) -> typing.Optional[Outage]:
+        """Returns the outage this call started, if any"""
+        self.calls.append((False, 0.0))
+        self.consecutive += 1
+        if self.failing_since is None:
+            self.failing_since = time.time()
+        if self.state == OPEN:
+            # Admin commands and calls that were already in flight when the circuit opened aren't the probe
+            if self.is_probe():
+                self.probe = None
+                self.outage.probes += 1
+                self.backoff = min(self.backoff * 2, PROBE_MAX)
+                self.retry_at = time.monotonic() + self.backoff
+            return None
+        if self.consecutive >= OPEN_AFTER:
+            self.state = OPEN
+            self.outage = Outage(self.failing_since, reason)
+            self.backoff = PROBE_BASE
+            self.retry_at = time.monotonic() + self.backoff
+            return self.outage
+        self.grade()
+        return None
+
+
+class HealthMonitor:
+    """
+    Health of every server, shared by the pollers, chat relays, executor and shop deliveries
+
+    A server is healthy, degraded (slow or erroring in the rolling window) or open. Once open,
+    nothing but admin commands and one half-open listplayers probe is sent until a call succeeds.
+    Probes back off exponentially. Outages are timestamped and saved so their history survives reloads.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.servers: typing.Dict[int, ServerHealth] = {}
+        self.names: typing.Dict[int, typing.Tuple[int, str]] = {}
+        self.saving: typing.Optional[asyncio.Task] = None
+
+    def get(self, server: dict) -> ServerHealth:
+        key = server["chatchannel"]
+        health = self.servers.get(key)
+        if health is None:
+            health = self.servers[key] = ServerHealth()
+        # Servers from the config (instead of the cog's cache) don't carry their guild
+        if "guild" in server:
+            self.names[key] = (server["guild"].id, f"{server['name']} {server['cluster']}")
+        return health
+
+    def label(self, server: dict) -> str:
+        return self.names.get(server["chatchannel"], (0, str(server["chatchannel"])))[1]
+
+    def state(self, server: dict) -> str:
+        return self.get(server).state
+
+    def available(self, server: dict) -> bool:
+        return self.get(server).state != OPEN
+
+    def allow(self, server: dict, command: str) -> bool:
+        return self.get(server).allow(command)
+
+    def success(self, server: dict, latency: float):
+        ended = self.get(server).success(latency)
+        if ended:
+            log.info(f"{self.label(server)} is back after {round(ended.duration)}s")
+            self.save()
+
+    def release(self, server: dict):
+        self.get(server).release()
+
+    def failure(self, server: dict, reason: str):
+        started = self.get(server).failure(reason)
+        if started:
+            log.info(f"{self.label(server)} circuit opened: {reason}")
+            self.save()
+
+    def history(self, guild_id: int) -> typing.List[typing.Tuple[str, Outage]]:
+        """Open and closed outages for a guild, newest first"""
+        rows = []
+        for key, health in self.servers.items():
+            gid, name = self.names.get(key, (0, str(key)))
+            if gid != guild_id:
+                continue
+            outages = list(health.history)
+            if health.outage:
+                outages.append(health.outage)
+            rows.extend((name, outage) for outage in outages)
+        rows.sort(key=lambda row: row[1].started, reverse=True)
+        return rows
+
+    def dump(self) -> dict:
+        data = {}
+        for key, health in self.servers.items():
+            outages = [o.to_dict() for o in health.history]
+            if health.outage:
+                outages.append(health.outage.to_dict())
+            if not outages:
+                continue
+            gid, name = self.names.get(key, (0, str(key)))
+            data[str(key)] = {"guild": gid, "name": name, "outages": outages}
+        return data
+
+    def write(self, data: dict):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data))
+        tmp.replace(self.path)
+
+    def read(self) -> dict:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Failed to read outage history: {e}")
+            return {}
+
+    async def load(self):
+        data = await asyncio.get_running_loop().run_in_executor(None, self.read)
+        for key, entry in data.items():
+            key = int(key)
+            health = self.servers.setdefault(key, ServerHealth())
+            self.names.setdefault(key, (entry["guild"], entry["name"]))
+            for outage in entry["outages"]:
+                outage = Outage(**outage)
+                # An outage still open when the cog unloaded has no known end
+                if outage.ended is None:
+                    outage.unknown = True
+                health.history.append(outage)
+
+    def save(self):
+        # Outages are rare, but a flapping server shouldn't queue up a write per flap
+        if self.saving and not self.saving.done():
+            return
+        self.saving = asyncio.create_task(self.flush(), name="ArkTools-HealthSave")
+
+    async def flush(self):
+        await asyncio.sleep(1)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write, self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save outage history: {e}")
@@ -0,0 +1,394 @@
+import asyncio
+import copy
+import logging
+import pathlib
+import re
+import time
+import types
+import typing
+
+from .chatqueue import ServerChatQueue
+from .getchat import CHAT, TRIBE, parse as parse_getchat
+from .health import HealthMonitor
+from .outbound import OutboundQueue
+from .rcon import RconError, RconPool
+from .routing import ChatRouter
+from .scheduler import LIST_INTERVAL, PollScheduler
+from .settingscache import SettingsCache
+from .simulator import NO_PLAYERS, NO_RESPONSE, SimCluster, SimConfig
+from .statstore import StatStore
+from .tribelog import parse_tribelog
+
+log = logging.getLogger("red.vrt.arktools.loadtest")
+
+PLAYER = re.compile(r"(?:[0-9]+\. )(.+), ([0-9]+)")
+# How often player_stats runs, and how often the loop lag is sampled
+STATS_INTERVAL = 120
+LAG_INTERVAL = 0.1
+
+# Cog methods that run unchanged with the harness standing in for the cog
+BORROWED = (
+    "message_handler", "player_join_leave", "tribelog_sendoff", "tribelog_ingest", "init_new_player",
+    "init_player_map", "update_name", "get_player", "get_uid", "find_gamertag", "find_character",
+    "config_index", "player_index", "reindex", "playerdata", "tribedata",
+)
+# Channel ids of the simulated guild, map chat channels are the server ids
+GLOBALCHAT, ADMINLOG, JOINLOG, LEAVELOG, EVENTLOG, MASTERLOG = range(1, 7)
+INVITE = "discord.gg/loadtest"
+CAN_SEND = types.SimpleNamespace(send_messages=True)
+
+
+class LoadStats:
+    def __init__(self):
+        self.round_trips = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.skipped = 0
+        self.commands = 0
+        self.sends = 0
+        self.writes = 0
+        self.chat_lines = 0
+        self.tribe_events = 0
+        self.lag: typing.List[float] = []
+
+
+class Sink:
+    """Takes the place of a Discord channel, sends are counted instead of made"""
+
+    def __init__(self, stats: LoadStats, guild: "SimGuild", channel_id: int):
+        self.stats = stats
+        self.guild = guild
+        self.id = channel_id
+        self.name = f"channel{channel_id}"
+        self.mention = f"<#{channel_id}>"
+
+    def permissions_for(self, member):
+        return CAN_SEND
+
+    async def send(self, *args, **kwargs):
+        self.stats.sends += 1
+
+    async def create_invite(self, **kwargs) -> str:
+        return INVITE
+
+
+class SimGuild:
+    """Takes the place of the Discord guild, every channel is a Sink"""
+    id = 0
+    name = "LoadTest"
+
+    def __init__(self, stats: LoadStats):
+        self.stats = stats
+        self.me = types.SimpleNamespace(id=0)
+        self.channels: typing.Dict[int, Sink] = {}
+
+    def get_channel(self, channel_id: typing.Optional[int]) -> typing.Optional[Sink]:
+        if channel_id is None:
+            return None
+        if channel_id not in self.channels:
+            self.channels[channel_id] = Sink(self.stats, self, channel_id)
+        return self.channels[channel_id]
+
+    def get_role(self, role_id: int):
+        return None
+
+    def get_member(self, user_id: int):
+        return None
+
+    async def vanity_invite(self) -> str:
+        return INVITE
+
+
+class MemoryValue:
+    """
+    A guild setting held in memory, awaited or used with "async with" like a Red config value
+
+    Reads are deep copies like the ones Red's JSON driver hands out, and a write is counted
+    whenever an "async with" block changed the value.
+    """
+
+    def __init__(self, config: "MemoryConfig", key: str):
+        self.config = config
+        self.key = key
+        self.value = None
+
+    def __await__(self):
+        return self.read().__await__()
+
+    async def read(self):
+        return copy.deepcopy(self.config.data[self.key])
+
+    async def set(self, value):
+        self.config.data[self.key] = value
+        self.config.stats.writes += 1
+
+    async def __aenter__(self):
+        self.value = await self.read()
+        return self.value
+
+    async def __aexit__(self, *exc):
+        if self.value != self.config.data[self.key]:
+            await self.set(self.value)
+
+
+class MemoryConfig:
+    """The part of the cog's Config the pipeline uses, for the one simulated guild"""
+
+    def __init__(self, stats: LoadStats, data: dict):
+        self.stats = stats
+        self.data = data
+
+    def guild(self, guild):
+        return self
+
+    def players(self) -> MemoryValue:
+        return MemoryValue(self, "players")
+
+    def tribes(self) -> MemoryValue:
+        return MemoryValue(self, "tribes")
+
+    async def all(self) -> dict:
+        return copy.deepcopy(self.data)
+
+
+def guild_settings(digest_window: float) -> dict:
+    """Guild settings for a load test, crosschat and logging on, Xbox features off"""
+    return {
+        "alt": {"on": False},
+        "welcomemsg": None,
+        "masterlog": MASTERLOG,
+        "eventlog": EVENTLOG,
+        "autowelcome": False,
+        "autofriend": False,
+        "clusters": {},
+        "crosschat": True,
+        "badnames": [],
+        "tribes": {},
+        "players": {},
+        "ranks": {},
+        "autorename": False,
+        "digestwindow": digest_window,
+    }
+
+
+class LoadHarness:
+    """
+    Runs the real poll scheduler and result handlers against a simulated cluster
+
+    This stands in for the cog. RCON goes over the real RconPool and HealthMonitor, and the cog's
+    own message_handler, player_join_leave and player_stats run against a simulated guild whose
+    channels count sends and whose config is held in memory and counts writes, so a load test
+    never touches a real guild. In-game commands and Xbox Live features are left out.
+    """
+
+    def __init__(self, cog, config: SimConfig, path: pathlib.Path, digest_window: float = 5):
+        self.cluster = SimCluster(config)
+        self.stats = LoadStats()
+        self.guild = SimGuild(self.stats)
+        self.bot = self
+        self.config = MemoryConfig(self.stats, guild_settings(digest_window))
+        self.settings = SettingsCache(self.config)
+        for name in BORROWED:
+            setattr(self, name, types.MethodType(getattr(type(cog), name), self))
+        self.player_stats = types.MethodType(type(cog).player_stats.coro, self)
+        self.health = HealthMonitor(path)
+        self.rcon = RconPool(self.health)
+        self.outbound = OutboundQueue()
+        self.chatqueue = ServerChatQueue(self.executor, self.health.available)
+        self.scheduler = PollScheduler(self)
+        self.statstore = StatStore(self.playerdata)
+        self.router = ChatRouter()
+        self.servers: typing.List[typing.Tuple[int, dict]] = []
+        self.activeguilds = [str(self.guild.id)]
+        self.playerlist: typing.Dict[int, typing.Union[str, list]] = {}
+        self.indexes = {}
+        self.dbguilds = set()
+        self.warnings = []
+        self.time = ""
+        self.replaying = False
+        self.tasks: typing.List[asyncio.Task] = []
+
+    def get_guild(self, guild_id: int) -> SimGuild:
+        return self.guild
+
+    async def get_valid_prefixes(self, guild=None) -> list:
+        # No prefixes, so message_handler never runs an in-game command
+        return []
+
+    def add(self, server: dict):
+        """Fill in what initialize adds to each server dict and register the server"""
+        server.update({
+            "guild": self.guild,
+            "globalchatchannel": GLOBALCHAT,
+            "adminlogchannel": ADMINLOG,
+            "joinchannel": JOINLOG,
+            "leavechannel": LEAVELOG,
+            "eventlog": EVENTLOG,
+            "crosschat": True,
+            "capture": False,
+        })
+        self.config.data["clusters"].setdefault(server["cluster"], {"servertoserver": False})
+        self.playerlist.setdefault(server["chatchannel"], "offline")
+        self.servers.append((self.guild.id, server))
+        self.router = ChatRouter(self.servers)
+        self.settings.bump(self.guild.id)
+
+    async def executor(self, guild, server: dict, command: str) -> typing.Optional[str]:
+        if command not in ("getchat", "listplayers"):
+            # Sent by the handlers themselves, invites and relayed chat
+            self.stats.commands += 1
+            if self.replaying:
+                return None
+        res = None
+        if not self.health.allow(server, command):
+            self.stats.skipped += 1
+        else:
+            self.stats.round_trips += 1
+            timeout = 10 if command == "listplayers" else 1
+            try:
+                res = await self.rcon.run(server, command, timeout)
+            except asyncio.TimeoutError:
+                self.stats.timeouts += 1
+            except (OSError, RconError):
+                self.stats.errors += 1
+        self.count(command, res)
+        await self.handle(server, command, res)
+        return res
+
+    def count(self, command: str, res: typing.Optional[str]):
+        """Chat lines and tribe log events in a getchat response, for the report"""
+        if command != "getchat" or not res or NO_RESPONSE in res:
+            return
+        for line in parse_getchat(res):
+            if line.kind == CHAT:
+                self.stats.chat_lines += 1
+            elif line.kind == TRIBE and parse_tribelog(line.text):
+                self.stats.tribe_events += 1
+
+    async def handle(self, server: dict, command: str, res: typing.Optional[str]):
+        """What the cog's executor does with a response once it has one"""
+        if command == "getchat" and res and NO_RESPONSE not in res:
+            await self.message_handler(self.guild, server, res)
+        elif command == "listplayers":
+            if not res:
+                await self.player_join_leave(self.guild, server, "offline")
+            elif NO_PLAYERS in res:
+                await self.player_join_leave(self.guild, server, "empty")
+            else:
+                await self.player_join_leave(self.guild, server, PLAYER.findall(res))
+
+    async def stats_loop(self):
+        # First tick once every map has been listed, then as often as the cog's loop
+        await asyncio.sleep(LIST_INTERVAL)
+        while True:
+            try:
+                await self.player_stats()
+            except Exception as e:
+                log.warning(f"Load test player_stats failed: {e}", exc_info=e)
+            await asyncio.sleep(STATS_INTERVAL)
+
+    async def monitor(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            self.stats.lag.append(max(0.0, loop.time() - due))
+
+    async def run(self, seconds: float) -> typing.List[list]:
+        await self.cluster.start()
+        for server in self.cluster.servers():
+            self.add(server)
+        self.tasks = [
+            asyncio.create_task(self.monitor(), name="ArkTools-LoadTest-Lag"),
+            asyncio.create_task(self.stats_loop(), name="ArkTools-LoadTest-Stats"),
+        ]
+        start = time.monotonic()
+        try:
+            self.scheduler.sync(self.servers)
+            await asyncio.sleep(seconds)
+        finally:
+            self.close()
+            await self.cluster.stop()
+        return self.report(time.monotonic() - start)
+
+    async def replay(self, entries: typing.List[dict], speed: float = 0) -> typing.List[list]:
+        """
+        Feed captured traffic back through the pipeline
+
+        With a speed of 0 records go through as fast as they can, otherwise they're spaced out
+        like they were captured (1 is real time, 2 is twice as fast). player_stats ticks on the
+        capture's clock and commands the handlers send back aren't run, so replays are
+        deterministic, the same capture always counts the same sends and writes.
+        """
+        self.replaying = True
+        loop = asyncio.get_running_loop()
+        servers = {}
+        start = loop.time()
+        first = entries[0]["time"] if entries else 0
+        next_stats = first + LIST_INTERVAL
+        parsing = 0.0
+        try:
+            for entry in entries:
+                if speed:
+                    delay = start + (entry["time"] - first) / speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                server = servers.get(entry["server"])
+                if server is None:
+                    server = {"name": entry["name"], "cluster": entry["cluster"], "chatchannel": entry["server"]}
+                    servers[entry["server"]] = server
+                    self.add(server)
+                t1 = time.perf_counter()
+                if entry["time"] >= next_stats:
+                    await self.player_stats()
+                    next_stats = entry["time"] + STATS_INTERVAL
+                self.stats.round_trips += 1
+                self.count(entry["command"], entry["response"])
+                await self.handle(server, entry["command"], entry["response"])
+                parsing += time.perf_counter() - t1
+                if not speed and self.stats.round_trips % 500 == 0:
+                    await asyncio.sleep(0)
+            # Let the digest queue and any new player writes finish
+            await asyncio.sleep(self.config.data["digestwindow"] + 0.1)
+        finally:
+            self.outbound.close()
+            self.chatqueue.close()
+        took = loop.time() - start
+        rows = self.report(took)[:-3]
+        rows.append(["Servers", len(servers), "-"])
+        rows.append(["Pipeline time", f"{round(parsing * 1000, 1)}ms", "-"])
+        rows.append(["Records/s", f"{int(len(entries) / parsing) if parsing else 0:,}", "-"])
+        return rows
+
+    def report(self, took: float) -> typing.List[list]:
+        stats = self.stats
+        minutes = took / 60
+        lag = sorted(stats.lag) or [0.0]
+        rows = []
+        for name, value in (
+                ("RCON round trips", stats.round_trips),
+                ("RCON timeouts", stats.timeouts),
+                ("RCON errors", stats.errors),
+                ("Skipped (circuit open)", stats.skipped),
+                ("Commands from handlers", stats.commands),
+                ("Chat lines", stats.chat_lines),
+                ("Tribe log events", stats.tribe_events),
+                ("Discord sends", stats.sends),
+                ("Config writes", stats.writes),
+        ):
+            rows.append([name, value, round(value / minutes, 1)])
+        for name, value in (
+                ("Loop lag p50", lag[len(lag) // 2]),
+                ("Loop lag p99", lag[int(len(lag) * 0.99)]),
+                ("Loop lag max", lag[-1]),
+        ):
+            rows.append([name, f"{int(value * 1000)}ms", "-"])
+        return rows
+
+    def close(self):
+        self.scheduler.stop()
+        for task in self.tasks:
+            task.cancel()
+        self.outbound.close()
+        self.chatqueue.close()
+        self.rcon.close()
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+import typing
+
+import discord
+from redbot.core.utils.chat_formatting import pagify
+
+log = logging.getLogger("red.vrt.arktools.outbound")
+
+# Discord allows 5 messages per 5 seconds in a channel
+BURST = 5
+RATE = 1.0
+# Attempts per page when Discord still answers with a 429
+RETRIES = 3
+
+
+class TokenBucket:
+    """Paces sends to one channel so the queue waits instead of getting rate limited"""
+
+    def __init__(self, rate: float = RATE, capacity: int = BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Take a token, returns how long to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Discord said to back off, empty the bucket for that long"""
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class OutboundQueue:
+    """
+    Batches log lines per channel and sends them as few messages as possible
+
+    Lines put in a channel are held for the digest window, then joined and pagified so a burst
+    (like a map coming back online with everyone on it) goes out as a couple of messages.
+    Each channel has one worker draining it, paced by a token bucket.
+    """
+
+    def __init__(self):
+        self.pending: typing.Dict[int, typing.List[str]] = {}
+        self.workers: typing.Dict[int, asyncio.Task] = {}
+        self.buckets: typing.Dict[int, TokenBucket] = {}
+        self.lines = 0
+        self.sent = 0
+        self.limited = 0
+
+    def put(self, channel: discord.TextChannel, line: str, window: float = 0):
+        self.pending.setdefault(channel.id, []).append(line)
+        self.lines += 1
+        if channel.id not in self.workers:
+            name = f"ArkTools-{channel.guild.name}-Outbound-{channel.name}"
+            self.workers[channel.id] = asyncio.create_task(self.drain(channel, window), name=name)
+
+    async def drain(self, channel: discord.TextChannel, window: float):
+        try:
+            # Even without a window this yields once, so every line from the same tick is batched
+            await asyncio.sleep(window)
+            while self.pending.get(channel.id):
+                lines = self.pending.pop(channel.id)
+                for page in pagify("\n".join(lines)):
+                    await self.send(channel, page)
+        except Exception as e:
+            log.warning(f"Outbound queue for {channel.name} in {channel.guild.name} failed: {e}")
+            self.pending.pop(channel.id, None)
+        finally:
+            self.workers.pop(channel.id, None)
+
+    async def send(self, channel: discord.TextChannel, content: str):
+        bucket = self.buckets.setdefault(channel.id, TokenBucket())
+        for _ in range(RETRIES):
+            delay = bucket.delay()
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                await channel.send(content)
+                self.sent += 1
+                return
+            except discord.Forbidden:
+                log.warning(f"Missing send message perms in {channel.guild.name} for {channel.name}")
+                return
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    raise
+                self.limited += 1
+                retry_after = float(e.response.headers.get("Retry-After", 1))
+                bucket.pause(retry_after)
+        log.warning(f"Dropped a message to {channel.name} in {channel.guild.name} after {RETRIES} rate limits")
+
+    def close(self):
+        for task in self.workers.values():
+            task.cancel()
+        self.workers.clear()
+        self.pending.clear()
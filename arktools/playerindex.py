@@ -0,0 +1,138 @@
+import logging
+import typing
+
+log = logging.getLogger("red.vrt.arktools.playerindex")
+
+
+def fold(name: typing.Optional[str]) -> typing.Optional[str]:
+    if not isinstance(name, str) or not name:
+        return None
+    return name.casefold()
+
+
+class PlayerIndex:
+    """
+    In-memory lookup tables over a guild's `players` config
+
+    Gamertags and character names are case-folded. Every key maps to an ordered set of xuids
+    (a dict with None values) so duplicates in the config are kept and the first one stored wins,
+    same as the old linear scans.
+
+    The index never owns any player data, callers refresh it after writing to the config.
+    """
+
+    def __init__(self, players: dict = None):
+        self.gamertags: typing.Dict[str, typing.Dict[str, None]] = {}
+        self.discord: typing.Dict[int, typing.Dict[str, None]] = {}
+        # server_id -> character name -> xuids
+        self.characters: typing.Dict[str, typing.Dict[str, typing.Dict[str, None]]] = {}
+        # character name on any map -> xuid -> number of maps using that name
+        self.names: typing.Dict[str, typing.Dict[str, int]] = {}
+        # xuid -> what it was indexed under, so it can be unindexed without a scan
+        self.entries: typing.Dict[str, tuple] = {}
+        if players:
+            for xuid, data in players.items():
+                self.add(xuid, data)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, xuid: str):
+        return xuid in self.entries
+
+    @staticmethod
+    def keys_for(data: dict) -> tuple:
+        gamertag = fold(data.get("username"))
+        discord_id = data.get("discord")
+        discord_id = int(discord_id) if discord_id else None
+        characters = {}
+        for server_id, details in data.get("ingame", {}).items():
+            name = fold(details.get("name")) if isinstance(details, dict) else None
+            if name:
+                characters[str(server_id)] = name
+        return gamertag, discord_id, characters
+
+    def add(self, xuid: str, data: dict):
+        """Index a player, or re-index them if they were already present"""
+        keys = self.keys_for(data)
+        if self.entries.get(xuid) == keys:
+            return
+        self.remove(xuid)
+        gamertag, discord_id, characters = keys
+        if gamertag:
+            self.gamertags.setdefault(gamertag, {})[xuid] = None
+        if discord_id:
+            self.discord.setdefault(discord_id, {})[xuid] = None
+        for server_id, name in characters.items():
+            self.characters.setdefault(server_id, {}).setdefault(name, {})[xuid] = None
+            counts = self.names.setdefault(name, {})
+            counts[xuid] = counts.get(xuid, 0) + 1
+        self.entries[xuid] = keys
+
+    def remove(self, xuid: str):
+        keys = self.entries.pop(xuid, None)
+        if not keys:
+            return
+        gamertag, discord_id, characters = keys
+        if gamertag:
+            self.discard(self.gamertags, gamertag, xuid)
+        if discord_id:
+            self.discard(self.discord, discord_id, xuid)
+        for server_id, name in characters.items():
+            names = self.characters.get(server_id, {})
+            self.discard(names, name, xuid)
+            if not names:
+                self.characters.pop(server_id, None)
+            counts = self.names.get(name, {})
+            if counts.get(xuid, 0) > 1:
+                counts[xuid] -= 1
+            else:
+                self.discard(self.names, name, xuid)
+
+    @staticmethod
+    def discard(table: dict, key, xuid: str):
+        xuids = table.get(key)
+        if xuids is None:
+            return
+        xuids.pop(xuid, None)
+        if not xuids:
+            del table[key]
+
+    def refresh(self, players: dict, *xuids: str):
+        """Sync the given players with their current config entries"""
+        for xuid in xuids:
+            if xuid in players:
+                self.add(xuid, players[xuid])
+            else:
+                self.remove(xuid)
+
+    def by_gamertag(self, gamertag: str) -> typing.Optional[str]:
+        xuids = self.gamertags.get(fold(gamertag))
+        if xuids:
+            return next(iter(xuids))
+
+    def by_discord(self, user_id: int) -> typing.List[str]:
+        return list(self.discord.get(int(user_id), ()))
+
+    def by_character(self, character_name: str, server_id: str = None) -> typing.List[str]:
+        """Xuids using a character name on a map, or on any map if no server_id is given"""
+        name = fold(character_name)
+        if server_id is None:
+            return list(self.names.get(name, ()))
+        return list(self.characters.get(str(server_id), {}).get(name, ()))
+
+    def check(self, players: dict) -> typing.List[str]:
+        """Compare against the config and return a list of problems found"""
+        problems = []
+        fresh = PlayerIndex(players)
+        stale = [x for x in self.entries if fresh.entries.get(x) != self.entries[x]]
+        missing = [x for x in fresh.entries if x not in self.entries]
+        if stale or missing:
+            problems.append(f"{len(stale)} stale and {len(missing)} missing index entries")
+        for gamertag, xuids in fresh.gamertags.items():
+            if len(xuids) > 1:
+                problems.append(f"Gamertag {gamertag} is shared by {', '.join(xuids)}")
+        for user_id, xuids in fresh.discord.items():
+            if len(xuids) > 1:
+                problems.append(f"Discord user {user_id} is registered to {', '.join(xuids)}")
+        return problems
@@ -1,49 +1,230 @@
+import asyncio
 import logging
-
-import discord
-from rcon.asyncio import rcon
-from redbot.core.utils.chat_formatting import box
+import struct
+import time
+import typing
 
 log = logging.getLogger("red.vrt.arktools.rcon")
 
+# Source RCON packet types
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+
+# Request id's are signed 32 bit ints, -1 is reserved by the server for failed auth
+MAX_REQUEST_ID = 2147483647
+# Anything bigger than this is a corrupt stream, ark never sends packets this large
+MAX_PACKET_SIZE = 1 << 20
+# Drop the socket after this many timeouts in a row so the next call reconnects
+MAX_TIMEOUTS = 2
+
+
+class RconError(Exception):
+    """Base exception for the asyncio RCON client"""
+
+
+class RconAuthError(RconError):
+    """Server rejected the RCON password"""
+
+
+def encode_packet(request_id: int, packet_type: int, body: str) -> bytes:
+    payload = struct.pack("<ii", request_id, packet_type) + body.encode("utf-8") + b"\x00\x00"
+    return struct.pack("<i", len(payload)) + payload
+
+
+class RconClient:
+    """
+    Persistent, authenticated Source RCON connection to a single server
+
+    Commands are multiplexed over one socket by request id, so any number of them
+    can be in flight at once. If the connection drops it is re-established on the next call.
+    """
+
+    def __init__(self, host: str, port: int, password: str, connect_timeout: float = 3.0):
+        self.host = host
+        self.port = int(port)
+        self.password = password
+        self.connect_timeout = connect_timeout
+
+        self._writer: typing.Optional[asyncio.StreamWriter] = None
+        self._listener: typing.Optional[asyncio.Task] = None
+        self._pending: typing.Dict[int, asyncio.Future] = {}
+        self._request_id = 0
+        self._timeouts = 0
+        self._lock = asyncio.Lock()
+
+        # Some simple counters for debugging
+        self.connects = 0
+        self.requests = 0
+
+    def __repr__(self):
+        return f"<RconClient {self.host}:{self.port} connected={self.connected}>"
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def next_id(self) -> int:
+        self._request_id = self._request_id % (MAX_REQUEST_ID - 1) + 1
+        return self._request_id
+
+    async def read_packet(self, reader: asyncio.StreamReader) -> typing.Tuple[int, int, str]:
+        try:
+            header = await reader.readexactly(4)
+            size = struct.unpack("<i", header)[0]
+            if size < 10 or size > MAX_PACKET_SIZE:
+                raise RconError(f"Invalid packet size {size} from {self.host}:{self.port}")
+            data = await reader.readexactly(size)
+        except EOFError:
+            # IncompleteReadError, the server hung up mid packet (or before auth finished)
+            raise RconError(f"{self.host}:{self.port} closed the connection")
+        request_id, packet_type = struct.unpack("<ii", data[:8])
+        body = data[8:-2].decode("utf-8", errors="replace")
+        return request_id, packet_type, body
+
+    async def connect(self, timeout: float = None):
+        async with self._lock:
+            if self.connected:
+                return
+            timeout = timeout or self.connect_timeout
+            await asyncio.wait_for(self.open(), timeout=timeout)
+
+    async def open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self._writer = writer
+        try:
+            auth_id = self.next_id()
+            writer.write(encode_packet(auth_id, SERVERDATA_AUTH, self.password))
+            await writer.drain()
+            # Server sends an empty response value packet before the actual auth response
+            while True:
+                request_id, packet_type, _ = await self.read_packet(reader)
+                if packet_type == SERVERDATA_AUTH_RESPONSE:
+                    break
+            if request_id != auth_id:
+                raise RconAuthError(f"Authentication failed for {self.host}:{self.port}")
+        except BaseException:
+            self.teardown()
+            raise
+        self.connects += 1
+        self._timeouts = 0
+        self._listener = asyncio.create_task(self.listen(reader, writer), name=f"RCON-{self.host}:{self.port}")
+
+    async def listen(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        reason = "connection closed"
+        try:
+            while True:
+                request_id, _, body = await self.read_packet(reader)
+                future = self._pending.get(request_id)
+                # If nobody is waiting then the request already timed out
+                if future and not future.done():
+                    future.set_result(body)
+        except asyncio.CancelledError:
+            raise
+        except (ConnectionError, OSError, RconError) as e:
+            reason = str(e) or e.__class__.__name__
+        finally:
+            # Only tear down if a newer connection hasn't already replaced this one
+            if self._writer is writer:
+                self.teardown(reason)
+            else:
+                writer.close()
+
+    def teardown(self, reason: str = "connection closed"):
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+        if self._listener is not None and self._listener is not asyncio.current_task():
+            self._listener.cancel()
+        self._listener = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RconError(f"{self.host}:{self.port} {reason}"))
+        self._pending.clear()
+
+    async def run(self, command: str, timeout: float = 3.0) -> str:
+        """Send a command and wait for its response, reconnecting if needed"""
+        if not self.connected:
+            await self.connect(max(timeout, self.connect_timeout))
+        writer = self._writer
+        if writer is None:
+            raise RconError(f"{self.host}:{self.port} connection closed")
+        request_id = self.next_id()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.requests += 1
+        try:
+            writer.write(encode_packet(request_id, SERVERDATA_EXECCOMMAND, command))
+            await writer.drain()
+            res = await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            # Half open sockets never error out, so give up on the connection after a few timeouts
+            self._timeouts += 1
+            if self._timeouts >= MAX_TIMEOUTS:
+                self.teardown("timed out")
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+        self._timeouts = 0
+        return res
+
+    def close(self):
+        self.teardown()
+
+
+class RconPool:
+    """
+    Keeps one persistent RconClient per server, keyed by address
+
+    If a health monitor is given, every call's latency or failure is recorded to it.
+    """
+
+    def __init__(self, health=None):
+        self.clients: typing.Dict[typing.Tuple[str, int], RconClient] = {}
+        self.health = health
+
+    def get(self, server: dict) -> RconClient:
+        key = (server["ip"], int(server["port"]))
+        client = self.clients.get(key)
+        # Password was changed so the old connection is no good
+        if client and client.password != server["password"]:
+            client.close()
+            client = None
+        if not client:
+            client = RconClient(server["ip"], server["port"], server["password"])
+            self.clients[key] = client
+        return client
 
-# Manual RCON commands
-async def async_rcon(server: dict, command: str, channel: discord.TextChannel = None):
-    serv = server["name"]
-    cluster = server["cluster"]
-    name = f"{serv} {cluster}"
-    if "gamertag" in server:
-        gt = server["gamertag"]
-        name = f"{serv} {cluster} ({gt})"
-    try:
-        res = await rcon(
-            command=command,
-            host=server["ip"],
-            port=server["port"],
-            passwd=server["password"]
-        )
-        res = res.strip()
-        resp = box(f"➣ {name}\n{res}", lang="python")
-        if "Server received, But no response!!" in str(res) or "World Saved" in str(res):
-            resp = box(f"✅ {name}", lang="python")
-        if channel:
-            await channel.send(resp)
-    except Exception as e:
-        if "121" in str(e):
-            resp = box(f"- {name} has timed out and may be down", lang="diff")
-            if channel:
-                await channel.send(resp)
-        elif "Connection timed out" in str(e):
-            resp = box(f"- {name} has timed out and may be down", lang="diff")
-            if channel:
-                await channel.send(resp)
-        elif "502 Bad Gateway" in str(e) and "Cloudflare" in str(e):
-            log.warning("Async_RCON Error: Cloudflare Issue, Discord is borked not my fault.")
-        else:
-            resp = box(f"- {name} encountered an unknown error: {e}", lang="diff")
-            if channel:
-                await channel.send(resp)
-            log.warning(f"Async_RCON Error: {e}\nCommand: {command}")
+    async def run(self, server: dict, command: str, timeout: float = 3.0) -> str:
+        if self.health is None:
+            return await self.get(server).run(command, timeout)
+        start = time.monotonic()
+        try:
+            res = await self.get(server).run(command, timeout)
+        except asyncio.TimeoutError:
+            self.health.failure(server, f"{command.split(' ', 1)[0]} timed out")
+            raise
+        except Exception as e:
+            # Connection errors, RconError, or anything unexpected all count against the server
+            self.health.failure(server, str(e) or e.__class__.__name__)
+            raise
+        except BaseException:
+            # Cancelled, a probe that never finished mustn't leave the circuit stuck open
+            self.health.release(server)
+            raise
+        self.health.success(server, time.monotonic() - start)
+        return res
 
+    def prune(self, servers: typing.Iterable[dict]):
+        """Close connections to servers that are no longer configured"""
+        keep = {(s["ip"], int(s["port"])) for s in servers}
+        for key in list(self.clients.keys()):
+            if key not in keep:
+                self.clients.pop(key).close()
 
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+        self.clients.clear()
 
@@ -0,0 +1,57 @@
+import types
+import typing
+
+
+class ServerRecord:
+    """Cached server entry with the fields chat routing needs pulled out of the config dict"""
+    __slots__ = ("guild_id", "cluster", "name", "chatchannel", "globalchannel", "data")
+
+    def __init__(self, guild_id: int, data: dict):
+        self.guild_id = guild_id
+        self.cluster = data["cluster"]
+        self.name = data["name"]
+        self.chatchannel = data["chatchannel"]
+        self.globalchannel = data["globalchatchannel"]
+        self.data = data
+
+    def __repr__(self):
+        return f"<ServerRecord {self.name} {self.cluster} guild={self.guild_id}>"
+
+
+class ChatRouter:
+    """
+    Immutable lookup tables for routing chat between Discord channels and servers
+
+    Built from scratch by ArkTools.initialize and swapped in as a whole,
+    so readers never see a half built registry.
+    """
+    __slots__ = ("guilds", "channels", "by_channel", "by_global", "by_cluster")
+
+    def __init__(self, servers: typing.Iterable[typing.Tuple[int, dict]] = ()):
+        by_channel = {}
+        by_global = {}
+        by_cluster = {}
+        for guild_id, data in servers:
+            record = ServerRecord(guild_id, data)
+            by_channel[record.chatchannel] = record
+            by_global.setdefault(record.globalchannel, []).append(record)
+            by_cluster.setdefault((guild_id, record.cluster), []).append(record)
+        self.by_channel = types.MappingProxyType(by_channel)
+        self.by_global = types.MappingProxyType({k: tuple(v) for k, v in by_global.items()})
+        self.by_cluster = types.MappingProxyType({k: tuple(v) for k, v in by_cluster.items()})
+        self.guilds = frozenset(r.guild_id for r in by_channel.values())
+        self.channels = frozenset(by_channel.keys()) | frozenset(by_global.keys())
+
+    def __len__(self):
+        return len(self.by_channel)
+
+    def map_server(self, channel_id: int) -> typing.Optional[ServerRecord]:
+        """Server whose map chat channel this is"""
+        return self.by_channel.get(channel_id)
+
+    def global_servers(self, channel_id: int) -> typing.Tuple[ServerRecord, ...]:
+        """All servers in the cluster that uses this as its global chat channel"""
+        return self.by_global.get(channel_id, ())
+
+    def cluster_servers(self, guild_id: int, cluster: str) -> typing.Tuple[ServerRecord, ...]:
+        return self.by_cluster.get((guild_id, cluster), ())
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import random
+import typing
+
+from .health import OPEN
+
+log = logging.getLogger("red.vrt.arktools.scheduler")
+
+# GetChat intervals in seconds depending on how busy a map is
+CHAT_ACTIVE = 2  # Someone chatted recently
+CHAT_POPULATED = 5  # Players online but quiet
+CHAT_EMPTY = 15  # Nobody online
+# How long a map counts as "active" after the last chat line
+ACTIVE_WINDOW = 60
+
+# ListPlayers interval, while a map is down the health monitor decides when to probe it
+LIST_INTERVAL = 30
+
+# Spread polls out so hundreds of maps don't all fire on the same tick
+JITTER = 0.1
+
+
+def jitter(seconds: float) -> float:
+    return seconds * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class ServerPoller:
+    """Long-lived polling coroutine for a single server"""
+
+    def __init__(self, cog, guild_id: int, server: dict):
+        self.cog = cog
+        self.guild_id = guild_id
+        self.server = server
+        self.task: typing.Optional[asyncio.Task] = None
+
+        self.inflight: typing.Dict[str, float] = {}  # Command -> monotonic start time
+        self.last_chat = 0.0  # Monotonic time of the last chat line seen
+        self.chat_interval = CHAT_POPULATED
+        self.list_interval = LIST_INTERVAL
+        self.lag = 0.0  # How late the last poll woke up compared to when it was due
+        self.polls = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.server['name']} {self.server['cluster']}"
+
+    @property
+    def state(self) -> typing.Union[str, list]:
+        return self.cog.playerlist.get(self.server["chatchannel"], "offline")
+
+    def start(self):
+        guild = self.server["guild"]
+        task_name = f"ArkTools-{guild.name}-{self.server['name']}-{self.server['cluster']}-Poller"
+        self.task = asyncio.create_task(self.run(), name=task_name)
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    def next_chat_interval(self) -> float:
+        state = self.state
+        loop = asyncio.get_running_loop()
+        if state == "offline":
+            # No point asking for chat until listplayers says the map is back
+            return self.next_list_interval()
+        elif loop.time() - self.last_chat < ACTIVE_WINDOW:
+            return CHAT_ACTIVE
+        elif state == "empty":
+            return CHAT_EMPTY
+        else:
+            return CHAT_POPULATED
+
+    def next_list_interval(self) -> float:
+        health = self.cog.health.get(self.server)
+        if health.state == OPEN:
+            # Wake up right when the next half-open probe is allowed
+            return max(health.retry_in(), 1.0)
+        return LIST_INTERVAL
+
+    async def poll(self, command: str):
+        loop = asyncio.get_running_loop()
+        guild = self.cog.bot.get_guild(self.guild_id)
+        if not guild:
+            return
+        self.inflight[command] = loop.time()
+        try:
+            res = await self.cog.executor(guild, self.server, command)
+        except Exception as e:
+            log.warning(f"Poller {self.name} {command}: {e}", exc_info=e)
+            res = None
+        finally:
+            del self.inflight[command]
+        self.polls += 1
+        if command == "getchat" and res and "):" in res:
+            self.last_chat = loop.time()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        # Listplayers goes first so the player cache is populated before chat is polled
+        next_list = loop.time()
+        next_chat = loop.time() + jitter(CHAT_POPULATED)
+        while True:
+            due = min(next_list, next_chat)
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            self.lag = max(0.0, loop.time() - due)
+            if next_list <= loop.time():
+                await self.poll("listplayers")
+                self.list_interval = self.next_list_interval()
+                next_list = loop.time() + jitter(self.list_interval)
+            if next_chat <= loop.time():
+                if self.state != "offline":
+                    await self.poll("getchat")
+                self.chat_interval = self.next_chat_interval()
+                next_chat = loop.time() + jitter(self.chat_interval)
+
+
+class PollScheduler:
+    """Runs one ServerPoller per configured server"""
+
+    def __init__(self, cog):
+        self.cog = cog
+        self.pollers: typing.Dict[int, ServerPoller] = {}
+
+    def sync(self, servers: typing.List[typing.Tuple[int, dict]]):
+        """Start pollers for new servers, update existing ones and stop removed ones"""
+        current = set()
+        for guild_id, server in servers:
+            key = server["chatchannel"]
+            current.add(key)
+            poller = self.pollers.get(key)
+            if not poller:
+                poller = ServerPoller(self.cog, guild_id, server)
+                self.pollers[key] = poller
+                poller.start()
+                continue
+            # Pick up any config changes without resetting the poller state
+            poller.guild_id = guild_id
+            poller.server = server
+            if poller.task.done():
+                if not poller.task.cancelled() and poller.task.exception():
+                    log.warning(f"Restarting crashed poller for {poller.name}", exc_info=poller.task.exception())
+                poller.start()
+        for key in list(self.pollers.keys()):
+            if key not in current:
+                self.pollers.pop(key).stop()
+
+    def stop(self):
+        for poller in self.pollers.values():
+            poller.stop()
+        self.pollers.clear()
+
+    def stats(self, guild_id: int = None) -> list:
+        loop = asyncio.get_running_loop()
+        rows = []
+        for poller in self.pollers.values():
+            if guild_id and poller.guild_id != guild_id:
+                continue
+            state = poller.state
+            if isinstance(state, list):
+                state = f"{len(state)} online"
+            inflight = ", ".join(
+                f"{cmd} {round(loop.time() - started, 1)}s" for cmd, started in poller.inflight.items()
+            )
+            rows.append([
+                poller.name,
+                state,
+                self.cog.health.state(poller.server),
+                f"{round(poller.chat_interval, 1)}s",
+                f"{round(poller.list_interval)}s",
+                f"{int(poller.lag * 1000)}ms",
+                inflight or "-",
+            ])
+        return rows
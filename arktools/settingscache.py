@@ -0,0 +1,78 @@
+import logging
+import types
+import typing
+
+import discord
+
+log = logging.getLogger("red.vrt.arktools.settingscache")
+
+# Written outside of commands on every tick (or too big to copy), always read these from the config directly
+VOLATILE = ("players", "tribes", "serverstats", "cooldowns", "status")
+
+
+def freeze(value):
+    """Read-only copy of a config value, dicts become mapping proxies and lists become tuples"""
+    if isinstance(value, dict):
+        return types.MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(i) for i in value)
+    return value
+
+
+def thaw(value):
+    """Plain dicts and lists again, for anything that needs to serialize or edit a snapshot value"""
+    if isinstance(value, types.MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(i) for i in value]
+    return value
+
+
+class SettingsCache:
+    """
+    Read-mostly guild settings for the task loops
+
+    Each guild has a version number that gets bumped whenever its settings change.
+    Snapshots are rebuilt on the next read after a bump, so loops running every few seconds
+    share one frozen copy of the settings instead of copying the whole config each time.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.versions: typing.Dict[int, int] = {}
+        self.snapshots: typing.Dict[int, typing.Tuple[int, types.MappingProxyType]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self, guild_id: int):
+        self.versions[guild_id] = self.versions.get(guild_id, 0) + 1
+
+    def drop(self, guild_id: int):
+        self.bump(guild_id)
+        self.snapshots.pop(guild_id, None)
+
+    async def get(self, guild: discord.Guild) -> types.MappingProxyType:
+        version = self.versions.get(guild.id, 0)
+        cached = self.snapshots.get(guild.id)
+        if cached and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        settings = await self.config.guild(guild).all()
+        for key in VOLATILE:
+            settings.pop(key, None)
+        snapshot = freeze(settings)
+        # Stored under the version read before the await, a bump during the read makes it stale right away
+        self.snapshots[guild.id] = (version, snapshot)
+        return snapshot
+
+    def stats(self, guild_id: int) -> dict:
+        cached = self.snapshots.get(guild_id)
+        total = self.hits + self.misses
+        return {
+            "version": self.versions.get(guild_id, 0),
+            "current": bool(cached and cached[0] == self.versions.get(guild_id, 0)),
+            "hits": self.hits,
+            "misses": self.misses,
+            "ratio": round(self.hits / total * 100, 1) if total else 0.0,
+        }
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import random
+import struct
+import typing
+
+from .rcon import (
+    MAX_PACKET_SIZE,
+    SERVERDATA_AUTH,
+    SERVERDATA_AUTH_RESPONSE,
+    SERVERDATA_RESPONSE_VALUE,
+    encode_packet,
+)
+
+log = logging.getLogger("red.vrt.arktools.simulator")
+
+NO_RESPONSE = "Server received, But no response!!"
+NO_PLAYERS = "No Players Connected"
+
+GAMERTAGS = (
+    "Vertyco", "EpicDodo", "xXSniperXx", "NoxiousGamer", "Salt", "Dino Tamer 42", "RexRider", "ChibiHunter",
+    "TekGrinder", "WyvernQueen", "BeaverDam", "Gigachad", "ParaSaur", "MegaloMike", "BulbDog", "Pteranodon"
+)
+CHARACTERS = ("Bob", "Tamer", "Mike", "Sniper", "Builder", "Breeder", "Raider", "Farmer")
+CHAT = (
+    "anyone selling kibble?", "server lag is insane rn", "is the event live?", "gg", "lmao",
+    "need help at the volcano", "who wants to trade metal", "thanks! (seriously)", "join the discord"
+)
+TRIBE_ACTIONS = (
+    "Tribemember {c} - Lvl 95 was killed by a Giganotosaurus - Lvl 300!",
+    "{c} Tamed a Raptor - Lvl 150 (Raptor)!",
+    "{c} demolished a 'Stone Wall' (Lvl 1)!",
+    "Your 'Metal Foundation' was destroyed!",
+    "{c} was added to the Tribe by {c}!",
+)
+
+
+class SimConfig:
+    """
+    Knobs for a simulated cluster
+
+    Rates are per server per minute, latency is in seconds and failure rates are the chance a
+    single command gets no reply (a timeout) or drops the connection.
+    """
+
+    def __init__(
+            self,
+            servers: int = 100,
+            players: int = 20,
+            churn: float = 6.0,
+            chat_rate: float = 30.0,
+            tribe_rate: float = 10.0,
+            latency: float = 0.02,
+            jitter: float = 0.01,
+            timeout_rate: float = 0.0,
+            drop_rate: float = 0.0,
+            password: str = "loadtest"
+    ):
+        self.servers = servers
+        self.players = players
+        self.churn = churn
+        self.chat_rate = chat_rate
+        self.tribe_rate = tribe_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.timeout_rate = timeout_rate
+        self.drop_rate = drop_rate
+        self.password = password
+
+
+class SimServer:
+    """One fake ARK map speaking Source RCON on localhost"""
+
+    def __init__(self, index: int, config: SimConfig, seed: int = None):
+        self.index = index
+        self.config = config
+        self.random = random.Random(seed if seed is not None else index)
+        self.port = 0
+        self.players: typing.List[typing.Tuple[str, str, str]] = []  # (gamertag, xuid, character)
+        self.chat: typing.List[str] = []
+        self.next_xuid = 2533274800000000 + index * 100000
+        self.commands = 0
+        self.server: typing.Optional[asyncio.AbstractServer] = None
+        self.handlers: typing.Set[asyncio.Task] = set()
+        self.writers: typing.Set[asyncio.StreamWriter] = set()
+        for _ in range(config.players):
+            self.join()
+
+    def join(self):
+        gamertag = f"{self.random.choice(GAMERTAGS)} {self.random.randint(1, 999)}"
+        self.next_xuid += 1
+        self.players.append((gamertag, str(self.next_xuid), self.random.choice(CHARACTERS)))
+
+    def tick(self, seconds: float):
+        """Advance the world, players come and go while chat and tribe logs pile up for getchat"""
+        cfg = self.config
+        for _ in range(self.events(cfg.churn, seconds)):
+            if self.players and self.random.random() < 0.5:
+                self.players.pop(self.random.randrange(len(self.players)))
+            else:
+                self.join()
+        if not self.players:
+            return
+        for _ in range(self.events(cfg.chat_rate, seconds)):
+            gamertag, _, character = self.random.choice(self.players)
+            self.chat.append(f"{gamertag} ({character}): {self.random.choice(CHAT)}")
+        for _ in range(self.events(cfg.tribe_rate, seconds)):
+            _, _, character = self.random.choice(self.players)
+            action = self.random.choice(TRIBE_ACTIONS).format(c=character)
+            day = self.random.randint(1, 9999)
+            clock = f"{self.random.randint(0, 23):02}:{self.random.randint(0, 59):02}:{self.random.randint(0, 59):02}"
+            self.chat.append(
+                f"Tribe Tribe of {character}, ID {1000000000 + self.index}: Day {day}, {clock}: "
+                f"<RichColor Color=\"1, 0, 0, 1\">{action}</>)"
+            )
+
+    def events(self, per_minute: float, seconds: float) -> int:
+        expected = per_minute * seconds / 60
+        count = int(expected)
+        if self.random.random() < expected - count:
+            count += 1
+        return count
+
+    def respond(self, command: str) -> str:
+        self.commands += 1
+        name = command.split(" ", 1)[0].lower()
+        if name == "listplayers":
+            if not self.players:
+                return f"\n {NO_PLAYERS}\n "
+            return "\n".join(f"{i}. {p[0]}, {p[1]}" for i, p in enumerate(self.players))
+        if name == "getchat":
+            if not self.chat:
+                return NO_RESPONSE
+            buffer, self.chat = "\n".join(self.chat), []
+            return buffer
+        if name == "saveworld":
+            return "World Saved"
+        return NO_RESPONSE
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        cfg = self.config
+        authed = False
+        self.writers.add(writer)
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                header = await reader.readexactly(4)
+                size = struct.unpack("<i", header)[0]
+                if size < 10 or size > MAX_PACKET_SIZE:
+                    break
+                data = await reader.readexactly(size)
+                request_id, packet_type = struct.unpack("<ii", data[:8])
+                body = data[8:-2].decode("utf-8", errors="replace")
+                if packet_type == SERVERDATA_AUTH:
+                    authed = body == cfg.password
+                    writer.write(encode_packet(request_id, SERVERDATA_RESPONSE_VALUE, ""))
+                    writer.write(encode_packet(request_id if authed else -1, SERVERDATA_AUTH_RESPONSE, ""))
+                    await writer.drain()
+                    continue
+                if not authed:
+                    break
+                roll = self.random.random()
+                if roll < cfg.drop_rate:
+                    break
+                if roll < cfg.drop_rate + cfg.timeout_rate:
+                    continue
+                asyncio.create_task(self.reply(writer, request_id, body))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def reply(self, writer: asyncio.StreamWriter, request_id: int, command: str):
+        cfg = self.config
+        delay = max(0.0, cfg.latency + self.random.uniform(-cfg.jitter, cfg.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if writer.is_closing():
+            return
+        writer.write(encode_packet(request_id, SERVERDATA_RESPONSE_VALUE, self.respond(command)))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def close(self):
+        if self.server:
+            self.server.close()
+        for writer in self.writers:
+            writer.close()
+
+
+class SimCluster:
+    """A set of simulated maps, plus the task that keeps their worlds moving"""
+
+    def __init__(self, config: SimConfig, tick: float = 1.0):
+        self.config = config
+        self.tick_interval = tick
+        self.maps = [SimServer(i, config) for i in range(config.servers)]
+        self.ticker: typing.Optional[asyncio.Task] = None
+
+    async def start(self):
+        await asyncio.gather(*(m.start() for m in self.maps))
+        self.ticker = asyncio.create_task(self.run(), name="ArkTools-Simulator")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            for m in self.maps:
+                m.tick(self.tick_interval)
+
+    def servers(self) -> typing.List[dict]:
+        """Server dicts shaped like the ones in the config, pointing at the simulated maps"""
+        return [
+            {
+                "name": f"sim{m.index}",
+                "cluster": "loadtest",
+                "ip": "127.0.0.1",
+                "port": m.port,
+                "password": self.config.password,
+                # Negative so they can never collide with a real channel id
+                "chatchannel": -(m.index + 1),
+            }
+            for m in self.maps
+        ]
+
+    @property
+    def commands(self) -> int:
+        return sum(m.commands for m in self.maps)
+
+    def close(self):
+        if self.ticker:
+            self.ticker.cancel()
+        for m in self.maps:
+            m.close()
+
+    async def stop(self):
+        """Close everything and wait for the connection handlers to wind down"""
+        self.close()
+        handlers = [task for m in self.maps for task in m.handlers]
+        if handlers:
+            await asyncio.wait(handlers, timeout=5)
@@ -0,0 +1,279 @@
+import asyncio
+import collections
+import json
+import logging
+import pathlib
+import typing
+
+from .outbound import TokenBucket
+
+log = logging.getLogger("red.vrt.arktools.social")
+
+FRIEND = "friend"
+UNFRIEND = "unfriend"
+BLOCK = "block"
+UNBLOCK = "unblock"
+MESSAGE = "message"
+
+# Which rate limited Xbox Live service each action hits
+ENDPOINTS = {
+    FRIEND: "social",
+    UNFRIEND: "social",
+    BLOCK: "privacy",
+    UNBLOCK: "privacy",
+    MESSAGE: "message",
+}
+# (requests per second, burst) per host gamertag and service
+LIMITS = {
+    "social": (0.5, 10),
+    "privacy": (0.5, 10),
+    "message": (0.2, 5),
+}
+# Jobs running at once for a single host gamertag
+CONCURRENCY = 3
+# Attempts before a job that keeps getting rate limited or erroring is given up on
+MAX_TRIES = 5
+# Backoff when Xbox Live says slow down without a Retry-After
+DEFAULT_RETRY = 30
+# While a host has no valid token its worker checks again after this long, doubling up to the max
+NO_TOKEN_RETRY = 300
+NO_TOKEN_MAX = 3600
+
+
+class SocialJob:
+    def __init__(
+            self,
+            guild_id: int,
+            cname: str,
+            sname: str,
+            action: str,
+            xuid: str,
+            gamertag: str = "",
+            text: str = "",
+            reason: str = "",
+            expire: bool = False,
+            tries: int = 0
+    ):
+        self.guild_id = guild_id
+        self.cname = cname
+        self.sname = sname
+        self.action = action
+        self.xuid = str(xuid)
+        self.gamertag = gamertag
+        # Message body for MESSAGE jobs, or the message to send once a friend/unfriend goes through
+        self.text = text
+        # Why this is happening, for the event log
+        self.reason = reason
+        # Clear the player's last seen map once this is done, for inactivity unfriends
+        self.expire = expire
+        self.tries = tries
+
+    @property
+    def host(self) -> typing.Tuple[int, str, str]:
+        return self.guild_id, self.cname, self.sname
+
+    @property
+    def key(self) -> tuple:
+        return self.host + (self.action, self.xuid)
+
+    def to_dict(self) -> dict:
+        return {
+            "guild_id": self.guild_id, "cname": self.cname, "sname": self.sname, "action": self.action,
+            "xuid": self.xuid, "gamertag": self.gamertag, "text": self.text, "reason": self.reason,
+            "expire": self.expire, "tries": self.tries
+        }
+
+
+class SocialResult(typing.NamedTuple):
+    job: SocialJob
+    ok: bool
+    status: typing.Union[int, str]
+
+
+class SocialQueue:
+    """
+    Friend, unfriend, block, unblock and message jobs, worked through per host gamertag
+
+    Each host has its own FIFO and worker running a few jobs at once, with a token bucket per
+    Xbox Live service so friend list changes and messages are paced separately. A 429 puts the job
+    back and empties that bucket for Retry-After. Pending jobs are saved so they survive a reload,
+    and each host's results are handed to `report` in one batch once its queue runs dry.
+    """
+
+    def __init__(
+            self,
+            path: pathlib.Path,
+            run: typing.Callable[[typing.Any, str, SocialJob], typing.Awaitable[typing.Tuple[int, float]]],
+            auth: typing.Callable[[SocialJob], typing.Awaitable[tuple]],
+            report: typing.Callable[[typing.Tuple[int, str, str], typing.List[SocialResult]], typing.Awaitable]
+    ):
+        self.path = path
+        self.run = run
+        self.auth = auth
+        self.report = report
+        self.queues: typing.Dict[tuple, typing.Deque[SocialJob]] = {}
+        self.pending: typing.Dict[tuple, SocialJob] = {}  # Job key -> job, queued or running
+        self.workers: typing.Dict[tuple, asyncio.Task] = {}
+        self.buckets: typing.Dict[tuple, TokenBucket] = {}
+        self.saving: typing.Optional[asyncio.Task] = None
+        self.done = 0
+        self.limited = 0
+
+    def put(self, job: SocialJob) -> bool:
+        """Queue a job, returns False if the same one is already waiting"""
+        if job.key in self.pending:
+            return False
+        self.pending[job.key] = job
+        self.queues.setdefault(job.host, collections.deque()).append(job)
+        self.start(job.host)
+        self.save()
+        return True
+
+    def start(self, host: tuple):
+        if host in self.workers:
+            return
+        name = f"ArkTools-Social-{host[2]}-{host[1]}"
+        self.workers[host] = asyncio.create_task(self.drain(host), name=name)
+
+    def bucket(self, host: tuple, action: str) -> TokenBucket:
+        endpoint = ENDPOINTS[action]
+        key = host + (endpoint,)
+        if key not in self.buckets:
+            rate, burst = LIMITS[endpoint]
+            self.buckets[key] = TokenBucket(rate, burst)
+        return self.buckets[key]
+
+    async def drain(self, host: tuple):
+        queue = self.queues[host]
+        results = []
+        try:
+            client, token = await self.auth(queue[0])
+            if not token:
+                log.info(f"Social queue for {host[2]} {host[1]} has no valid token, {len(queue)} jobs waiting")
+            # The worker stays up while the tokens are bad, so jobs put in meanwhile wait here instead of
+            # being turned away as duplicates, and everything goes out once the host is re-authorized
+            retry = NO_TOKEN_RETRY
+            while not token:
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, NO_TOKEN_MAX)
+                client, token = await self.auth(queue[0])
+            sem = asyncio.Semaphore(CONCURRENCY)
+            running = set()
+            while queue or running:
+                if not queue:
+                    await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    running = {t for t in running if not t.done()}
+                    continue
+                job = queue.popleft()
+                await sem.acquire()
+                task = asyncio.create_task(self.work(sem, client, token, job, results))
+                running.add(task)
+                running = {t for t in running if not t.done()}
+        except Exception as e:
+            log.warning(f"Social queue for {host[2]} {host[1]} failed: {e}", exc_info=e)
+        finally:
+            self.workers.pop(host, None)
+            self.save()
+            if results:
+                try:
+                    await self.report(host, results)
+                except Exception as e:
+                    log.warning(f"Social queue report for {host[2]} {host[1]} failed: {e}")
+
+    async def work(self, sem: asyncio.Semaphore, client, token: str, job: SocialJob, results: list):
+        try:
+            delay = self.bucket(job.host, job.action).delay()
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                status, retry_after = await self.run(client, token, job)
+            except Exception as e:
+                status, retry_after = str(e), DEFAULT_RETRY if "Too Many Requests" in str(e) else 0
+            job.tries += 1
+            if status == 429 or retry_after:
+                self.limited += 1
+                self.bucket(job.host, job.action).pause(retry_after or DEFAULT_RETRY)
+                if job.tries < MAX_TRIES:
+                    self.queues[job.host].append(job)
+                    return
+            ok = isinstance(status, int) and 200 <= status <= 204
+            self.pending.pop(job.key, None)
+            self.done += 1
+            results.append(SocialResult(job, ok, status))
+            # Welcome and goodbye messages only go out once the friend list change went through
+            if ok and job.text and job.action != MESSAGE:
+                self.put(SocialJob(*job.host, MESSAGE, job.xuid, job.gamertag, job.text))
+        finally:
+            sem.release()
+
+    def stats(self, guild_id: int) -> typing.List[list]:
+        rows = []
+        for host, queue in self.queues.items():
+            if host[0] != guild_id or (not queue and host not in self.workers):
+                continue
+            counts = collections.Counter(job.action for job in queue)
+            waiting = ", ".join(f"{action} {count}" for action, count in counts.items())
+            rows.append([f"{host[2]} {host[1]}", len(queue), waiting or "-", "Yes" if host in self.workers else "No"])
+        return rows
+
+    def dump(self) -> list:
+        return [job.to_dict() for job in self.pending.values()]
+
+    def write(self, data: list):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data))
+        tmp.replace(self.path)
+
+    def read(self) -> list:
+        if not self.path.exists():
+            return []
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Failed to read pending social jobs: {e}")
+            return []
+
+    async def load(self):
+        data = await asyncio.get_running_loop().run_in_executor(None, self.read)
+        for entry in data:
+            self.put(SocialJob(**entry))
+        if data:
+            log.info(f"Resumed {len(data)} pending social jobs")
+
+    def save(self):
+        if self.saving and not self.saving.done():
+            return
+        self.saving = asyncio.create_task(self.flush(), name="ArkTools-SocialSave")
+
+    async def flush(self):
+        await asyncio.sleep(1)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write, self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save pending social jobs: {e}")
+
+    def close(self):
+        for task in self.workers.values():
+            task.cancel()
+        self.workers.clear()
+        # Whatever was still pending is picked back up on load
+        try:
+            self.write(self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save pending social jobs: {e}")
+
+
+def chunked(lines: typing.List[str], size: int = 3900) -> typing.Iterator[str]:
+    """Join lines into blocks that fit in an embed description"""
+    block = []
+    length = 0
+    for line in lines:
+        if block and length + len(line) + 1 > size:
+            yield "\n".join(block)
+            block = []
+            length = 0
+        block.append(line)
+        length += len(line) + 1
+    if block:
+        yield "\n".join(block)
+
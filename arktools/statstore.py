@@ -0,0 +1,141 @@
+import json
+import logging
+import time
+import typing
+
+import discord
+
+log = logging.getLogger("red.vrt.arktools.statstore")
+
+
+def blank_ingame() -> dict:
+    return {
+        "implant": None,
+        "name": None,
+        "previous_names": [],
+        "stats": {
+            "pvpkills": 0,
+            "pvpdeaths": 0,
+            "pvedeaths": 0,
+            "tamed": 0
+        }
+    }
+
+
+class PendingPlayer:
+    """Unsaved stat changes for a single player"""
+    __slots__ = ("playtime", "total", "lastseen", "rank", "ingame")
+
+    def __init__(self):
+        self.playtime: typing.Dict[str, int] = {}  # Map string -> seconds to add
+        self.total = 0
+        self.lastseen: typing.Optional[dict] = None
+        self.rank: typing.Optional[int] = None
+        self.ingame: typing.Set[str] = set()  # Server ids that need a blank in-game profile
+
+    def absorb(self, other: "PendingPlayer"):
+        """Merge older changes back in (used when a flush fails)"""
+        for mapstring, seconds in other.playtime.items():
+            self.playtime[mapstring] = self.playtime.get(mapstring, 0) + seconds
+        self.total += other.total
+        self.lastseen = self.lastseen or other.lastseen
+        self.rank = self.rank if self.rank is not None else other.rank
+        self.ingame |= other.ingame
+
+    def apply(self, player: dict):
+        for server_id in self.ingame:
+            if server_id not in player["ingame"]:
+                player["ingame"][server_id] = blank_ingame()
+        for mapstring, seconds in self.playtime.items():
+            player["playtime"][mapstring] = player["playtime"].get(mapstring, 0) + seconds
+        player["playtime"]["total"] += self.total
+        if self.lastseen:
+            player["lastseen"] = self.lastseen
+        if self.rank is not None:
+            player["rank"] = self.rank
+
+
+class FlushReport:
+    __slots__ = ("records", "skipped", "duration", "size", "timestamp")
+
+    def __init__(self, records: int, skipped: int, duration: float, size: int):
+        self.records = records
+        self.skipped = skipped  # Players deleted (or malformed) before their changes were saved
+        self.duration = duration
+        self.size = size  # Bytes of player data re-serialized by the write
+        self.timestamp = time.time()
+
+
+class StatStore:
+    """
+    Write-behind buffer for playtime, last seen and per-map player data
+
+    The player_stats loop records changes here, then everything for a guild is written
+    in a single transaction instead of one per online player.
+    """
+
+    def __init__(self, storage: typing.Callable):
+        # Returns the players value for a guild, see ArkTools.playerdata
+        self.storage = storage
+        self.dirty: typing.Dict[int, typing.Dict[str, PendingPlayer]] = {}
+        self.reports: typing.Dict[int, FlushReport] = {}
+
+    def pending(self, guild_id: int) -> int:
+        return len(self.dirty.get(guild_id, {}))
+
+    def record(self, guild_id: int, xuid: str) -> PendingPlayer:
+        return self.dirty.setdefault(guild_id, {}).setdefault(xuid, PendingPlayer())
+
+    def view(self, guild_id: int, xuid: str, stored: dict) -> dict:
+        """Stored player data with any unsaved changes applied on top of it"""
+        pending = self.dirty.get(guild_id, {}).get(xuid)
+        if not pending:
+            return stored
+        player = dict(stored)
+        player["playtime"] = dict(stored["playtime"])
+        player["ingame"] = dict(stored["ingame"])
+        pending.apply(player)
+        return player
+
+    async def flush(self, guild: discord.Guild) -> typing.Optional[FlushReport]:
+        dirty = self.dirty.pop(guild.id, None)
+        if not dirty:
+            return None
+        t1 = time.monotonic()
+        skipped = 0
+        try:
+            async with self.storage(guild, list(dirty)) as players:
+                for xuid, pending in dirty.items():
+                    if xuid not in players:
+                        skipped += 1
+                        continue
+                    try:
+                        pending.apply(players[xuid])
+                    except (KeyError, TypeError) as e:
+                        # Malformed record, the config cleanup command will sort it out
+                        log.warning(f"Skipping stats for {xuid} in {guild.name}: {e}")
+                        skipped += 1
+                size = len(json.dumps(players))
+        except Exception as e:
+            log.warning(f"Failed to save player stats for {guild.name}, will retry next flush", exc_info=e)
+            # Anything recorded while the flush was running is newer, so merge the old changes into it
+            current = self.dirty.setdefault(guild.id, {})
+            for xuid, pending in dirty.items():
+                if xuid in current:
+                    current[xuid].absorb(pending)
+                else:
+                    current[xuid] = pending
+            return None
+        report = FlushReport(len(dirty) - skipped, skipped, time.monotonic() - t1, size)
+        self.reports[guild.id] = report
+        log.debug(f"Flushed {report.records} player records for {guild.name} "
+                  f"in {round(report.duration * 1000)}ms ({report.size} bytes)")
+        return report
+
+    async def flush_all(self, bot):
+        for guild_id in list(self.dirty.keys()):
+            guild = bot.get_guild(guild_id)
+            if not guild:
+                self.dirty.pop(guild_id, None)
+                continue
+            await self.flush(guild)
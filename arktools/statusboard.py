@@ -0,0 +1,174 @@
+import hashlib
+import io
+import logging
+import time
+import typing
+
+import discord
+
+log = logging.getLogger("red.vrt.arktools.statusboard")
+
+# Shortest time between graph uploads, the status loop runs every 2 minutes
+GRAPH_REFRESH = 120
+# A graph is re-uploaded once its window has moved by about this much of its width
+GRAPH_STEP = 60
+
+
+def signature(embed: discord.Embed) -> dict:
+    """What a status page shows, without the parts that change on every send"""
+    data = embed.to_dict()
+    for key in ("timestamp", "color", "image"):
+        data.pop(key, None)
+    return data
+
+
+class StatusBoard:
+    """
+    The live status message(s) of a guild
+
+    Pages are edited in place and only when what they show has changed. Message edits can't
+    replace an attachment, so the last page (which carries the graph) is the only one that ever
+    gets re-sent, and only when a new graph is due or the number of pages changed.
+    """
+
+    def __init__(self, channel_id: int, message_ids: typing.List[int]):
+        self.channel_id = channel_id
+        self.message_ids = message_ids
+        self.messages: typing.List[discord.Message] = []
+        self.signatures: typing.List[typing.Optional[dict]] = []
+        self.loaded = False
+        # Status key the current pages were built from
+        self.state = None
+        self.status = ""
+        self.totalplayers = 0
+        self.thumbnail = None
+        self.updated = None
+        self.color = discord.Color.random()
+        self.graph_png = None
+        self.graph_digest = None
+        self.graph_url = None
+        self.graph_sent = 0.0
+        # REST calls made and ticks that needed none
+        self.edits = 0
+        self.sends = 0
+        self.deletes = 0
+        self.skipped = 0
+
+    def graph_due(self, hours: int) -> bool:
+        interval = max(GRAPH_REFRESH, hours * 3600 / GRAPH_STEP)
+        return time.monotonic() - self.graph_sent >= interval
+
+    def changed(self, state) -> bool:
+        if state == self.state:
+            return False
+        self.state = state
+        self.color = discord.Color.random()
+        return True
+
+    async def load(self, channel: discord.TextChannel):
+        """Pick the messages from the last run back up so a restart doesn't repost the status"""
+        self.loaded = True
+        messages = []
+        for message_id in self.message_ids:
+            try:
+                messages.append(await channel.fetch_message(message_id))
+            except (discord.NotFound, discord.Forbidden):
+                # Half a page set is no use, delete what's left and start over
+                await self.delete(messages)
+                return
+        self.messages = messages
+        # Unknown contents, every page gets edited once
+        self.signatures = [None] * len(messages)
+        if messages and messages[-1].embeds and messages[-1].embeds[0].image:
+            self.graph_url = messages[-1].embeds[0].image.url
+
+    async def delete(self, messages: typing.List[discord.Message]):
+        for message in messages:
+            try:
+                await message.delete()
+                self.deletes += 1
+            except discord.NotFound:  # Message could have already been deleted
+                continue
+            except discord.Forbidden:  # User could have imported config from another bot
+                log.warning(f"Cannot delete status message in {message.channel.name}")
+            except discord.HTTPException as e:
+                log.warning(f"Status Cleanup: {e}")
+
+    async def clear(self, channel: typing.Optional[discord.TextChannel]):
+        """Remove the pages, used when the status channel changes"""
+        if channel and not self.loaded:
+            await self.load(channel)
+        await self.delete(self.messages)
+        self.messages = []
+        self.signatures = []
+
+    async def sync(
+            self,
+            channel: discord.TextChannel,
+            embeds: typing.List[discord.Embed],
+            png: typing.Optional[bytes]
+    ) -> bool:
+        """
+        Reconcile the posted pages with the new ones
+
+        png is only passed when a new graph is due, otherwise the one already posted is kept.
+        Returns True if the message ids changed and need saving.
+        """
+        if not self.loaded:
+            await self.load(channel)
+        digest = hashlib.sha1(png).hexdigest() if png else None
+        new_graph = digest is not None and digest != self.graph_digest
+        if digest and not new_graph:
+            # Rendered but nothing visible moved, check again after the next interval
+            self.graph_sent = time.monotonic()
+
+        if len(self.messages) == len(embeds):
+            keep = len(embeds) - 1 if new_graph else len(embeds)
+        else:
+            # Pages are only ever added or removed at the end, the graph page goes last
+            keep = max(min(len(self.messages), len(embeds)) - 1, 0)
+        try:
+            for i in range(keep):
+                if i == len(embeds) - 1 and self.graph_url:
+                    embeds[i].set_image(url=self.graph_url)
+                sig = signature(embeds[i])
+                if sig == self.signatures[i]:
+                    continue
+                await self.messages[i].edit(embed=embeds[i])
+                self.signatures[i] = sig
+                self.edits += 1
+        except (discord.NotFound, discord.Forbidden):
+            # Someone deleted a page (or it isn't ours), repost the whole set
+            keep = 0
+
+        await self.delete(self.messages[keep:])
+        self.messages = self.messages[:keep]
+        self.signatures = self.signatures[:keep]
+        if keep == len(embeds):
+            return False
+
+        for i in range(keep, len(embeds)):
+            embed = embeds[i]
+            file = None
+            if i == len(embeds) - 1:
+                if png is None:
+                    # Page count changed between graph refreshes, post the current graph again
+                    png = self.graph_png
+                if png:
+                    embed.set_image(url="attachment://plot.png")
+                    file = discord.File(io.BytesIO(png), filename="plot.png")
+            message = await channel.send(embed=embed, file=file)
+            self.sends += 1
+            self.messages.append(message)
+            self.signatures.append(signature(embed))
+            if file:
+                self.graph_png = png
+                self.graph_digest = hashlib.sha1(png).hexdigest()
+                self.graph_sent = time.monotonic()
+                self.graph_url = None
+                if message.embeds and message.embeds[0].image:
+                    self.graph_url = message.embeds[0].image.url
+                if (not self.graph_url or self.graph_url.startswith("attachment://")) and message.attachments:
+                    self.graph_url = message.attachments[0].url
+        self.message_ids = [m.id for m in self.messages]
+        return True
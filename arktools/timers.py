@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+import math
+import pathlib
+import threading
+import time
+import typing
+
+log = logging.getLogger("red.vrt.arktools.timers")
+
+# Width of a wheel slot in seconds, timers fire at most this long after they expire
+RESOLUTION = 0.5
+
+
+class Timer:
+    __slots__ = ("kind", "key", "expires", "data", "persist", "slot")
+
+    def __init__(self, kind: str, key: str, expires: float, data: typing.Any = None, persist: bool = True):
+        self.kind = kind
+        self.key = key
+        self.expires = expires  # Unix time
+        self.data = data
+        self.persist = persist
+        self.slot = 0
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "key": self.key, "expires": self.expires, "data": self.data}
+
+
+class TimerWheel:
+    """
+    One-shot timers for vote sessions and cooldowns, shared by the whole cog
+
+    Timers are hashed into slots RESOLUTION seconds wide and each slot with anything in it has a
+    single loop.call_at handle, so inserting into or cancelling from a slot is a dict operation and
+    nothing wakes up until a slot is due. Each kind of timer has a callback that gets the timer when
+    it fires. Timers scheduled with persist are saved with their wall clock expiry and re-armed on
+    load, ones that ran out while the cog was unloaded fire as soon as they're loaded.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.timers: typing.Dict[typing.Tuple[str, str], Timer] = {}
+        self.slots: typing.Dict[int, typing.Dict[typing.Tuple[str, str], Timer]] = {}
+        self.handles: typing.Dict[int, asyncio.TimerHandle] = {}
+        self.callbacks: typing.Dict[str, typing.Callable[[Timer], typing.Any]] = {}
+        self.saving: typing.Optional[asyncio.Task] = None
+        # Held while timers.json is replaced, so the write on unload waits for one still running in the executor
+        self.lock = threading.Lock()
+        self.fired = 0
+
+    def register(self, kind: str, callback: typing.Callable[[Timer], typing.Any]):
+        """What to call when a timer of this kind fires, coroutine functions are run as tasks"""
+        self.callbacks[kind] = callback
+
+    def schedule(self, kind: str, key: str, expires: float, data: typing.Any = None, persist: bool = True) -> Timer:
+        """Arm a timer for `expires` (unix time), replacing any with the same kind and key"""
+        self.cancel(kind, key)
+        timer = Timer(kind, key, expires, data, persist)
+        loop = asyncio.get_running_loop()
+        due = loop.time() + max(0.0, expires - time.time())
+        timer.slot = math.ceil(due / RESOLUTION)
+        self.timers[(kind, key)] = timer
+        slot = self.slots.get(timer.slot)
+        if slot is None:
+            slot = self.slots[timer.slot] = {}
+            self.handles[timer.slot] = loop.call_at(timer.slot * RESOLUTION, self.tick, timer.slot)
+        slot[(kind, key)] = timer
+        if persist:
+            self.save()
+        return timer
+
+    def cancel(self, kind: str, key: str) -> bool:
+        timer = self.timers.pop((kind, key), None)
+        if timer is None:
+            return False
+        slot = self.slots.get(timer.slot)
+        if slot is not None:
+            slot.pop((kind, key), None)
+            if not slot:
+                del self.slots[timer.slot]
+                self.handles.pop(timer.slot).cancel()
+        if timer.persist:
+            self.save()
+        return True
+
+    def get(self, kind: str, key: str) -> typing.Optional[Timer]:
+        return self.timers.get((kind, key))
+
+    def remaining(self, kind: str, key: str) -> float:
+        """Seconds left on a timer, 0 if there isn't one"""
+        timer = self.timers.get((kind, key))
+        if timer is None:
+            return 0.0
+        return max(0.0, timer.expires - time.time())
+
+    def tick(self, index: int):
+        self.handles.pop(index, None)
+        slot = self.slots.pop(index, {})
+        persisted = False
+        for key, timer in slot.items():
+            self.timers.pop(key, None)
+            persisted = persisted or timer.persist
+            self.fire(timer)
+        if persisted:
+            self.save()
+
+    def fire(self, timer: Timer):
+        self.fired += 1
+        callback = self.callbacks.get(timer.kind)
+        if callback is None:
+            return
+        try:
+            result = callback(timer)
+            if asyncio.iscoroutine(result):
+                asyncio.create_task(result, name=f"ArkTools-Timer-{timer.kind}")
+        except Exception as e:
+            log.warning(f"{timer.kind} timer {timer.key} failed: {e}", exc_info=e)
+
+    def counts(self) -> typing.Dict[str, int]:
+        counts = {}
+        for kind, _ in self.timers:
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+    def dump(self) -> list:
+        return [timer.to_dict() for timer in self.timers.values() if timer.persist]
+
+    def write(self, data: list):
+        with self.lock:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data))
+            tmp.replace(self.path)
+
+    def read(self) -> list:
+        if not self.path.exists():
+            return []
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            log.warning(f"Failed to read pending timers: {e}")
+            return []
+
+    async def load(self):
+        data = await asyncio.get_running_loop().run_in_executor(None, self.read)
+        for entry in data:
+            if (entry["kind"], entry["key"]) not in self.timers:
+                self.schedule(**entry)
+        if data:
+            log.info(f"Restored {len(data)} pending timers")
+
+    def save(self):
+        if self.saving and not self.saving.done():
+            return
+        self.saving = asyncio.create_task(self.flush(), name="ArkTools-TimerSave")
+
+    async def flush(self):
+        await asyncio.sleep(5)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write, self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save pending timers: {e}")
+
+    def close(self):
+        # A pending save would overwrite the final write below with an older dump
+        if self.saving:
+            self.saving.cancel()
+        for handle in self.handles.values():
+            handle.cancel()
+        self.handles.clear()
+        try:
+            self.write(self.dump())
+        except OSError as e:
+            log.warning(f"Failed to save pending timers: {e}")
@@ -0,0 +1,453 @@
+import array
+import asyncio
+import datetime
+import functools
+import json
+import logging
+import os
+import shutil
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("red.vrt.arktools.timeseries")
+
+TYPECODE = "I"  # Unsigned 32 bit, epoch seconds fit until 2106
+ITEM = array.array(TYPECODE).itemsize
+RECORD = ITEM * 2  # (timestamp, player count)
+
+# Bucket width of each tier in seconds, the minute tier holds the raw samples
+TIERS = {"minute": 60, "hour": 3600, "day": 86400}
+# Rollups keep the peak player count of each bucket, a year of hours and ten years of days
+ROLLUP_CAPACITY = {"hour": 24 * 365, "day": 365 * 10}
+# A file is rewritten from its ring once it holds this many times the ring's capacity
+COMPACT_FACTOR = 2
+# Series index of the total across all clusters, clusters are numbered from 1
+TOTAL = 0
+
+
+def record(timestamp: int, value: int) -> bytes:
+    return array.array(TYPECODE, (timestamp, value)).tobytes()
+
+
+def empty() -> array.array:
+    return array.array(TYPECODE)
+
+
+class Ring:
+    """Fixed capacity circular buffer of (timestamp, value) pairs, oldest entries get overwritten"""
+    __slots__ = ("capacity", "times", "values", "start", "size")
+
+    def __init__(self, capacity: int):
+        self.capacity = max(int(capacity), 1)
+        self.times = array.array(TYPECODE, bytes(self.capacity * ITEM))
+        self.values = array.array(TYPECODE, bytes(self.capacity * ITEM))
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, timestamp: int, value: int):
+        i = (self.start + self.size) % self.capacity
+        self.times[i] = timestamp
+        self.values[i] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def time_at(self, i: int) -> int:
+        return self.times[(self.start + i) % self.capacity]
+
+    def first(self) -> typing.Optional[int]:
+        return self.time_at(0) if self.size else None
+
+    def last(self) -> typing.Optional[int]:
+        return self.time_at(self.size - 1) if self.size else None
+
+    def bisect(self, timestamp: int) -> int:
+        """Position of the first entry at or after the timestamp"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.time_at(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def slice(self, lo: int, hi: int) -> typing.Tuple[array.array, array.array]:
+        n = hi - lo
+        if n <= 0:
+            return empty(), empty()
+        a = (self.start + lo) % self.capacity
+        end = a + n
+        if end <= self.capacity:
+            return self.times[a:end], self.values[a:end]
+        end -= self.capacity
+        return self.times[a:] + self.times[:end], self.values[a:] + self.values[:end]
+
+    def window(self, since: int) -> typing.Tuple[array.array, array.array]:
+        return self.slice(self.bisect(since), self.size)
+
+    def load(self, data: bytes):
+        """Fill an empty ring from file records, keeping the newest ones that fit"""
+        pairs = empty()
+        pairs.frombytes(data[:len(data) - len(data) % RECORD])
+        times, values = pairs[0::2], pairs[1::2]
+        n = min(len(times), self.capacity)
+        self.times[0:n] = times[len(times) - n:]
+        self.values[0:n] = values[len(values) - n:]
+        self.start = 0
+        self.size = n
+
+    def to_bytes(self) -> bytes:
+        times, values = self.slice(0, self.size)
+        pairs = array.array(TYPECODE, bytes(self.size * RECORD))
+        pairs[0::2] = times
+        pairs[1::2] = values
+        return pairs.tobytes()
+
+    def resized(self, capacity: int) -> "Ring":
+        ring = Ring(capacity)
+        ring.load(self.to_bytes())
+        return ring
+
+
+class Series:
+    """
+    Player count history for a cluster (or the total) at every resolution
+
+    Each tier is a ring in memory and an append-only file on disk. Rollup buckets are only
+    written once they close, the bucket still being filled is rebuilt from the raw samples on load.
+    """
+
+    def __init__(self, folder: str, index: int, capacity: int):
+        self.paths = {tier: os.path.join(folder, f"{index}.{tier}") for tier in TIERS}
+        self.rings = {"minute": Ring(capacity)}
+        for tier, size in ROLLUP_CAPACITY.items():
+            self.rings[tier] = Ring(size)
+        # Tier -> [bucket start, peak] for the bucket still being filled
+        self.open: typing.Dict[str, typing.Optional[list]] = {tier: None for tier in ROLLUP_CAPACITY}
+        # Records in each file, compared against the ring capacity to know when to compact
+        self.written = {tier: 0 for tier in TIERS}
+
+    def load(self):
+        for tier, path in self.paths.items():
+            if not os.path.exists(path):
+                continue
+            ring = self.rings[tier]
+            records = os.path.getsize(path) // RECORD
+            keep = min(records, ring.capacity)
+            # Only the tail that fits in the ring is read
+            with open(path, "rb") as file:
+                file.seek((records - keep) * RECORD)
+                ring.load(file.read(keep * RECORD))
+            self.written[tier] = records
+        self.reopen()
+
+    def reopen(self):
+        minute = self.rings["minute"]
+        last = minute.last()
+        if last is None:
+            return
+        for tier in ROLLUP_CAPACITY:
+            start = last - last % TIERS[tier]
+            closed = self.rings[tier].last()
+            if closed is not None and closed >= start:
+                continue
+            _, values = minute.window(start)
+            self.open[tier] = [start, max(values)]
+
+    def append(self, timestamp: int, value: int) -> typing.Dict[str, typing.Tuple[str, bytes]]:
+        """Add a raw sample, returns tier -> (file mode, data) for whatever needs writing"""
+        minute = self.rings["minute"]
+        last = minute.last()
+        if last is not None and timestamp <= last:
+            # Clock went backwards, rings must stay sorted
+            return {}
+        minute.append(timestamp, value)
+        writes = {"minute": self.written_record("minute", record(timestamp, value))}
+        for tier in ROLLUP_CAPACITY:
+            start = timestamp - timestamp % TIERS[tier]
+            bucket = self.open[tier]
+            if bucket and bucket[0] == start:
+                bucket[1] = max(bucket[1], value)
+                continue
+            if bucket:
+                self.rings[tier].append(*bucket)
+                writes[tier] = self.written_record(tier, record(*bucket))
+            self.open[tier] = [start, value]
+        return writes
+
+    def written_record(self, tier: str, data: bytes) -> typing.Tuple[str, bytes]:
+        ring = self.rings[tier]
+        if self.written[tier] + 1 > ring.capacity * COMPACT_FACTOR:
+            # Replace the file with what is left in the ring instead of appending forever
+            self.written[tier] = len(ring)
+            return "wb", ring.to_bytes()
+        self.written[tier] += 1
+        return "ab", data
+
+    def rewrite(self) -> typing.Dict[str, typing.Tuple[str, bytes]]:
+        writes = {}
+        for tier, ring in self.rings.items():
+            self.written[tier] = len(ring)
+            writes[tier] = ("wb", ring.to_bytes())
+        return writes
+
+    def resize(self, capacity: int) -> typing.Dict[str, typing.Tuple[str, bytes]]:
+        self.rings["minute"] = self.rings["minute"].resized(capacity)
+        self.written["minute"] = len(self.rings["minute"])
+        return {"minute": ("wb", self.rings["minute"].to_bytes())}
+
+    def window(self, tier: str, since: int) -> typing.Tuple[array.array, array.array]:
+        if tier != "minute":
+            since -= since % TIERS[tier]
+        times, values = self.rings[tier].window(since)
+        bucket = self.open.get(tier)
+        if bucket and bucket[0] >= since:
+            times.append(bucket[0])
+            values.append(bucket[1])
+        return times, values
+
+    def first(self) -> typing.Optional[int]:
+        first = self.rings["minute"].first()
+        for tier in ROLLUP_CAPACITY:
+            start = self.rings[tier].first()
+            # Bucket starts are rounded down, only trust them once the raw samples have rolled past them
+            if start is not None and (first is None or start + TIERS[tier] <= first):
+                first = start
+        return first
+
+    def write(self, writes: typing.Dict[str, typing.Tuple[str, bytes]]):
+        for tier, (mode, data) in writes.items():
+            path = self.paths[tier]
+            if mode == "ab":
+                with open(path, "ab") as file:
+                    file.write(data)
+                continue
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as file:
+                file.write(data)
+            os.replace(tmp, path)
+
+
+class GraphWindow:
+    """Player counts for one graph, each line has its own timestamps"""
+    __slots__ = ("tier", "span", "latest", "total", "clusters")
+
+    def __init__(self, tier: str, span: int, latest: int, total: tuple, clusters: dict):
+        self.tier = tier
+        self.span = span  # Seconds of history this window actually covers
+        self.latest = latest  # Newest raw sample, rollup buckets keep changing until they close
+        self.total = total
+        self.clusters = clusters
+
+
+class GuildGraph:
+    def __init__(self, folder: str, days: int):
+        self.folder = folder
+        self.capacity = max(int(days), 1) * 1440
+        # Cluster name -> series index
+        self.names: typing.Dict[str, int] = {}
+        self.series: typing.Dict[int, Series] = {}
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.folder, "series.json")
+
+    def load(self):
+        os.makedirs(self.folder, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as file:
+                self.names = json.load(file)
+        for index in [TOTAL, *self.names.values()]:
+            series = Series(self.folder, index, self.capacity)
+            series.load()
+            self.series[index] = series
+
+    def save_names(self, names: dict):
+        tmp = f"{self.index_path}.tmp"
+        with open(tmp, "w") as file:
+            json.dump(names, file)
+        os.replace(tmp, self.index_path)
+
+    def get(self, cluster: str = None) -> typing.Optional[Series]:
+        if cluster is None:
+            return self.series.get(TOTAL)
+        return self.series.get(self.names.get(cluster))
+
+    def add(self, cluster: str) -> Series:
+        index = max([TOTAL, *self.names.values()]) + 1
+        self.names[cluster] = index
+        series = Series(self.folder, index, self.capacity)
+        self.series[index] = series
+        return series
+
+
+class GraphStore:
+    """
+    Player count history for the server graphs
+
+    Samples are kept in fixed size rings per cluster, so old data falls off on its own
+    instead of being pruned. Disk I/O runs on a single worker thread, the rings are only
+    touched from the event loop.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.guilds: typing.Dict[int, GuildGraph] = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ArkToolsGraph")
+
+    async def run(self, func: typing.Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def folder(self, guild_id: int) -> str:
+        return os.path.join(self.path, str(guild_id))
+
+    async def load(self, guild_id: int, days: int) -> GuildGraph:
+        graph = GuildGraph(self.folder(guild_id), days)
+        await self.run(graph.load)
+        self.guilds[guild_id] = graph
+        return graph
+
+    async def append(self, guild_id: int, timestamp: int, total: int, clusters: typing.Dict[str, int]):
+        graph = self.guilds.get(guild_id)
+        if not graph:
+            return
+        new_names = False
+        pending = [(graph.get(), graph.get().append(timestamp, total))]
+        for cname, count in clusters.items():
+            series = graph.get(cname)
+            if series is None:
+                series = graph.add(cname)
+                new_names = True
+            pending.append((series, series.append(timestamp, count)))
+        await self.run(self.write, (graph, dict(graph.names)) if new_names else None, pending)
+
+    @staticmethod
+    def write(names: typing.Optional[tuple], pending: list):
+        # Names are copied on the event loop since the worker thread can't safely read the live dict
+        if names:
+            graph, copied = names
+            graph.save_names(copied)
+        for series, writes in pending:
+            series.write(writes)
+
+    async def resize(self, guild_id: int, days: int):
+        graph = self.guilds.get(guild_id)
+        if not graph:
+            return
+        graph.capacity = max(int(days), 1) * 1440
+        pending = [(series, series.resize(graph.capacity)) for series in graph.series.values()]
+        await self.run(self.write, None, pending)
+
+    async def retain(self, guild_id: int, clusters: typing.Iterable[str]):
+        """Delete the history of clusters that no longer exist"""
+        graph = self.guilds.get(guild_id)
+        if not graph:
+            return
+        gone = [cname for cname in graph.names if cname not in clusters]
+        if not gone:
+            return
+        paths = []
+        for cname in gone:
+            series = graph.series.pop(graph.names.pop(cname))
+            paths.extend(series.paths.values())
+        await self.run(self.delete, graph, dict(graph.names), paths)
+        log.info(f"Deleted graph data for {len(gone)} old clusters")
+
+    @staticmethod
+    def delete(graph: GuildGraph, names: dict, paths: list):
+        graph.save_names(names)
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def wipe(self, guild_id: int):
+        graph = self.guilds.pop(guild_id, None)
+        await self.run(shutil.rmtree, self.folder(guild_id), True)
+        if graph:
+            await self.load(guild_id, graph.capacity // 1440)
+
+    async def replace(self, guild_id: int, serverstats: dict):
+        """Import graph data in the old config format (ISO dates and a list of counts per cluster)"""
+        old = self.guilds.pop(guild_id, None)
+        days = serverstats.get("expiration") or (old.capacity // 1440 if old else 30)
+        await self.run(shutil.rmtree, self.folder(guild_id), True)
+        graph = GuildGraph(self.folder(guild_id), days)
+        await self.run(graph.load)
+        dates = serverstats.get("dates", [])
+        timestamps = [int(datetime.datetime.fromisoformat(d).timestamp()) for d in dates]
+        lists = {None: serverstats.get("counts", [])}
+        for key, countlist in serverstats.items():
+            if key not in ("dates", "counts", "expiration") and isinstance(countlist, list):
+                lists[key] = countlist
+        pending = []
+        for cname, countlist in lists.items():
+            series = graph.get() if cname is None else graph.add(cname)
+            # Cluster lists added after the graph started are shorter, they line up with the newest dates
+            offset = len(timestamps) - len(countlist)
+            for i, count in enumerate(countlist):
+                if 0 <= i + offset < len(timestamps):
+                    series.append(timestamps[i + offset], int(count))
+            pending.append((series, series.rewrite()))
+        await self.run(self.write, (graph, dict(graph.names)), pending)
+        self.guilds[guild_id] = graph
+        log.info(f"Imported {len(timestamps)} graph data points into the ring buffer store")
+
+    def export(self, guild_id: int) -> typing.Optional[dict]:
+        """Raw samples in the old config format, for backups"""
+        graph = self.guilds.get(guild_id)
+        if not graph:
+            return None
+        times, counts = graph.get().window("minute", 0)
+        data = {
+            "dates": [datetime.datetime.fromtimestamp(t, datetime.timezone.utc).isoformat() for t in times],
+            "counts": counts.tolist(),
+            "expiration": graph.capacity // 1440,
+        }
+        for cname in graph.names:
+            ctimes, cvalues = graph.get(cname).window("minute", 0)
+            lookup = dict(zip(ctimes, cvalues))
+            data[cname] = [lookup.get(t, 0) for t in times]
+        return data
+
+    def stored_days(self, guild_id: int) -> int:
+        graph = self.guilds.get(guild_id)
+        if not graph or not len(graph.get().rings["minute"]):
+            return 0
+        minute = graph.get().rings["minute"]
+        return int((minute.last() - minute.first()) / 86400)
+
+    def window(self, guild_id: int, seconds: int, now: int = None) -> typing.Optional[GraphWindow]:
+        """The last X seconds of player counts from the finest tier that still reaches back far enough"""
+        graph = self.guilds.get(guild_id)
+        if not graph:
+            return None
+        total = graph.get()
+        first = total.first()
+        if first is None:
+            return None
+        now = int(now or time.time())
+        span = min(int(seconds), now - first)
+        since = now - span
+        tiers = list(TIERS)
+        # Graphs are downsampled for display, so raw samples are used whenever the ring still has them
+        tier = next(
+            (t for t in tiers if len(total.rings[t]) and total.rings[t].first() <= since + TIERS[t]),
+            tiers[-1]
+        )
+        times, values = total.window(tier, since)
+        # Fresh rollups might not have enough buckets to draw yet
+        while len(values) < 3 and tiers.index(tier) > 0:
+            tier = tiers[tiers.index(tier) - 1]
+            times, values = total.window(tier, since)
+        clusters = {cname: graph.get(cname).window(tier, since) for cname in graph.names}
+        return GraphWindow(tier, span, total.rings["minute"].last(), (times, values), clusters)
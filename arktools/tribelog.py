@@ -0,0 +1,145 @@
+import logging
+import re
+import typing
+
+import discord
+
+log = logging.getLogger("red.vrt.arktools.tribelog")
+
+# Tribe (name), ID (id): (Day x, hh:mm:ss): (action)
+FROZE_LINE = re.compile(r"(?i)Tribe (.+), ID (.+): (Day .+, ..:..:..): (.+)\)")
+RICH_LINE = re.compile(r"(?i)Tribe (.+), ID (.+): (Day .+, ..:..:..): .+>(.+)<")
+PVE_VICTIM = re.compile(r"Tribemember (.+) -.+was")
+PVP_DEATH = re.compile(r"Tribemember (.+) - .+ was .+ by (.+) -")
+TAMER = re.compile(r"(.+) Tamed")
+
+# Events per digest embed, each one is a field
+DIGEST_SIZE = 10
+# Discord caps an embed at 6000 characters, leave room for the title and footer
+DIGEST_LENGTH = 5500
+
+
+class TribeEvent(typing.NamedTuple):
+    tribe_id: str
+    name: str
+    time: str
+    action: str
+    color: discord.Color
+    # Digest embeds take the color of their most notable event
+    rank: int = 0
+    # Character names to add to the tribe's member list
+    members: typing.Tuple[str, ...] = ()
+    # (character name, player stat) pairs to credit
+    credits: typing.Tuple[typing.Tuple[str, str], ...] = ()
+    kill: bool = False
+
+
+def parse_tribelog(msg: str) -> typing.Optional[TribeEvent]:
+    """Everything a tribe log line changes, without touching any stored data"""
+    if "froze" in msg:
+        match = FROZE_LINE.search(msg)
+    else:
+        match = RICH_LINE.search(msg)
+    if not match:
+        return None
+    name, tribe_id, time, action = match.groups()
+    lowered = action.lower()
+    members = []
+    credits = []
+    kill = False
+    rank = 0
+    if "was killed" in lowered:  # Player or dino was killed
+        rank = 2
+        if lowered.startswith("tribemember"):  # Player was killed by something
+            # Amount of parenthesis in the action was a quick and easy way to determine kill/death type
+            braces = action.count("(")
+            if braces == 1:  # player killed by another player so pvp death and kill
+                found = PVP_DEATH.search(action)
+                if found:
+                    victim, killer = found.groups()
+                    members.append(victim)
+                    credits.append((victim, "pvpdeaths"))
+                    credits.append((killer, "pvpkills"))
+            elif braces in (0, 2):
+                if braces == 2:  # player killed by a tribe's dino so pvp death
+                    log.info(msg)  # Still trying to figure out possible strings to parse
+                found = PVE_VICTIM.search(action)
+                if found:
+                    victim = found.group(1)
+                    members.append(victim)
+                    # No parenthesis means a wild dino, so pve death
+                    credits.append((victim, "pvedeaths" if braces == 0 else "pvpdeaths"))
+        color = discord.Color.from_rgb(255, 13, 0)  # bright red
+    elif "tribe killed" in lowered:
+        rank = 1
+        # Babies and the tribe's own dinos don't count as kills
+        kill = not any(age in action for age in ("Baby", "Juvenile", "Adolescent")) and name not in action
+        color = discord.Color.from_rgb(246, 255, 0)  # gold
+    elif "starved" in lowered:
+        color = discord.Color.from_rgb(140, 7, 0)  # dark red
+    elif "demolished" in lowered:
+        color = discord.Color.from_rgb(133, 86, 5)  # brown
+    elif "destroyed" in lowered:
+        color = discord.Color.from_rgb(115, 114, 112)  # grey
+    elif "tamed" in lowered:
+        found = TAMER.search(action)
+        if found:
+            credits.append((found.group(1), "tamed"))
+        color = discord.Color.from_rgb(0, 242, 117)  # lime
+    elif "froze" in lowered:
+        color = discord.Color.from_rgb(0, 247, 255)  # cyan
+    elif "claimed" in lowered:
+        color = discord.Color.from_rgb(255, 0, 225)  # pink
+    elif "unclaimed" in lowered:
+        color = discord.Color.from_rgb(102, 0, 90)  # dark purple
+    elif "uploaded" in lowered:
+        color = discord.Color.from_rgb(255, 255, 255)  # white
+    elif "downloaded" in lowered:
+        color = discord.Color.from_rgb(2, 2, 117)  # dark blue
+    else:
+        color = discord.Color.purple()
+    return TribeEvent(tribe_id, name, time, action, color, rank, tuple(members), tuple(credits), kill)
+
+
+def event_embed(server: dict, event: TribeEvent) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"{server['cluster'].upper()} {server['name'].capitalize()}: {event.name}",
+        color=event.color,
+        description=f"```py\n{event.action}\n```"
+    )
+    embed.set_footer(text=f"{event.time} | Tribe ID: {event.tribe_id}")
+    return embed
+
+
+def tribelog_embeds(server: dict, events: typing.List[TribeEvent]) -> typing.List[discord.Embed]:
+    """
+    As few embeds as possible for a batch of tribe log events
+
+    A lone event keeps the usual embed, otherwise events become fields of a digest embed.
+    """
+    if len(events) == 1:
+        return [event_embed(server, events[0])]
+    embeds = []
+    chunk = []
+    length = 0
+    for event in events:
+        value = f"```py\n{event.action[:990]}\n```{event.time} | Tribe ID: {event.tribe_id}"
+        if chunk and (len(chunk) == DIGEST_SIZE or length + len(value) + len(event.name) > DIGEST_LENGTH):
+            embeds.append(digest_embed(server, chunk))
+            chunk = []
+            length = 0
+        chunk.append((event, value))
+        length += len(value) + len(event.name)
+    embeds.append(digest_embed(server, chunk))
+    return embeds
+
+
+def digest_embed(server: dict, chunk: typing.List[typing.Tuple[TribeEvent, str]]) -> discord.Embed:
+    notable = max((event for event, _ in chunk), key=lambda e: e.rank)
+    embed = discord.Embed(
+        title=f"{server['cluster'].upper()} {server['name'].capitalize()}: {len(chunk)} Tribe Log Entries",
+        color=notable.color
+    )
+    for event, value in chunk:
+        embed.add_field(name=event.name[:256], value=value, inline=False)
+    return embed